@@ -0,0 +1,138 @@
+# Agregação fundida dos cartões de métricas e da tabela de transportadoras
+#
+# Uma única passada sobre os códigos das dimensões: cada linha (ou célula do cubo) vira um
+# código conjunto transportadora × risco × criticidade × rota, e dois np.bincount (contagem
+# e custo) produzem um tensor do qual saem todos os KPIs, modas e riscos predominantes.
+# Aceita o DataFrame de incidentes (peso 1 por linha) ou células do cubo ('Incidentes'/'Custo').
+
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+TOP_CARRIERS = ['Brado', 'JSL', 'Tegma']
+
+_AXES = ['Transportadora', 'Tipo de Risco', 'Nível de Criticidade', 'Rota/Local Crítico']
+
+
+@dataclass
+class CarrierSummary:
+    carrier: str
+    incidents: int
+    total_cost: float
+    mean_cost: float
+    top_risk: str
+    top_risk_pct: float
+
+    @property
+    def predominant_risk(self):
+        if self.incidents == 0:
+            return "N/A"
+        return f"{self.top_risk} ({self.top_risk_pct:.0f}%)"
+
+
+@dataclass
+class KPIResult:
+    total_incidents: int
+    total_cost: float
+    high_criticality: int
+    high_criticality_pct: float
+    top_route: str
+    top_route_count: int
+    top_route_pct: float
+    carriers: dict = field(default_factory=dict)
+
+    def carrier_table(self, carriers=TOP_CARRIERS):
+        rows = [self.carriers[c] for c in carriers if c in self.carriers and self.carriers[c].incidents > 0]
+        return pd.DataFrame({
+            'Transportadora': [r.carrier for r in rows],
+            'Incidentes': [r.incidents for r in rows],
+            'Custo Médio por Incidente': ['R$ {:,.0f}'.format(r.mean_cost) for r in rows],
+            'Riscos Predominantes': [r.predominant_risk for r in rows],
+        })
+
+
+def _codes(series):
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    return series.cat.codes.to_numpy(np.int64), list(series.cat.categories)
+
+
+def kpi_tensors(frame):
+    # Tensores (contagem, custo) por transportadora × risco × criticidade × rota; tensores de
+    # pedaços do mesmo frame (mesmas categorias) se somam (agregação paralela)
+    if 'Incidentes' in frame.columns:
+        weights = frame['Incidentes'].to_numpy(np.float64)
+        costs = frame['Custo'].to_numpy(np.float64)
+    else:
+        weights = None
+        costs = frame['Custo Associado (R$)'].to_numpy(np.float64)
+
+    codes, labels = zip(*(_codes(frame[col]) for col in _AXES))
+    valid = np.logical_and.reduce([c >= 0 for c in codes])
+    if not valid.all():
+        codes = [c[valid] for c in codes]
+        costs = costs[valid]
+        weights = None if weights is None else weights[valid]
+    shape = tuple(len(l) for l in labels)
+    joint = np.ravel_multi_index(codes, shape) if len(costs) else np.zeros(0, np.int64)
+    size = int(np.prod(shape))
+    counts = np.bincount(joint, weights=weights, minlength=size).reshape(shape)
+    cost_sums = np.bincount(joint, weights=costs, minlength=size).reshape(shape)
+    return counts, cost_sums, labels
+
+
+def merge_kpi_tensors(parts, carriers=TOP_CARRIERS):
+    counts, cost_sums, labels = parts[0]
+    for part_counts, part_costs, _ in parts[1:]:
+        counts = counts + part_counts
+        cost_sums = cost_sums + part_costs
+    return kpis_from_tensors(counts, cost_sums, labels, carriers)
+
+
+def compute_kpis(frame, carriers=TOP_CARRIERS):
+    return kpis_from_tensors(*kpi_tensors(frame), carriers)
+
+
+def kpis_from_tensors(counts, cost_sums, labels, carriers=TOP_CARRIERS):
+    carrier_labels, risk_labels, crit_labels, route_labels = labels
+    total = int(round(counts.sum()))
+    by_crit = counts.sum(axis=(0, 1, 3))
+    by_route = counts.sum(axis=(0, 1, 2))
+    by_carrier_risk = counts.sum(axis=(2, 3))
+    cost_by_carrier = cost_sums.sum(axis=(1, 2, 3))
+
+    high = int(round(by_crit[crit_labels.index('Alto')])) if 'Alto' in crit_labels else 0
+    if total > 0:
+        route_idx = int(np.argmax(by_route))
+        top_route, top_route_count = route_labels[route_idx], int(round(by_route[route_idx]))
+    else:
+        top_route, top_route_count = "N/A", 0
+
+    summaries = {}
+    for carrier in carriers:
+        if carrier not in carrier_labels:
+            summaries[carrier] = CarrierSummary(carrier, 0, 0.0, 0.0, "N/A", 0.0)
+            continue
+        i = carrier_labels.index(carrier)
+        n = int(round(by_carrier_risk[i].sum()))
+        risk_idx = int(np.argmax(by_carrier_risk[i]))
+        summaries[carrier] = CarrierSummary(
+            carrier=carrier,
+            incidents=n,
+            total_cost=float(cost_by_carrier[i]),
+            mean_cost=float(cost_by_carrier[i]) / n if n else 0.0,
+            top_risk=risk_labels[risk_idx] if n else "N/A",
+            top_risk_pct=float(by_carrier_risk[i, risk_idx]) / n * 100 if n else 0.0,
+        )
+
+    return KPIResult(
+        total_incidents=total,
+        total_cost=float(cost_sums.sum()),
+        high_criticality=high,
+        high_criticality_pct=high / total * 100 if total else 0.0,
+        top_route=top_route,
+        top_route_count=top_route_count,
+        top_route_pct=top_route_count / total * 100 if total else 0.0,
+        carriers=summaries,
+    )
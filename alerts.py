@@ -0,0 +1,348 @@
+# Detecção online de anomalias e alertas sobre os incidentes que chegam
+#
+# Estado O(1) por chave (cada rota e cada transportadora), sem revarrer o histórico:
+#   - EWMA (média e variância) da contagem e do custo diários; o dia em curso é comparado com
+#     a média dos dias anteriores, então um pico gera alerta assim que se forma
+#   - média e variância exponenciais do log do custo por incidente, por rota (com fallback
+#     global enquanto a rota tem poucos incidentes): um incidente é atípico quando está muito
+#     acima no log (cauda log-normal) e é improvável sob a cauda exponencial dos custos
+#     simulados em generate_data.py (P = exp(-custo / média))
+# Os lotes são processados dia a dia; dentro de um dia tudo é vetorizado sobre códigos inteiros
+# (bincount por chave) e o laço em Python é só sobre as chaves presentes no dia. Um alerta por
+# (tipo, chave, dia), atualizado enquanto o dia acumula incidentes.
+
+import datetime
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from compact import MISSING, CompactIncidents
+from schema import MONTH_NAMES_PT
+
+# Suavização por dia (contagens e custos diários) e por incidente (log do custo)
+DAILY_ALPHA = 0.1
+COST_ALPHA = 0.02
+
+# Dias fechados / incidentes antes de uma chave ter estatística própria
+MIN_DAYS = 14
+MIN_SAMPLES = 30
+
+# Limiares: pico de volume diário e custo atípico por incidente
+VOLUME_Z = 4.0
+MIN_VOLUME = 5
+OUTLIER_Z = 3.5
+TAIL_P = 1e-6
+
+# Alertas mantidos em memória (os mais antigos saem primeiro)
+MAX_ALERTS = 1000
+
+# Dias de zeros aplicados de uma vez a uma chave sem incidentes (depois disso o EWMA já convergiu)
+MAX_GAP = 120
+
+DIMENSIONS = ['Rota/Local Crítico', 'Transportadora']
+
+# Colunas de filtro registradas em cada alerta (valores presentes nos seus incidentes)
+CONTEXT = {
+    'Transportadora': 'carriers',
+    'Tipo de Risco': 'risks',
+    'Modal Afetado': 'modals',
+    'Região': 'regions',
+}
+# Incidentes sem algum destes valores não entram na detecção
+REQUIRED = DIMENSIONS + ['Tipo de Risco']
+CODED = REQUIRED + ['Modal Afetado', 'Região']
+
+
+@dataclass
+class KeyState:
+    day: np.datetime64 = None  # dia em acumulação
+    count: int = 0
+    cost: float = 0.0
+    days: int = 0  # dias fechados
+    mean_count: float = 0.0
+    var_count: float = 0.0
+    mean_cost: float = 0.0
+    var_cost: float = 0.0
+    samples: int = 0  # incidentes vistos (log do custo)
+    log_mean: float = 0.0
+    log_var: float = 0.0
+
+    def close_day(self, next_day):
+        # Fecha o dia em acumulação e aplica os dias sem incidentes até next_day
+        if self.day is None:
+            self.day = next_day
+            return
+        gap = int((next_day - self.day).astype(np.int64))
+        for i in range(min(gap, MAX_GAP + 1)):
+            count, cost = (self.count, self.cost) if i == 0 else (0, 0.0)
+            if self.days == 0:
+                self.mean_count, self.mean_cost = float(count), cost
+            else:
+                d = count - self.mean_count
+                self.mean_count += DAILY_ALPHA * d
+                self.var_count = (1 - DAILY_ALPHA) * (self.var_count + DAILY_ALPHA * d * d)
+                d = cost - self.mean_cost
+                self.mean_cost += DAILY_ALPHA * d
+                self.var_cost = (1 - DAILY_ALPHA) * (self.var_cost + DAILY_ALPHA * d * d)
+            self.days += 1
+        self.day, self.count, self.cost = next_day, 0, 0.0
+
+    def add_costs(self, k, mean, var):
+        # Funde um grupo de k incidentes (média e variância do log do custo) nas estatísticas
+        weight = min((1 - COST_ALPHA) ** k, self.samples / (self.samples + k))
+        new_mean = weight * self.log_mean + (1 - weight) * mean
+        self.log_var = (weight * (self.log_var + (self.log_mean - new_mean) ** 2)
+                        + (1 - weight) * (var + (mean - new_mean) ** 2))
+        self.log_mean = new_mean
+        self.samples += k
+
+
+@dataclass
+class Alert:
+    day: datetime.date
+    kind: str  # 'volume' ou 'custo'
+    dimension: str
+    key: str
+    value: float  # incidentes no dia (volume) ou custo atípico somado (custo)
+    expected: float  # média diária de incidentes / de custo da chave
+    score: float
+    incidents: int
+    risk: str  # tipo de risco predominante
+    carriers: tuple = field(default_factory=tuple)
+    risks: tuple = field(default_factory=tuple)
+    modals: tuple = field(default_factory=tuple)
+    regions: tuple = field(default_factory=tuple)
+
+    @property
+    def message(self):
+        if self.kind == 'volume':
+            return '{}: {} incidentes no dia (média de {}/dia), principalmente {}'.format(
+                self.key, self.incidents, f'{self.expected:.1f}'.replace('.', ','), self.risk)
+        return '{}: {} de custo atípico ({}, {}) → R$ {} milhões'.format(
+            self.key, 'incidente' if self.incidents == 1 else f'{self.incidents} incidentes',
+            self.risk, ', '.join(self.carriers), brl_millions(self.value))
+
+    @property
+    def recommendation(self):
+        if self.kind == 'custo':
+            return (f'Recomenda-se revisar a cobertura de seguro e os planos de contingência '
+                    f'para {self.key}.')
+        if self.dimension == 'Transportadora':
+            return (f'Recomenda-se acionar a {self.key} e redistribuir parte da carga entre '
+                    f'outras transportadoras preventivamente.')
+        return (f'Recomenda-se reforçar o monitoramento em {self.key} e avaliar rotas '
+                f'alternativas para a carga sensível.')
+
+
+def brl_millions(value):
+    return f'{value / 1_000_000:.1f}'.replace('.', ',')
+
+
+class AnomalyDetector:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.states = {}  # (dimensão, chave) → KeyState
+        self.global_costs = KeyState()
+        self.alerts = OrderedDict()  # (tipo, dimensão, chave, dia) → Alert
+        self.last_day = None
+        self.processed = 0
+
+    def attach(self, store):
+        # Recebe o histórico uma vez na inscrição e depois só os lotes novos do IncidentStore
+        store.subscribe(self.on_batch)
+        return self
+
+    def on_batch(self, batch, reset=False):
+        with self._lock:
+            if reset:
+                self.reset()
+            self._process(batch)
+
+    def _process(self, batch):
+        if len(batch) == 0:
+            return
+        # Códigos inteiros por coluna; nomes só são materializados quando um alerta é gerado
+        codes, names = {}, {}
+        if isinstance(batch, CompactIncidents):
+            # Histórico completo já vem em códigos, ordenado por dia
+            days = batch.dates()
+            for col in CODED:
+                codes[col] = batch.codes[col]
+                names[col] = np.asarray(batch.tables[col])
+            valid = np.all([codes[c] != MISSING[c] for c in REQUIRED], axis=0)
+            costs = batch.cost
+        else:
+            days = batch['Data'].to_numpy('datetime64[D]')
+            for col in CODED:
+                values = batch[col]
+                if not isinstance(values.dtype, pd.CategoricalDtype):
+                    values = values.astype('category')
+                # Ausentes com o mesmo código do formato compacto
+                col_codes = values.cat.codes.to_numpy()
+                codes[col] = np.where(col_codes < 0, MISSING[col], col_codes)
+                names[col] = np.asarray(values.cat.categories.astype(str))
+            valid = np.all([codes[c] != MISSING[c] for c in REQUIRED], axis=0)
+            costs = batch['Custo Associado (R$)'].to_numpy()
+        order = np.argsort(days, kind='stable')
+        order = order[valid[order]]
+        days = days[order]
+        codes = {col: c[order] for col, c in codes.items()}
+        costs = costs[order].astype(np.float64)
+        log_costs = np.log(np.maximum(costs, 1.0))
+        bounds = np.flatnonzero(np.diff(days)) + 1
+        for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(days)]):
+            self._process_day(days[lo], {col: c[lo:hi] for col, c in codes.items()}, names,
+                              costs[lo:hi], log_costs[lo:hi])
+        self.processed += len(batch)
+        if len(days):
+            self.last_day = days[-1] if self.last_day is None else max(self.last_day, days[-1])
+        while len(self.alerts) > MAX_ALERTS:
+            self.alerts.popitem(last=False)
+
+    def _context(self, codes, names, mask):
+        # Tipo de risco predominante e valores de cada coluna de filtro nos incidentes selecionados
+        risk = names['Tipo de Risco'][np.bincount(codes['Tipo de Risco'][mask]).argmax()]
+        context = {}
+        for col, attr in CONTEXT.items():
+            present = np.unique(codes[col][mask])
+            present = present[present != MISSING[col]]
+            context[attr] = tuple(sorted(str(v) for v in names[col][present]))
+        return risk, context
+
+    def _process_day(self, day, codes, names, costs, log_costs):
+        routes = codes['Rota/Local Crítico']
+        route_names = names['Rota/Local Crítico']
+
+        # Custos atípicos: cada incidente contra a estatística da sua rota (antes deste dia)
+        g = self.global_costs
+        outliers = np.zeros(len(costs), dtype=bool)
+        if g.samples >= MIN_SAMPLES:
+            # Só as rotas presentes no dia (o dicionário de rotas é aberto)
+            present, inverse = np.unique(routes, return_inverse=True)
+            mu_by_route = np.full(len(present), g.log_mean)
+            var_by_route = np.full(len(present), g.log_var)
+            for i, code in enumerate(present):
+                state = self.states.get(('Rota/Local Crítico', route_names[code]))
+                if state is not None and state.samples >= MIN_SAMPLES:
+                    mu_by_route[i], var_by_route[i] = state.log_mean, state.log_var
+            mu = mu_by_route[inverse]
+            sigma = np.sqrt(np.maximum(var_by_route[inverse], 1e-6))
+            z = (log_costs - mu) / sigma
+            tail = np.exp(-costs / np.exp(mu + sigma * sigma / 2))
+            outliers = (z > OUTLIER_Z) & (tail < TAIL_P)
+            for code in np.unique(routes[outliers]):
+                mask = outliers & (routes == code)
+                route = route_names[code]
+                state = self.states.get(('Rota/Local Crítico', route)) or KeyState()
+                self._raise('custo', 'Rota/Local Crítico', route, day, costs[mask].sum(),
+                            state.mean_cost, z[mask].max(), int(mask.sum()),
+                            *self._context(codes, names, mask), accumulate=True)
+
+        # Volume e custo diário por chave; depois atualiza as estatísticas de custo (sem os
+        # atípicos, para que um evento extremo não alargue a referência dos seguintes)
+        typical = ~outliers
+        for dimension in DIMENSIONS:
+            # Contagens por chave presente no dia (posição em present, não o código)
+            present, keys = np.unique(codes[dimension], return_inverse=True)
+            k = len(present)
+            counts = np.bincount(keys, minlength=k)
+            day_costs = np.bincount(keys, weights=costs, minlength=k)
+            if dimension == 'Rota/Local Crítico':
+                n_typical = np.bincount(keys[typical], minlength=k)
+                log_sum = np.bincount(keys[typical], weights=log_costs[typical], minlength=k)
+                log_sq = np.bincount(keys[typical], weights=log_costs[typical] ** 2, minlength=k)
+            for i in range(k):
+                key = names[dimension][present[i]]
+                state = self.states.setdefault((dimension, key), KeyState())
+                if state.day is None or day > state.day:
+                    state.close_day(day)
+                state.count += int(counts[i])
+                state.cost += float(day_costs[i])
+                if dimension == 'Rota/Local Crítico' and n_typical[i]:
+                    n = n_typical[i]
+                    mean = log_sum[i] / n
+                    state.add_costs(n, mean, max(log_sq[i] / n - mean * mean, 0.0))
+                if state.days >= MIN_DAYS and state.count >= MIN_VOLUME:
+                    sd = np.sqrt(max(state.var_count, state.mean_count, 0.25))
+                    z = (state.count - state.mean_count) / sd
+                    if z >= VOLUME_Z:
+                        self._raise('volume', dimension, key, day, state.count, state.mean_count,
+                                    z, state.count, *self._context(codes, names, keys == i))
+        if typical.any():
+            g.add_costs(int(typical.sum()), log_costs[typical].mean(), log_costs[typical].var())
+
+    def _raise(self, kind, dimension, key, day, value, expected, score, incidents, risk,
+               context, accumulate=False):
+        alert_key = (kind, dimension, key, day)
+        previous = self.alerts.get(alert_key)
+        if previous is not None and accumulate:
+            # Mais incidentes atípicos no mesmo dia e rota: soma ao alerta existente
+            value += previous.value
+            incidents += previous.incidents
+            score = max(score, previous.score)
+            context = {attr: tuple(sorted(set(values) | set(getattr(previous, attr))))
+                       for attr, values in context.items()}
+        self.alerts[alert_key] = Alert(pd.Timestamp(day).date(), kind, dimension, str(key),
+                                       float(value), float(expected), float(score), incidents,
+                                       str(risk), **context)
+
+    def active(self, start=None, end=None, selections=None):
+        # Alertas do período, mais graves primeiro. selections: coluna → valores selecionados
+        # (Filters.selections()); um alerta entra se algum dos seus incidentes está em cada seleção
+        with self._lock:
+            alerts = list(self.alerts.values())
+        selected = {CONTEXT[col]: set(values) for col, values in (selections or {}).items()
+                    if values and col in CONTEXT}
+        alerts = [a for a in alerts
+                  if (start is None or a.day >= start) and (end is None or a.day <= end)
+                  and all(values.intersection(getattr(a, attr)) for attr, values in selected.items())]
+        return sorted(alerts, key=lambda a: a.score, reverse=True)
+
+    def priority(self, days=7):
+        # Alerta mais grave da última semana de dados; devolve (início, fim, alerta ou None)
+        if self.last_day is None:
+            return None, None, None
+        end = pd.Timestamp(self.last_day).date()
+        start = end - datetime.timedelta(days=days - 1)
+        alerts = self.active(start, end)
+        return start, end, alerts[0] if alerts else None
+
+
+def critical_events(alerts, limit=3):
+    # Linhas (rótulo, texto) do cartão de eventos críticos. Custos atípicos do mesmo tipo de
+    # risco no mesmo mês (ex.: uma sequência de enchentes) viram um único evento do mês
+    groups = OrderedDict()
+    for a in sorted(alerts, key=lambda a: a.score, reverse=True):
+        if a.kind == 'custo':
+            key = (a.kind, a.risk, a.day.year, a.day.month)
+        else:
+            key = (a.kind, a.dimension, a.key, a.day)
+        groups.setdefault(key, []).append(a)
+    events = []
+    for items in list(groups.values())[:limit]:
+        first = items[0]
+        if len(items) == 1:
+            events.append((first.day.strftime('%d/%m'), first.message))
+            continue
+        routes = {a.key for a in items}
+        text = '{} incidentes de custo atípico ({}) em {} → R$ {} milhões'.format(
+            sum(a.incidents for a in items), first.risk,
+            f'{len(routes)} rotas' if len(routes) > 1 else first.key,
+            brl_millions(sum(a.value for a in items)))
+        events.append((MONTH_NAMES_PT[first.day.month - 1], text))
+    return events
+
+
+def alert_routes(alerts, limit=3):
+    # Rotas com alertas (volume ou custo atípico), da mais grave para a menos grave
+    routes = []
+    for a in sorted(alerts, key=lambda a: a.score, reverse=True):
+        if a.dimension == 'Rota/Local Crítico' and a.key not in routes:
+            routes.append(a.key)
+    return routes[:limit]
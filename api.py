@@ -0,0 +1,178 @@
+# API HTTP/JSON assíncrona com as mesmas agregações do dashboard
+#
+#   python api.py --port 8765
+#   curl 'http://127.0.0.1:8765/kpis?start=2025-03-01&end=2025-05-31&carriers=Brado,JSL'
+#
+# Endpoints: /health, /report (todas as seções) e /kpis, /carriers, /regions, /routes,
+# /timeline, /costs, /forecast, /alerts, /plan. Parâmetros: start, end (AAAA-MM-DD) e carriers, risk_types, modals,
+# regions (valores separados por vírgula); /plan aceita unavailable=Transportadora:Modal,.... Só depende da biblioteca padrão + camada de consultas.
+#
+# As consultas rodam em um pool de threads (o event loop só faz I/O). Visões e respostas ficam
+# no cache de resultados do processo (result_cache.py), por filtros normalizados + versão dos dados.
+
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import storage
+from alerts import AnomalyDetector
+from forecasting import Forecaster, outlook
+from incremental import IncidentStore
+from optimizer import plan
+from queries import (QUERIES, Filters, compute_views, normalize, query_alerts, query_forecast,
+                     query_plan, query_report)
+from result_cache import shared_cache
+
+REFRESH_SECONDS = 5.0
+
+log = logging.getLogger(__name__)
+
+
+class QueryService:
+    def __init__(self, store, workers=8):
+        self.store = store
+        self.cache = shared_cache()
+        self.forecaster = Forecaster()
+        self.detector = AnomalyDetector().attach(store)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def handle(self, path, params):
+        # Executado no pool de threads; devolve (status, corpo em bytes). Uma falha inesperada vira
+        # um 500 com corpo JSON, e a conexão (keep-alive) continua atendendo
+        try:
+            return self._dispatch(path, params)
+        except Exception as e:
+            log.exception('falha em %s %s', path, params)
+            return 500, json.dumps({'error': f'erro interno: {type(e).__name__}'}).encode()
+
+    def _dispatch(self, path, params):
+        endpoint = path.strip('/') or 'report'
+        if endpoint == 'health':
+            return 200, json.dumps({'status': 'ok', 'version': self.store.version,
+                                    'cache': self.cache.stats()}).encode()
+        if endpoint not in ('report', 'forecast', 'alerts', 'plan') and endpoint not in QUERIES:
+            return 404, json.dumps({'error': f'endpoint desconhecido: {endpoint}'}).encode()
+        try:
+            filters = normalize(self.store.cube, Filters.from_dict(params))
+        except ValueError as e:
+            return 400, json.dumps({'error': str(e)}).encode()
+
+        if endpoint == 'alerts':
+            # Estado do detector já é incremental; não passa pelo cache
+            result = query_alerts(self.detector.active(filters.start, filters.end, filters.selections()))
+            return 200, json.dumps({'filters': filters.to_dict(), 'data': result},
+                                   ensure_ascii=False, default=str).encode()
+
+        if endpoint == 'forecast':
+            # A previsão ignora o período e cobre todos os dias carregados
+            filters = replace(filters, start=None, end=None)
+
+            def render_forecast():
+                self.forecaster.sync(self.store)
+                result = query_forecast(outlook(self.forecaster, self.store.cube, filters))
+                return json.dumps({'filters': filters.to_dict(), 'data': result},
+                                  ensure_ascii=False, default=str).encode()
+
+            return 200, self.cache.get_or_compute(('api', endpoint, filters, self.store.data_key()),
+                                                  render_forecast)
+
+        if endpoint == 'plan':
+            # A exposição de cada faixa usa todo o histórico
+            unavailable = tuple(sorted(tuple(pair.split(':', 1)) for pair in
+                                       params.get('unavailable', '').split(',') if ':' in pair))
+
+            def render_plan():
+                result = query_plan(plan(self.store.cube, filters, unavailable))
+                return json.dumps({'filters': filters.to_dict(), 'data': result},
+                                  ensure_ascii=False, default=str).encode()
+
+            return 200, self.cache.get_or_compute(('api', endpoint, filters, unavailable, self.store.data_key()),
+                                                  render_plan)
+
+        data_key = self.store.data_key(filters.start, filters.end)
+
+        def render():
+            views = self.cache.get_or_compute(('views', filters, data_key),
+                                              lambda: compute_views(self.store.cube, filters))
+            result = query_report(views) if endpoint == 'report' else QUERIES[endpoint](views)
+            return json.dumps({'filters': filters.to_dict(), 'data': result},
+                              ensure_ascii=False, default=str).encode()
+
+        return 200, self.cache.get_or_compute(('api', endpoint, filters, data_key), render)
+
+    async def serve_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) < 2 or parts[0] != 'GET':
+                    status, body = 405, b'{"error": "apenas GET"}'
+                else:
+                    url = urlsplit(parts[1])
+                    params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                    status, body = await loop.run_in_executor(self.pool, self.handle, url.path, params)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f'HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n'
+                    f'Content-Type: application/json; charset=utf-8\r\n'
+                    f'Content-Length: {len(body)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode() + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def refresh_loop(self):
+        # Ingestão incremental periódica (mesmo mecanismo do dashboard)
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(REFRESH_SECONDS)
+            await loop.run_in_executor(self.pool, self.store.refresh)
+
+
+async def serve(host, port, path=storage.CSV_PATH, workers=8, streaming=False):
+    service = QueryService(IncidentStore(path, streaming=streaming), workers=workers)
+    server = await asyncio.start_server(service.serve_connection, host, port)
+    refresher = asyncio.create_task(service.refresh_loop())
+    print(f"API de riscos logísticos em http://{host}:{port}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        refresher.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP/JSON do relatório de riscos logísticos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data", default=storage.CSV_PATH)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--streaming", action="store_true", help="ler o histórico em blocos (maior que a memória)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.data, args.workers, args.streaming))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+# Benchmark das etapas de carga, filtro e agregação em várias escalas
+#
+#   python benchmark.py                                        # 1k e 100k linhas
+#   python benchmark.py --sizes 1k,100k,10M --output bench/atual.json
+#   python benchmark.py --repeat 5 --baseline bench/anterior.json --threshold 0.2   # falha se regredir > 20%
+#
+# Para cada tamanho, um subprocesso gera o dataset (generate_data.py, Parquet particionado,
+# semente fixa) e executa headless todas as computações do dashboard: carga, cubo, recortes dos
+# filtros, visões das seções, histórico/comparações, previsões e alertas. Cada etapa registra
+# tempo de parede, pico de RSS (amostrado durante a etapa) e, com alocações ligadas, o pico e o
+# saldo de memória rastreados pelo tracemalloc (em uma segunda execução, para não distorcer o
+# tempo). O tempo de cada etapa é a mediana de --repeat execuções. O resultado é um JSON
+# comparável entre execuções; uma regressão precisa passar do limite relativo (--threshold) e
+# de uma diferença absoluta mínima, para que o ruído de etapas curtas não reprove nada.
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+SIZES = {'1k': 1_000, '100k': 100_000, '10M': 10_000_000, '100M': 100_000_000}
+DEFAULT_SIZES = '1k,100k'
+
+# Combinações de filtros avaliadas nas etapas de recorte e visões
+FILTER_COMBINATIONS = 20
+
+# Etapas mais rápidas que isto não entram na checagem de regressão de tempo (ruído)
+MIN_SECONDS = 0.2
+# Diferenças absolutas abaixo destas não contam como regressão, qualquer que seja a relativa
+MIN_DELTA = {'seconds': 0.1, 'peak_rss_mb': 32.0}
+# Execuções por etapa (mediana) exigidas para comparar com um baseline
+MIN_REPEAT = 3
+DEFAULT_REPEAT = 5
+
+
+def current_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RSSSampler(threading.Thread):
+    # Pico de RSS durante uma etapa (amostragem em segundo plano)
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss()
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.is_set():
+            self.peak = max(self.peak, current_rss())
+            self.done.wait(self.interval)
+
+    def stop(self):
+        self.done.set()
+        self.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def filter_combinations(seed, n=FILTER_COMBINATIONS):
+    from queries import Filters
+    from schema import CARRIERS, MODALS, REGIONS, RISK_TYPES
+    r = random.Random(seed)
+    combos = [Filters()]
+    while len(combos) < n:
+        values = {}
+        for name, options in (('carriers', CARRIERS), ('risk_types', RISK_TYPES),
+                              ('modals', MODALS), ('regions', REGIONS)):
+            if r.random() < 0.4:
+                values[name] = tuple(r.sample(options, r.randint(1, len(options) - 1)))
+        month = r.randint(1, 5)
+        start, end = (datetime.date(2025, month, 1), datetime.date(2025, month + 1, 5)) if r.random() < 0.5 else (None, None)
+        combos.append(Filters(start, end, **values).normalized())
+    return combos
+
+
+# Etapas: cada uma recebe o contexto da execução e guarda nele o que as seguintes usam
+
+def stage_generate(ctx):
+    import generate_data
+    chunks = generate_data.generate(ctx['rows'], ctx['seed'], chunk_size=ctx['chunk_size'],
+                                    workers=ctx['workers'])
+    generate_data.write(chunks, ctx['data_path'], 'parquet')
+
+
+def stage_load(ctx):
+    import storage
+    ctx['incidents'] = storage.load_compact(ctx['data_path'])
+
+
+def stage_cube(ctx):
+    from cube import IncidentCube
+    ctx['cube'] = IncidentCube(ctx['incidents'])
+
+
+def stage_filter(ctx):
+    cube = ctx['cube']
+    ctx['slices'] = [len(cube.slice(f.start, f.end, f.selections())) for f in ctx['filters']]
+
+
+def stage_views(ctx):
+    import queries
+    ctx['views'] = [queries.compute_views(ctx['cube'], f) for f in ctx['filters']]
+
+
+def stage_history(ctx):
+    import history
+    hist = history.PeriodHistory.combine(ctx['cube'], os.path.join(ctx['workdir'], 'historico'))
+    first, last = hist.first_day, hist.last_day
+    for f in ctx['filters']:
+        hist.year_over_year(f.start or first, f.end or last, f.selections())
+        hist.quarter_over_quarter(f.end or last, f.selections())
+
+
+def stage_forecast(ctx):
+    import forecasting
+    forecaster = forecasting.Forecaster(ctx['workers'])
+    forecaster.fit(ctx['cube'])
+    for f in ctx['filters']:
+        forecasting.outlook(forecaster, ctx['cube'], f)
+
+
+def stage_alerts(ctx):
+    import alerts
+    detector = alerts.AnomalyDetector()
+    detector.on_batch(ctx['incidents'], True)
+    ctx['alerts'] = len(detector.alerts)
+
+
+STAGES = [
+    ('generate', stage_generate),
+    ('load', stage_load),
+    ('cube', stage_cube),
+    ('filter', stage_filter),
+    ('views', stage_views),
+    ('history', stage_history),
+    ('forecast', stage_forecast),
+    ('alerts', stage_alerts),
+]
+
+
+def measure(fn, ctx, alloc, repeat=1):
+    # Tempo: mediana de `repeat` execuções (e a melhor, para referência); RSS: pico entre todas
+    runs = []
+    sampler = RSSSampler()
+    sampler.start()
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn(ctx)
+        runs.append(time.perf_counter() - t0)
+    sampler.stop()
+    result = {'seconds': statistics.median(runs), 'best_seconds': min(runs), 'runs': len(runs),
+              'peak_rss_mb': sampler.peak / 2**20}
+    if alloc:
+        # Segunda execução só para contar alocações (tracemalloc deixa tudo mais lento);
+        # alocações de processos filhos (ex.: geração em paralelo) não aparecem aqui
+        gc.collect()
+        tracemalloc.start()
+        fn(ctx)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['alloc_peak_mb'] = peak / 2**20
+        result['alloc_net_mb'] = current / 2**20
+    return result
+
+
+def run_size(label, rows, workdir, seed, alloc, repeat, workers, chunk_size):
+    # Executado no subprocesso de um tamanho
+    ctx = {
+        'rows': rows,
+        'seed': seed,
+        'workdir': workdir,
+        'data_path': os.path.join(workdir, 'incidentes.parquet'),
+        'workers': workers,
+        'chunk_size': chunk_size,
+        'filters': filter_combinations(seed),
+    }
+    stages = {}
+    for name, fn in STAGES:
+        stages[name] = measure(fn, ctx, alloc, repeat)
+        print(f"  {label:>5} {name:<9} {stages[name]['seconds']:9.3f} s  "
+              f"{stages[name]['peak_rss_mb']:9.1f} MB RSS", file=sys.stderr, flush=True)
+    return {'rows': rows, 'cells': len(ctx['cube'].cells), 'alerts': ctx['alerts'], 'stages': stages}
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+    }
+
+
+def compare(current, baseline, threshold):
+    # Regressões: etapa mais lenta ou com pico de RSS maior que (1 + threshold) × baseline e
+    # pelo menos MIN_DELTA acima dele. Tempos só são comparados entre medianas de MIN_REPEAT
+    # execuções ou mais
+    timed = min(current.get('repeat', 1), baseline.get('repeat', 1)) >= MIN_REPEAT
+    regressions = []
+    for label, result in current['results'].items():
+        base = baseline.get('results', {}).get(label)
+        if base is None:
+            continue
+        for stage, metrics in result['stages'].items():
+            base_metrics = base['stages'].get(stage)
+            if base_metrics is None:
+                continue
+            for metric in ('seconds', 'peak_rss_mb'):
+                before, after = base_metrics.get(metric), metrics.get(metric)
+                if before is None or after is None:
+                    continue
+                if metric == 'seconds' and (not timed or before < MIN_SECONDS):
+                    continue
+                if after > before * (1 + threshold) and after - before > MIN_DELTA[metric]:
+                    regressions.append((label, stage, metric, before, after))
+    return regressions
+
+
+def print_results(report):
+    header = f"{'tamanho':>8} {'etapa':<9} {'tempo (s)':>10} {'RSS (MB)':>10} {'aloc. pico (MB)':>16}"
+    print(header)
+    print('-' * len(header))
+    for label, result in report['results'].items():
+        for stage, m in result['stages'].items():
+            alloc = f"{m['alloc_peak_mb']:16.1f}" if 'alloc_peak_mb' in m else f"{'-':>16}"
+            print(f"{label:>8} {stage:<9} {m['seconds']:10.3f} {m['peak_rss_mb']:10.1f} {alloc}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das computações do dashboard em várias escalas")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"subconjunto de {','.join(SIZES)}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="JSON com os resultados")
+    parser.add_argument("--baseline", default=None, help="JSON de uma execução anterior")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="execuções por etapa (vale a mediana)")
+    parser.add_argument("--no-alloc", action="store_true", help="não medir alocações (mais rápido)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--workdir", default=None, help="diretório dos datasets gerados")
+    parser.add_argument("--keep-data", action="store_true")
+    parser.add_argument("--run-size", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        # Subprocesso: um tamanho, resultado em JSON na saída padrão
+        result = run_size(args.run_size, SIZES[args.run_size], args.workdir, args.seed,
+                          not args.no_alloc, args.repeat, args.workers, args.chunk_size)
+        print(json.dumps(result))
+        return
+
+    if args.baseline and args.repeat < MIN_REPEAT:
+        parser.error(f"--baseline exige --repeat {MIN_REPEAT} ou mais (a mediana filtra o ruído)")
+
+    labels = [s.strip() for s in args.sizes.split(',') if s.strip()]
+    unknown = [s for s in labels if s not in SIZES]
+    if unknown:
+        parser.error(f"tamanhos desconhecidos: {', '.join(unknown)}")
+
+    report = {**environment(), 'seed': args.seed, 'repeat': args.repeat, 'alloc': not args.no_alloc,
+              'results': {}}
+    root = args.workdir or tempfile.mkdtemp(prefix='benchmark-')
+    try:
+        for label in labels:
+            # Um processo por tamanho: o pico de RSS de um não contamina o do seguinte
+            workdir = os.path.join(root, label)
+            os.makedirs(workdir, exist_ok=True)
+            cmd = [sys.executable, os.path.abspath(__file__), '--run-size', label, '--workdir', workdir,
+                   '--seed', str(args.seed), '--repeat', str(args.repeat), '--chunk-size', str(args.chunk_size)]
+            if args.no_alloc:
+                cmd.append('--no-alloc')
+            if args.workers:
+                cmd += ['--workers', str(args.workers)]
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+            if proc.returncode != 0:
+                sys.exit(f"benchmark de {label} falhou (código {proc.returncode})")
+            report['results'][label] = json.loads(proc.stdout.strip().splitlines()[-1])
+            if not args.keep_data:
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        if not args.workdir and not args.keep_data:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print_results(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResultados gravados em {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if baseline.get('repeat', 1) < MIN_REPEAT:
+            print(f"\nBaseline com menos de {MIN_REPEAT} execuções por etapa: tempos não comparados")
+        if regressions:
+            print(f"\nRegressões acima de {args.threshold:.0%}:")
+            for label, stage, metric, before, after in regressions:
+                print(f"  {label} {stage} {metric}: {before:.3f} → {after:.3f} ({after / before - 1:+.0%})")
+            sys.exit(1)
+        print(f"\nSem regressões acima de {args.threshold:.0%} em relação a {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+# Representação compacta dos incidentes em arrays
+#
+# Uma linha ocupa 13 bytes: cinco códigos uint8 e o da rota em uint16 (tabela fixa por dimensão:
+# valores do esquema, valores novos entram no fim; as rotas são abertas), o dia como uint16 a
+# partir de EPOCH e o custo em reais como int32. Os arrays ficam ordenados por dia, então
+# recortar um período é um slice (views, sem cópia). Filtros e agregações trabalham só nos
+# códigos; os rótulos são decodificados apenas para exibição (to_frame) e na montagem das
+# células do cubo (categóricas sobre a mesma tabela).
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from schema import CATEGORIES, COLUMNS
+
+EPOCH = np.datetime64('2000-01-01', 'D')
+MAX_DAY = np.iinfo(np.uint16).max
+COST_COLUMN = 'Custo Associado (R$)'
+CODE_COLUMNS = list(CATEGORIES)
+CODE_DTYPES = {col: np.uint16 if col == 'Rota/Local Crítico' else np.uint8 for col in CODE_COLUMNS}
+# Código de valor ausente por coluna (o maior do tipo); os válidos vão de 0 a MISSING[col] - 1
+MISSING = {col: int(np.iinfo(dtype).max) for col, dtype in CODE_DTYPES.items()}
+
+# A agregação usa contagem direta quando o espaço de chaves (dias × combinações) tem até
+# DENSE_KEYS chaves e até DENSE_PER_ROW por linha; senão ordena as chaves (np.unique). Sem o
+# limite por linha, um bloco pequeno alocaria contadores para todas as combinações possíveis
+DENSE_KEYS = 1 << 25
+DENSE_PER_ROW = 8
+
+
+def encode_days(dates):
+    days = np.asarray(dates, dtype='datetime64[D]') - EPOCH
+    days = days.astype(np.int64)
+    if len(days) and (days.min() < 0 or days.max() > MAX_DAY):
+        raise ValueError(f'datas fora da faixa suportada ({EPOCH} + {MAX_DAY} dias)')
+    return days.astype(np.uint16)
+
+
+def encode_costs(costs):
+    costs = np.asarray(costs)
+    if len(costs) and (costs.min() < np.iinfo(np.int32).min or costs.max() > np.iinfo(np.int32).max):
+        raise ValueError('custo fora da faixa de int32 (reais)')
+    return costs.astype(np.int32)
+
+
+def new_tables():
+    return {col: list(values) for col, values in CATEGORIES.items()}
+
+
+def lookup_codes(col, labels, tables):
+    # Rótulos de um bloco → tabela de consulta para os códigos fixos (valores novos entram no
+    # fim de tables[col]); a última posição atende o código -1 (ausente)
+    table = tables[col]
+    lut = np.empty(len(labels) + 1, dtype=CODE_DTYPES[col])
+    for i, value in enumerate(labels):
+        try:
+            lut[i] = table.index(value)
+        except ValueError:
+            if len(table) >= MISSING[col]:
+                raise ValueError(f'{col}: mais de {MISSING[col]} valores distintos')
+            lut[i] = len(table)
+            table.append(value)
+    lut[-1] = MISSING[col]
+    return lut
+
+
+class CompactIncidents:
+    def __init__(self, days, codes, cost, tables):
+        # days uint16 ordenados; codes {coluna: CODE_DTYPES}; cost int32; tables {coluna: rótulos}
+        self.days = days
+        self.codes = codes
+        self.cost = cost
+        self.tables = tables
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, np.uint16), {c: np.empty(0, CODE_DTYPES[c]) for c in CODE_COLUMNS},
+                   np.empty(0, np.int32), new_tables())
+
+    @classmethod
+    def _sorted(cls, days, codes, cost, tables):
+        if len(days) > 1 and (days[1:] < days[:-1]).any():
+            order = np.argsort(days, kind='stable')
+            days, cost = days[order], cost[order]
+            codes = {col: c[order] for col, c in codes.items()}
+        return cls(days, codes, cost, tables)
+
+    @classmethod
+    def from_frame(cls, df, tables=None):
+        # DataFrame no esquema de storage; tables (opcional) é compartilhada entre blocos e
+        # estendida com os valores novos
+        tables = new_tables() if tables is None else tables
+        codes = {}
+        for col in CODE_COLUMNS:
+            values = df[col]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype('category')
+            lut = lookup_codes(col, [str(v) for v in values.cat.categories], tables)
+            codes[col] = lut[values.cat.codes.to_numpy()]
+        return cls._sorted(encode_days(df['Data'].to_numpy('datetime64[D]')), codes,
+                           encode_costs(df[COST_COLUMN].to_numpy()), tables)
+
+    @classmethod
+    def from_table(cls, table, tables=None):
+        # Tabela Arrow (ex.: Parquet lido com memory map) → arrays, sem passar por pandas;
+        # cada bloco de dicionário é remapeado para a tabela fixa de códigos
+        tables = new_tables() if tables is None else tables
+        codes = {}
+        for col in CODE_COLUMNS:
+            column = table.column(col)
+            if not pa.types.is_dictionary(column.type):
+                column = pc.dictionary_encode(column)
+            parts = []
+            for chunk in column.chunks:
+                lut = lookup_codes(col, chunk.dictionary.to_pylist(), tables)
+                indices = chunk.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+                parts.append(lut[indices])
+            codes[col] = np.concatenate(parts) if parts else np.empty(0, CODE_DTYPES[col])
+        days = pc.cast(table.column('Data'), pa.int32()).to_numpy() - EPOCH.astype(np.int64)
+        if len(days) and (days.min() < 0 or days.max() > MAX_DAY):
+            raise ValueError(f'datas fora da faixa suportada ({EPOCH} + {MAX_DAY} dias)')
+        cost = encode_costs(table.column(COST_COLUMN).to_numpy())
+        return cls._sorted(days.astype(np.uint16), codes, cost, tables)
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def nbytes(self):
+        return self.days.nbytes + self.cost.nbytes + sum(c.nbytes for c in self.codes.values())
+
+    def dates(self):
+        return EPOCH + self.days.astype('timedelta64[D]')
+
+    def day_bounds(self, start=None, end=None):
+        # Offsets [lo, hi) das linhas com start <= dia <= end
+        lo = 0 if start is None else int(np.searchsorted(self.days, encode_day_bound(start), side='left'))
+        hi = len(self.days) if end is None else int(np.searchsorted(self.days, encode_day_bound(end), side='right'))
+        return lo, max(lo, hi)
+
+    def slice(self, start=None, end=None):
+        # Período → views dos arrays (sem cópia)
+        lo, hi = self.day_bounds(start, end)
+        return CompactIncidents(self.days[lo:hi], {col: c[lo:hi] for col, c in self.codes.items()},
+                                self.cost[lo:hi], self.tables)
+
+    def select(self, start=None, end=None, selections=None):
+        # selections: {coluna: rótulos}; devolve slice ou array de posições (como FilterIndex)
+        lo, hi = self.day_bounds(start, end)
+        mask = None
+        for col, selected in (selections or {}).items():
+            if not selected or set(selected).issuperset(self.tables[col]):
+                continue
+            lut = np.zeros(MISSING[col] + 1, dtype=bool)
+            wanted = set(selected)
+            for i, value in enumerate(self.tables[col]):
+                lut[i] = value in wanted
+            dim_mask = lut[self.codes[col][lo:hi]]
+            mask = dim_mask if mask is None else (mask & dim_mask)
+        return slice(lo, hi) if mask is None else lo + np.flatnonzero(mask)
+
+    def take(self, rows):
+        return CompactIncidents(self.days[rows], {col: c[rows] for col, c in self.codes.items()},
+                                self.cost[rows], self.tables)
+
+    def decode(self, col, codes=None):
+        # Códigos → categórica com a tabela fixa (os rótulos não são copiados por linha)
+        codes = self.codes[col] if codes is None else codes
+        raw = np.where(codes == MISSING[col], -1, codes).astype(np.int32)
+        return pd.Categorical.from_codes(raw, categories=self.tables[col])
+
+    def aggregate(self, dimensions):
+        # Células do cubo: uma chave inteira por (dia, códigos) em base mista, contagem e soma
+        # de custo por chave; rótulos só nas células resultantes
+        columns = [d for d in dimensions if d != 'Data']
+        if len(self) == 0:
+            return self.take(slice(0, 0)).to_frame().groupby(dimensions, observed=True).agg(
+                Incidentes=(COST_COLUMN, 'size'), Custo=(COST_COLUMN, 'sum')).reset_index()
+        first = int(self.days[0])
+        key = self.days.astype(np.int64) - first
+        size = int(self.days[-1]) - first + 1
+        radix = {}
+        for col in columns:
+            # Código ausente vira o último dígito da base (descartado no fim)
+            radix[col] = len(self.tables[col]) + 1
+            codes = self.codes[col].astype(np.int64)
+            codes[codes == MISSING[col]] = radix[col] - 1
+            key = key * radix[col] + codes
+            size *= radix[col]
+        if size <= DENSE_KEYS and size <= DENSE_PER_ROW * len(self):
+            # Espaço de chaves pequeno perto das linhas: contagem direta, sem ordenar
+            counts = np.bincount(key, minlength=size)
+            keys = np.flatnonzero(counts)
+            costs = np.bincount(key, weights=self.cost, minlength=size)[keys]
+            counts = counts[keys]
+        else:
+            keys, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+            costs = np.bincount(inverse, weights=self.cost, minlength=len(keys))
+        valid = np.ones(len(keys), dtype=bool)
+        cells = {}
+        for col in reversed(columns):
+            digit = keys % radix[col]
+            valid &= digit != radix[col] - 1
+            cells[col] = digit
+            keys = keys // radix[col]
+        cells['Data'] = (EPOCH + (keys + first).astype('timedelta64[D]')).astype('datetime64[ns]')
+        df = pd.DataFrame({'Data': cells['Data'][valid]})
+        for col in columns:
+            df[col] = pd.Categorical.from_codes(cells[col][valid], categories=self.tables[col])
+        df['Incidentes'] = counts[valid].astype(np.int64)
+        df['Custo'] = np.rint(costs[valid]).astype(np.int64)
+        return df[dimensions + ['Incidentes', 'Custo']]
+
+    def to_frame(self, rows=None):
+        # Decodifica para o DataFrame do esquema de storage (exibição/ferramentas)
+        part = self if rows is None else self.take(rows)
+        df = pd.DataFrame({'Data': part.dates().astype('datetime64[ns]')})
+        for col in CODE_COLUMNS:
+            df[col] = part.decode(col)
+        df[COST_COLUMN] = part.cost.astype(np.int64)
+        return df[COLUMNS]
+
+
+def encode_day_bound(value):
+    # Limite de período → dia relativo a EPOCH (com saturação nas pontas)
+    day = (np.datetime64(pd.Timestamp(value).date(), 'D') - EPOCH).astype(np.int64)
+    return int(min(max(day, -1), MAX_DAY + 1))
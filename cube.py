@@ -0,0 +1,78 @@
+# Cubo OLAP pré-agregado dos incidentes
+#
+# Cada célula é uma combinação (dia, transportadora, tipo de risco, criticidade, modal,
+# região, rota) com a contagem de incidentes e a soma dos custos. As dimensões têm baixa
+# cardinalidade, então o número de células depende de dias × combinações, não de linhas.
+# Todos os gráficos e cartões do dashboard somam células em vez de varrer incidentes.
+
+import pandas as pd
+
+import parallel
+import temporal
+from compact import CompactIncidents
+from filter_index import FilterIndex
+
+DIMENSIONS = [
+    'Data',
+    'Transportadora',
+    'Tipo de Risco',
+    'Nível de Criticidade',
+    'Modal Afetado',
+    'Região',
+    'Rota/Local Crítico',
+]
+
+
+def aggregate(df):
+    # df: DataFrame de incidentes ou CompactIncidents (agregado direto nos códigos, em
+    # paralelo quando é grande)
+    if isinstance(df, CompactIncidents):
+        return parallel.aggregate(df, DIMENSIONS)
+    cells = df.groupby(DIMENSIONS, observed=True, sort=False).agg(
+        Incidentes=('Custo Associado (R$)', 'size'),
+        Custo=('Custo Associado (R$)', 'sum'),
+    ).reset_index()
+    cells['Data'] = cells['Data'].astype('datetime64[ns]')
+    return cells
+
+
+def rollup(cells, by):
+    # Soma células agrupando pelas dimensões pedidas (ex.: ['Região'])
+    return cells.groupby(by, observed=True).agg(
+        Incidentes=('Incidentes', 'sum'),
+        Custo=('Custo', 'sum'),
+    ).reset_index()
+
+
+class IncidentCube:
+    def __init__(self, df):
+        self._set_cells(aggregate(df))
+
+    @classmethod
+    def from_cells(cls, cells):
+        # Cubo a partir de células já agregadas (ex.: agregação em streaming)
+        cube = cls.__new__(cls)
+        cube._set_cells(cells)
+        return cube
+
+    def _set_cells(self, cells):
+        # Rótulo do mês a partir do ordinal (formatado só uma vez por mês distinto)
+        cells['Mês'] = temporal.bucket_categorical(temporal.day_ordinals(cells['Data']), 'month')
+        self.index = FilterIndex(cells)
+        self.cells = self.index.df
+
+    def update(self, new_df):
+        # Agrega só as linhas novas e funde com as células existentes
+        if len(new_df) == 0:
+            return
+        new_cells = aggregate(new_df)
+        merged = pd.concat([self.cells.drop(columns='Mês'), new_cells], ignore_index=True)
+        for col in DIMENSIONS[1:]:
+            if isinstance(self.cells[col].dtype, pd.CategoricalDtype):
+                categories = self.cells[col].cat.categories.union(new_cells[col].astype(str).unique(), sort=False)
+                merged[col] = merged[col].astype(str).astype(pd.CategoricalDtype(categories))
+        merged = rollup(merged, DIMENSIONS)
+        self._set_cells(merged)
+
+    def slice(self, start=None, end=None, selections=None):
+        return self.index.filter(start, end, selections)
@@ -1,14 +1,30 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import datetime
-import matplotlib.pyplot as plt
-import seaborn as sns
-from PIL import Image
 import os
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+from figures import FIGURE_CACHE
+from aggregations import TOP_CARRIERS
+import queries
+import forecasting
+import alerts
+import geo
+import ingestion
+import optimizer
+import report
+import simulation
+import snapshots
+import temporal
+import tracing
+from registry import shared_registry
+from result_cache import shared_cache
 
 # Configuração da página
 st.set_page_config(
@@ -18,111 +34,91 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Função para carregar os dados
-@st.cache_data
-def load_data():
-    df = pd.read_csv('home/riscos_logisticos_2025.csv')
-    df['Data'] = pd.to_datetime(df['Data'])
-    return df
+# Diagnóstico (somente administradores: ?admin=<DASHBOARD_ADMIN_TOKEN>). Com o rastreamento ligado
+# no painel da sidebar, cada rerun registra o tempo (e opcionalmente a memória) de cada etapa
+ADMIN_TOKEN = os.environ.get('DASHBOARD_ADMIN_TOKEN')
+is_admin = bool(ADMIN_TOKEN) and st.query_params.get('admin') == ADMIN_TOKEN
+MAX_TRACES = 20
+
+def start_trace(label):
+    if not (is_admin and st.session_state.get('trace_on')):
+        return tracing.begin(None)
+    return tracing.begin(tracing.Trace(label, memory=st.session_state.get('trace_memory', False)))
+
+def keep_trace(trace):
+    if trace is not None:
+        traces = st.session_state.setdefault('traces', [])
+        traces.append(trace.finish())
+        del traces[:-MAX_TRACES]
+
+def traced_section(fn):
+    # Span da seção; num rerun só do fragmento (nenhum rerun da página em andamento), abre um
+    # rastreamento próprio
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        active = tracing.current()
+        if active is None or not active.finished:
+            with tracing.span(fn.__name__, 'seção'):
+                return fn(*args, **kwargs)
+        trace = start_trace('fragmento ' + fn.__name__)
+        try:
+            with tracing.span(fn.__name__, 'seção'):
+                return fn(*args, **kwargs)
+        finally:
+            keep_trace(trace)
+    return wrapper
+
+trace = start_trace('rerun')
+
+# Conjuntos de dados (registry.py, configurados em home/datasets.json): cada unidade de negócio
+# é carregada no primeiro acesso (store, detector de anomalias, modelos de previsão, grade do
+# mapa) e compartilhada entre sessões; os usados há mais tempo são despejados quando a memória
+# passa do orçamento. A cada rerun, o store aplica só os lotes novos do log/pasta de entrada ao
+# cubo pré-agregado. Com DASHBOARD_STREAMING=1 o histórico é lido em blocos
+datasets = shared_registry()
+
+# Visões derivadas do cubo (camada de consultas, a mesma usada pela API), guardadas no cache
+# de resultados do processo e compartilhadas entre sessões. Cada visão tem sua própria chave, então
+# uma seção só recalcula o que ela usa; a chave inclui a versão dos dias cobertos pelo período,
+# então um lote novo só invalida as visões cujo período o inclui.
+# As visões são compartilhadas: quem as usa não deve alterá-las
+def section_view(store, filters, name):
+    key = ('view', name, filters, store.data_key(filters.start, filters.end))
+    with tracing.span('visão.' + name, 'visão'):
+        return shared_cache().get_or_compute(key, lambda: queries.compute_view(store.cube, name, filters))
+
+# Seções abaixo da dobra são calculadas em segundo plano enquanto as de cima são desenhadas
+@st.cache_resource
+def section_pool():
+    return ThreadPoolExecutor(max_workers=4)
 
 # Carregar os dados
-df = load_data()
+names = list(datasets.datasets)
+dataset_name = names[0] if len(names) == 1 else st.sidebar.selectbox(
+    "Conjunto de dados", names, format_func=datasets.title, key='dataset')
+with tracing.span('carga.conjunto', dataset=dataset_name):
+    dataset = datasets.get(dataset_name)
+store, detector, geo_tiles = dataset.store, dataset.detector, dataset.geo
+with tracing.span('ingestão.refresh'):
+    if store.refresh():
+        datasets.remeasure(dataset_name)
+df = store.cube.cells
 
 # Estilo personalizado
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: 700;
-        color: #1E3A8A;
-        text-align: center;
-        margin-bottom: 1rem;
-        padding-bottom: 1rem;
-        border-bottom: 2px solid #E5E7EB;
-    }
-    .sub-header {
-        font-size: 1.8rem;
-        font-weight: 600;
-        color: #1E3A8A;
-        margin-top: 2rem;
-        margin-bottom: 1rem;
-    }
-    .card {
-        background-color: #F3F4F6;
-        border-radius: 10px;
-        padding: 1.5rem;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        margin-bottom: 1rem;
-    }
-    .metric-container {
-        display: flex;
-        justify-content: space-between;
-        flex-wrap: wrap;
-    }
-    .metric-card {
-        background-color: white;
-        border-radius: 8px;
-        padding: 1rem;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
-        margin-bottom: 1rem;
-        flex: 1;
-        min-width: 200px;
-        margin-right: 1rem;
-    }
-    .metric-title {
-        font-size: 1rem;
-        color: #6B7280;
-        margin-bottom: 0.5rem;
-    }
-    .metric-value {
-        font-size: 1.8rem;
-        font-weight: 700;
-        color: #1E3A8A;
-    }
-    .metric-change {
-        font-size: 0.9rem;
-        font-weight: 500;
-    }
-    .metric-change-positive {
-        color: #10B981;
-    }
-    .metric-change-negative {
-        color: #EF4444;
-    }
-    .alert-box {
-        background-color: #FECACA;
-        border-left: 5px solid #EF4444;
-        padding: 1rem;
-        border-radius: 5px;
-        margin-bottom: 1rem;
-    }
-    .insight-box {
-        background-color: #DBEAFE;
-        border-left: 5px solid #3B82F6;
-        padding: 1rem;
-        border-radius: 5px;
-        margin-bottom: 1rem;
-    }
-    .footer {
-        text-align: center;
-        margin-top: 3rem;
-        padding-top: 1rem;
-        border-top: 1px solid #E5E7EB;
-        color: #6B7280;
-        font-size: 0.9rem;
-    }
-</style>
-""", unsafe_allow_html=True)
+st.markdown(report.STYLE, unsafe_allow_html=True)
 
 # Sidebar para filtros
 st.sidebar.title("Filtros")
 
-# Filtro de data
+# Filtro de data (limites acompanham os lotes ingeridos)
+# (sem dados, o período é só o dia de hoje)
+min_date = df['Data'].iloc[0].date() if len(df) else datetime.date.today()
+max_date = df['Data'].iloc[-1].date() if len(df) else datetime.date.today()
 date_range = st.sidebar.date_input(
     "Período",
-    value=(datetime.date(2025, 1, 1), datetime.date(2025, 6, 5)),
-    min_value=datetime.date(2025, 1, 1),
-    max_value=datetime.date(2025, 6, 5)
+    value=(min_date, max_date),
+    min_value=min_date,
+    max_value=max_date
 )
 
 # Filtro de transportadora
@@ -157,277 +153,345 @@ selected_regions = st.sidebar.multiselect(
     default=all_regions
 )
 
-# Aplicar filtros
-filtered_df = df.copy()
-
-if len(date_range) == 2:
-    start_date, end_date = date_range
-    filtered_df = filtered_df[(filtered_df['Data'].dt.date >= start_date) & 
-                             (filtered_df['Data'].dt.date <= end_date)]
-
-if selected_carriers:
-    filtered_df = filtered_df[filtered_df['Transportadora'].isin(selected_carriers)]
-
-if selected_risk_types:
-    filtered_df = filtered_df[filtered_df['Tipo de Risco'].isin(selected_risk_types)]
-
-if selected_modals:
-    filtered_df = filtered_df[filtered_df['Modal Afetado'].isin(selected_modals)]
-
-if selected_regions:
-    filtered_df = filtered_df[filtered_df['Região'].isin(selected_regions)]
-
-# Cabeçalho principal
-st.markdown('<div class="main-header">Relatório Executivo Interativo sobre Riscos Logísticos</div>', unsafe_allow_html=True)
-st.markdown(f"<h3 style='text-align: center; margin-top: -10px;'>Brasil, 01/01/2025 - 05/06/2025</h3>", unsafe_allow_html=True)
-
-# Métricas principais
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.markdown("""
-    <div class="metric-card">
-        <div class="metric-title">Total de Incidentes</div>
-        <div class="metric-value">{}</div>
-        <div class="metric-change metric-change-negative">↑15% vs 2024</div>
-    </div>
-    """.format(len(filtered_df)), unsafe_allow_html=True)
-
-with col2:
-    total_cost = filtered_df['Custo Associado (R$)'].sum() / 1_000_000
-    st.markdown("""
-    <div class="metric-card">
-        <div class="metric-title">Custo Acumulado</div>
-        <div class="metric-value">R$ {:.1f} milhões</div>
-        <div class="metric-change metric-change-negative">↑27% no Q2 (El Niño)</div>
-    </div>
-    """.format(total_cost), unsafe_allow_html=True)
-
-with col3:
-    incidents_by_criticality = filtered_df['Nível de Criticidade'].value_counts()
-    high_criticality = incidents_by_criticality.get('Alto', 0)
-    high_criticality_pct = high_criticality / len(filtered_df) * 100 if len(filtered_df) > 0 else 0
-    st.markdown("""
-    <div class="metric-card">
-        <div class="metric-title">Incidentes Críticos</div>
-        <div class="metric-value">{} ({:.1f}%)</div>
-        <div class="metric-change">Nível de Criticidade Alto</div>
-    </div>
-    """.format(high_criticality, high_criticality_pct), unsafe_allow_html=True)
-
-with col4:
-    top_route = filtered_df['Rota/Local Crítico'].value_counts().index[0] if len(filtered_df) > 0 else "N/A"
-    top_route_count = filtered_df['Rota/Local Crítico'].value_counts().iloc[0] if len(filtered_df) > 0 else 0
-    top_route_pct = top_route_count / len(filtered_df) * 100 if len(filtered_df) > 0 else 0
-    st.markdown("""
-    <div class="metric-card">
-        <div class="metric-title">Rota Mais Crítica</div>
-        <div class="metric-value">{}</div>
-        <div class="metric-change">{} incidentes ({:.1f}%)</div>
-    </div>
-    """.format(top_route, top_route_count, top_route_pct), unsafe_allow_html=True)
-
-# Alerta prioritário da semana
-st.markdown("""
-<div class="alert-box">
-    <h3>⚠️ Alerta Prioritário da Semana (05/06–12/06)</h3>
-    <p>Greve anunciada por operadores ferroviários da Brado poderá impactar as operações entre Campinas e Santos. 
-    Recomenda-se redirecionar até 30% da carga para o modal rodoviário preventivamente.</p>
-</div>
-""", unsafe_allow_html=True)
-
-# Seção 1: Visão Geral do 1º Semestre de 2025
-st.markdown('<div class="sub-header">1. Visão Geral do 1º Semestre de 2025</div>', unsafe_allow_html=True)
-
-# Gráfico de linha temporal dos incidentes por mês, segmentado por tipo de risco
-filtered_df['Mês'] = filtered_df['Data'].dt.strftime('%Y-%m')
-incidents_by_month_risk = filtered_df.groupby(['Mês', 'Tipo de Risco']).size().reset_index(name='Incidentes')
-
-fig_timeline = px.line(incidents_by_month_risk, x='Mês', y='Incidentes', color='Tipo de Risco',
-                      title='Evolução de Incidentes por Tipo de Risco',
-                      markers=True, line_shape='linear')
-fig_timeline.update_layout(xaxis_title='Mês', yaxis_title='Número de Incidentes',
-                         legend_title='Tipo de Risco', height=500)
-st.plotly_chart(fig_timeline, use_container_width=True)
-
-# Eventos críticos
-col1, col2 = st.columns(2)
-
-with col1:
-    st.markdown("""
-    <div class="card">
-        <h4>Eventos Críticos</h4>
-        <ul>
-            <li><strong>Março:</strong> Enchentes em MG → R$ 18,2 milhões</li>
-            <li><strong>Abril:</strong> Ciberataque à Tegma → 12h de paralisação operacional</li>
-            <li><strong>05/06:</strong> Alerta de greve na Brado (SP)</li>
-        </ul>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col2:
-    # Gráfico de pizza para distribuição de custos por tipo de risco
-    cost_by_risk = filtered_df.groupby('Tipo de Risco')['Custo Associado (R$)'].sum().reset_index()
-    cost_by_risk['Custo (R$ milhões)'] = cost_by_risk['Custo Associado (R$)'] / 1_000_000
-    
-    fig_cost_pie = px.pie(cost_by_risk, values='Custo (R$ milhões)', names='Tipo de Risco',
-                         title='Distribuição de Custos por Tipo de Risco')
-    fig_cost_pie.update_traces(textposition='inside', textinfo='percent+label')
-    st.plotly_chart(fig_cost_pie, use_container_width=True)
-
-# Seção 2: Desempenho por Transportadora
-st.markdown('<div class="sub-header">2. Desempenho por Transportadora (TOP 3)</div>', unsafe_allow_html=True)
-
-# Tabela de desempenho das transportadoras
-top_carriers_df = filtered_df[filtered_df['Transportadora'].isin(['Brado', 'JSL', 'Tegma'])]
-carrier_metrics = top_carriers_df.groupby('Transportadora').agg(
-    Incidentes=('Transportadora', 'count'),
-    Custo_Total=('Custo Associado (R$)', 'sum')
-).reset_index()
-
-carrier_metrics['Custo Médio por Incidente'] = carrier_metrics['Custo_Total'] / carrier_metrics['Incidentes']
-carrier_metrics['Custo Médio por Incidente'] = carrier_metrics['Custo Médio por Incidente'].map('R$ {:,.0f}'.format)
-carrier_metrics['Custo_Total'] = carrier_metrics['Custo_Total'].map('R$ {:,.0f}'.format)
-
-# Identificar riscos predominantes por transportadora
-risk_by_carrier = {}
-for carrier in ['Brado', 'JSL', 'Tegma']:
-    carrier_df = filtered_df[filtered_df['Transportadora'] == carrier]
-    if len(carrier_df) > 0:
-        top_risk = carrier_df['Tipo de Risco'].value_counts().index[0]
-        top_risk_pct = carrier_df['Tipo de Risco'].value_counts().iloc[0] / len(carrier_df) * 100
-        risk_by_carrier[carrier] = f"{top_risk} ({top_risk_pct:.0f}%)"
-    else:
-        risk_by_carrier[carrier] = "N/A"
-
-carrier_metrics['Riscos Predominantes'] = carrier_metrics['Transportadora'].map(risk_by_carrier)
-carrier_metrics = carrier_metrics[['Transportadora', 'Incidentes', 'Custo Médio por Incidente', 'Riscos Predominantes']]
-
-# Exibir tabela formatada
-st.table(carrier_metrics)
-
-# Gráfico de barras comparativo
-carrier_incidents = filtered_df.groupby('Transportadora').size().reset_index(name='Incidentes')
-carrier_incidents = carrier_incidents.sort_values('Incidentes', ascending=False)
-
-fig_carriers = px.bar(carrier_incidents, x='Transportadora', y='Incidentes',
-                     title='Número de Incidentes por Transportadora',
-                     color='Transportadora')
-fig_carriers.update_layout(xaxis_title='Transportadora', yaxis_title='Número de Incidentes')
-st.plotly_chart(fig_carriers, use_container_width=True)
-
-# Seção 3: Mapa de Calor Geográfico
-st.markdown('<div class="sub-header">3. Mapa de Calor Geográfico</div>', unsafe_allow_html=True)
-
-col1, col2 = st.columns(2)
-
-with col1:
-    # Distribuição de incidentes por região
-    region_incidents = filtered_df.groupby('Região').size().reset_index(name='Incidentes')
-    region_incidents['Percentual'] = region_incidents['Incidentes'] / region_incidents['Incidentes'].sum() * 100
-    
-    fig_regions = px.bar(region_incidents, x='Região', y='Percentual',
-                        title='Distribuição de Incidentes por Região (%)',
-                        color='Região')
-    fig_regions.update_layout(xaxis_title='Região', yaxis_title='Percentual de Incidentes (%)')
-    st.plotly_chart(fig_regions, use_container_width=True)
-
-with col2:
-    # Rotas críticas
-    route_incidents = filtered_df.groupby('Rota/Local Crítico').size().reset_index(name='Incidentes')
-    route_incidents = route_incidents.sort_values('Incidentes', ascending=False).head(5)
-    
-    fig_routes = px.bar(route_incidents, x='Rota/Local Crítico', y='Incidentes',
-                       title='Top 5 Rotas Críticas',
-                       color='Rota/Local Crítico')
-    fig_routes.update_layout(xaxis_title='Rota/Local Crítico', yaxis_title='Número de Incidentes')
-    st.plotly_chart(fig_routes, use_container_width=True)
-
-# Estatísticas comparativas
-st.markdown("""
-<div class="insight-box">
-    <h3>Estatísticas Comparativas</h3>
-    <ul>
-        <li>↑23% nos roubos na BR-040 em relação ao mesmo período de 2024.</li>
-        <li>↑27% nos custos logísticos no segundo trimestre devido ao El Niño.</li>
-        <li>↓12% em acidentes no modal ferroviário comparado ao mesmo período de 2024.</li>
-    </ul>
-</div>
-""", unsafe_allow_html=True)
-
-# Seção 4: Previsões e Riscos para Julho/2025
-st.markdown('<div class="sub-header">4. Previsões e Riscos para Julho/2025</div>', unsafe_allow_html=True)
-
-col1, col2 = st.columns(2)
-
-with col1:
-    st.markdown("""
-    <div class="card">
-        <h4>Previsões para Julho/2025</h4>
-        <ul>
-            <li><strong>Probabilidade de novos protestos:</strong> 68%</li>
-            <li><strong>Rotas sob alerta:</strong> BR-116 (PR-SC)</li>
-            <li><strong>Custo estimado:</strong> R$ 12 a 15 milhões</li>
-        </ul>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col2:
-    # Gráfico de previsão de incidentes
-    months = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul']
-    incidents = [210, 195, 230, 215, 205, 185, 220]  # Julho é previsão
-    
-    fig_forecast = go.Figure()
-    fig_forecast.add_trace(go.Scatter(
-        x=months[:6], y=incidents[:6],
-        mode='lines+markers',
-        name='Dados Históricos',
-        line=dict(color='blue')
+# Aplicar filtros: o índice do cubo resolve período + seleções em células, sem tocar nos incidentes
+start_date, end_date = date_range if len(date_range) == 2 else (None, None)
+with tracing.span('filtros.normalizar'):
+    filters = queries.normalize(store.cube, queries.Filters(
+        start_date, end_date,
+        carriers=tuple(selected_carriers),
+        risk_types=tuple(selected_risk_types),
+        modals=tuple(selected_modals),
+        regions=tuple(selected_regions),
     ))
-    fig_forecast.add_trace(go.Scatter(
-        x=months[5:], y=incidents[5:],
-        mode='lines+markers',
-        name='Previsão',
-        line=dict(color='red', dash='dash')
+
+# Figura → (visões usadas, construtor); os construtores ficam em report.py, compartilhados com os snapshots
+CHARTS = {
+    **report.CHARTS,
+    'map': (('route',), functools.partial(report.map_figure, geo_tiles)),
+}
+# Figuras que ficam abaixo da dobra: começam a ser calculadas antes de a página chegar nelas
+BELOW_THE_FOLD = ['carriers', 'regions', 'routes']
+
+def figure_spec(store, filters, name, *options):
+    # JSON da figura para o estado de filtros (+ opções dos controles da própria figura); figuras
+    # com a mesma chave reaproveitam o JSON já serializado, e uma figura em construção no pool de
+    # fundo não é construída de novo
+    view_names, build = CHARTS[name]
+    key = (filters, store.data_key(filters.start, filters.end), options)
+    return FIGURE_CACHE.get(name, key, lambda: build(*(section_view(store, filters, v) for v in view_names), *options))
+
+def plot(spec, key):
+    # Spec sem traços (nenhum dado nos filtros) vira um aviso: o st.plotly_chart recusa specs vazios
+    if not spec.get('data'):
+        st.info("Sem dados para os filtros selecionados.")
+        return
+    st.plotly_chart(spec, width='stretch', key=key)
+
+def show_chart(filters, name, *options):
+    with tracing.span('gráfico.' + name, 'figura'):
+        plot(figure_spec(store, filters, name, *options), 'fig-' + name.replace('_', '-'))
+
+# Altura do quadro do snapshot (px); a página rola dentro dele
+SNAPSHOT_HEIGHT = 4800
+
+# Snapshot pré-renderizado (python snapshots.py) dos dados atuais para estes filtros, se houver;
+# "Calcular ao vivo" na sidebar volta ao relatório interativo
+@st.cache_resource(max_entries=8)
+def read_snapshot(path, mtime):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+with tracing.span('snapshot.busca'):
+    snapshot = snapshots.lookup(dataset.dataset, store, filters)
+if snapshot is not None and st.sidebar.toggle("Calcular ao vivo", key='snapshot-live',
+                                              help=f'Snapshot "{snapshot.title}" de {snapshot.created}'):
+    snapshot = None
+
+if snapshot is None:
+    for name in BELOW_THE_FOLD:
+        section_pool().submit(tracing.bind(figure_spec), store, filters, name)
+
+def period_bounds(filters):
+    return pd.Timestamp(filters.start or min_date), pd.Timestamp(filters.end or max_date)
+
+# Cada seção é um fragmento: recalcula só as visões de que depende, e interações dentro dela
+# não reexecutam a página inteira
+
+# Métricas principais: uma passada sobre as células produz todos os KPIs e a tabela TOP 3
+@st.fragment
+@traced_section
+def metrics_section(filters):
+    kpis = section_view(store, filters, 'kpis')
+    with tracing.span('histórico.carga', 'visão'):
+        hist = dataset.history()
+    start, end = period_bounds(filters)
+    yoy = hist.year_over_year(start, end, filters.selections())
+    qoq = hist.quarter_over_quarter(end, filters.selections())
+    for col, card in zip(st.columns(4), report.metric_cards(kpis, yoy, qoq, end)):
+        col.markdown(card, unsafe_allow_html=True)
+
+@st.fragment
+@traced_section
+def overview_section(filters):
+    # Gráfico de linha temporal dos incidentes por período, segmentado por tipo de risco
+    granularity = st.radio("Agrupar por", temporal.GRANULARITIES, index=temporal.GRANULARITIES.index('month'),
+                           format_func=temporal.LABELS.get, horizontal=True, key='timeline-granularity')
+    show_chart(filters, 'timeline_' + granularity)
+
+    # Eventos críticos
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # Eventos detectados pelo monitor de anomalias no período e seleções filtrados
+        with tracing.span('alertas.eventos', 'visão'):
+            events = alerts.critical_events(detector.active(filters.start, filters.end, filters.selections()))
+        st.markdown(report.events_card(events), unsafe_allow_html=True)
+
+    with col2:
+        show_chart(filters, 'cost_pie')
+
+@st.fragment
+@traced_section
+def carriers_section(filters):
+    # Tabela de desempenho das transportadoras (riscos predominantes já vêm da agregação fundida)
+    carrier_metrics = section_view(store, filters, 'kpis').carrier_table(TOP_CARRIERS)
+
+    # Exibir tabela formatada
+    st.table(carrier_metrics)
+
+    show_chart(filters, 'carriers')
+
+@st.fragment
+@traced_section
+def geography_section(filters):
+    # Zoom/recorte por região ou rota: cada combinação lê um nível já agregado da grade
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        area = st.selectbox("Área", list(geo.VIEWPORTS), key='map-area')
+    with col2:
+        detail = st.select_slider("Detalhe da grade", options=[4, 5, 6, 7, 8], value=6,
+                                  format_func=lambda d: f'{2 ** d} tiles', key='map-detail')
+    with col3:
+        measure = st.radio("Medida", ['Incidentes', 'Custo'], horizontal=True, key='map-measure')
+    show_chart(filters, 'map', area, detail, measure)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        show_chart(filters, 'regions')
+
+    with col2:
+        show_chart(filters, 'routes')
+
+# Estatísticas comparativas: mesmas comparações, sobre os filtros da sidebar
+@st.fragment
+@traced_section
+def comparisons_section(filters):
+    with tracing.span('histórico.carga', 'visão'):
+        hist = dataset.history()
+    start, end = period_bounds(filters)
+    st.markdown(report.comparisons_box(hist, start, end, filters.selections()), unsafe_allow_html=True)
+
+# Previsões: modelos por segmento ajustados uma vez por conjunto de dados e avançados com os dias
+# novos; dependem só dos filtros de dimensão (o período da sidebar não se aplica)
+def forecast_view(store, filters):
+    filters = replace(filters, start=None, end=None)
+    with tracing.span('previsão.sync', 'visão'):
+        forecaster = dataset.forecaster.sync(store)
+    key = ('view', 'forecast', filters, store.data_key())
+    with tracing.span('visão.forecast', 'visão'):
+        return shared_cache().get_or_compute(key, lambda: forecasting.outlook(forecaster, store.cube, filters))
+
+# Exposição a custos por Monte Carlo no horizonte da previsão; os lotes chegam aos poucos e cada
+# estimativa parcial é repassada a progress() de quem calcula (quem chega durante o cálculo, ex.:
+# a seção enquanto o pré-cálculo roda, espera o resultado completo), que vai para o cache
+def exposure_view(store, filters, horizon, progress=None):
+    filters = replace(filters, start=None, end=None)
+    key = ('view', 'exposure', filters, horizon, store.data_key())
+
+    def compute():
+        with tracing.span('visão.exposure', 'visão', horizon=horizon):
+            model = simulation.fit(store.cube, filters)
+            for exposure in simulation.run(model, horizon):
+                if progress is not None:
+                    progress(exposure)
+        return exposure
+
+    return shared_cache().get_or_compute(key, compute)
+
+def forecast_horizon(outlook):
+    target = outlook['target']
+    return (target.end - target.start).days + 1
+
+def forecast_spec(store, filters, outlook):
+    key = (replace(filters, start=None, end=None), store.data_key())
+    return FIGURE_CACHE.get('forecast', key, lambda: report.forecast_figure(outlook))
+
+def prefetch_forecast(store, filters):
+    # Seção mais pesada (previsão + Monte Carlo): calculada em segundo plano, como as figuras
+    # abaixo da dobra
+    outlook = forecast_view(store, filters)
+    forecast_spec(store, filters, outlook)
+    exposure_view(store, filters, forecast_horizon(outlook))
+
+@st.fragment
+@traced_section
+def forecast_section(filters):
+    outlook = forecast_view(store, filters)
+
+    # Seção 4: Previsões e Riscos para o mês seguinte aos dados
+    st.markdown('<div class="sub-header">4. Previsões e Riscos para {}</div>'.format(outlook['label']), unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # O cartão é redesenhado a cada lote da simulação
+        with tracing.span('alertas.rotas', 'visão'):
+            routes = alerts.alert_routes(detector.active(filters.start, filters.end, filters.selections()))
+        card = st.empty()
+        exposure = exposure_view(store, filters, forecast_horizon(outlook),
+                                 lambda partial: card.markdown(report.exposure_card(outlook, partial, routes), unsafe_allow_html=True))
+        card.markdown(report.exposure_card(outlook, exposure, routes), unsafe_allow_html=True)
+
+    with col2:
+        # Gráfico de previsão de incidentes, com intervalo de previsão
+        with tracing.span('gráfico.forecast', 'figura'):
+            plot(forecast_spec(store, filters, outlook), 'fig-forecast')
+
+    with st.expander("Exposição por transportadora e rota em {} (simulação, R$ milhões)".format(outlook['label'])):
+        for col, table in zip(st.columns(2), (exposure.carriers, exposure.routes)):
+            values = table.columns[1:]
+            col.dataframe(table.assign(**{c: table[c] / 1_000_000 for c in values}).round(2),
+                          hide_index=True, width='stretch')
+
+def plan_view(store, filters, unavailable=()):
+    # A exposição de cada faixa usa todo o histórico: a chave inclui a versão de todos os dias
+    key = ('view', 'plan', filters, unavailable, store.data_key())
+    with tracing.span('visão.plan', 'visão'):
+        return shared_cache().get_or_compute(key, lambda: optimizer.plan(store.cube, filters, unavailable))
+
+@st.fragment
+@traced_section
+def insights_section(filters):
+    lanes = plan_view(store, filters).lanes
+    pairs = sorted(set(zip(lanes['Transportadora'].astype(str), lanes['Modal Afetado'].astype(str))))
+    unavailable = st.multiselect("Simular paralisação (greve, bloqueio)", pairs, format_func=' – '.join,
+                                 key='plan-unavailable')
+    plan = plan_view(store, filters, tuple(sorted(unavailable)))
+    st.markdown(report.insight_boxes(plan), unsafe_allow_html=True)
+
+    with st.expander("Índices de risco (custo esperado por unidade de carga; 1 = média)"):
+        for col, dimension in zip(st.columns(len(optimizer.LANE)), optimizer.LANE):
+            scores = plan.scores(dimension)
+            col.dataframe(scores[[dimension, 'Índice de Risco']].round(2), hide_index=True, width='stretch')
+
+if snapshot is not None:
+    # Página estática inteira (cabeçalho, seções e rodapé), sem recalcular nenhuma visão
+    with tracing.span('snapshot.página'):
+        html = read_snapshot(snapshot.path, os.path.getmtime(snapshot.path))
+    st.iframe(html, height=SNAPSHOT_HEIGHT)
+else:
+    # A previsão (seção 4) começa a ser calculada antes de a página chegar nela
+    section_pool().submit(tracing.bind(prefetch_forecast), store, filters)
+
+    # Cabeçalho principal
+    st.markdown('<div class="main-header">Relatório Executivo Interativo sobre Riscos Logísticos</div>', unsafe_allow_html=True)
+    period_start, period_end = period_bounds(filters)
+    st.markdown("<h3 style='text-align: center; margin-top: -10px;'>{}</h3>".format(report.subtitle(period_start, period_end)), unsafe_allow_html=True)
+
+    metrics_section(filters)
+
+    # Alerta prioritário da semana: o alerta mais grave dos últimos 7 dias de dados
+    with tracing.span('alertas.prioridade', 'visão'):
+        week_start, week_end, priority = detector.priority()
+    if week_start is not None:
+        st.markdown(report.priority_box(week_start, week_end, priority), unsafe_allow_html=True)
+
+    # Seção 1: Visão Geral do período filtrado
+    st.markdown('<div class="sub-header">{}</div>'.format(report.overview_title(period_start, period_end)), unsafe_allow_html=True)
+    overview_section(filters)
+
+    # Seção 2: Desempenho por Transportadora
+    st.markdown('<div class="sub-header">2. Desempenho por Transportadora (TOP 3)</div>', unsafe_allow_html=True)
+    carriers_section(filters)
+
+    # Seção 3: Mapa de Calor Geográfico
+    st.markdown('<div class="sub-header">3. Mapa de Calor Geográfico</div>', unsafe_allow_html=True)
+    geography_section(filters)
+
+    # Estatísticas comparativas
+    comparisons_section(filters)
+
+    forecast_section(filters)
+
+    # Insights Acionáveis
+    st.markdown('<div class="sub-header">Insights Acionáveis</div>', unsafe_allow_html=True)
+    insights_section(filters)
+
+    # Comentário sobre o El Niño
+    st.markdown(report.EL_NINO_COMMENT, unsafe_allow_html=True)
+
+    # Rodapé (data do último incidente carregado)
+    st.markdown(report.footer(max_date if len(df) else None), unsafe_allow_html=True)
+
+keep_trace(trace)
+
+# Painel de diagnóstico: cascata das etapas de cada rerun e exportação no formato Chrome Trace
+def waterfall_figure(frame):
+    labels = ['  ' * level + name for level, name in zip(frame['Nível'], frame['Etapa'])]
+    fig_waterfall = go.Figure(go.Bar(
+        y=labels, x=frame['Duração (ms)'], base=frame['Início (ms)'], orientation='h',
+        marker_color=[px.colors.qualitative.Plotly[t % 10] for t in frame['Thread']],
+        customdata=frame[['Duração (ms)', 'Memória (MB)']].fillna(0),
+        hovertemplate='%{y}<br>%{customdata[0]:.1f} ms · %{customdata[1]:+.1f} MB<extra></extra>'
     ))
-    fig_forecast.update_layout(
-        title='Previsão de Incidentes para Julho/2025',
-        xaxis_title='Mês',
-        yaxis_title='Número de Incidentes'
-    )
-    st.plotly_chart(fig_forecast, use_container_width=True)
-
-# Insights Acionáveis
-st.markdown('<div class="sub-header">Insights Acionáveis</div>', unsafe_allow_html=True)
-
-st.markdown("""
-<div class="insight-box">
-    <h4>1. Reforçar segurança nas rotas com mais roubos</h4>
-    <p>Os roubos na BR-040 cresceram 23% no 1º semestre de 2025, com pico em fevereiro. Recomenda-se: 1) Aumentar patrulhamento, 2) Redirecionar 15% da carga para ferrovias, 3) Reforçar seguros até 15/06.</p>
-</div>
-
-<div class="insight-box">
-    <h4>2. Redirecionar cargas de alto valor para modais menos vulneráveis</h4>
-    <p>Análise mostra que cargas de alto valor no modal rodoviário têm 3x mais chances de roubo. Recomenda-se transferir 40% das cargas premium para o modal ferroviário nas rotas Sul-Sudeste.</p>
-</div>
-
-<div class="insight-box">
-    <h4>3. Investir em sensores climáticos para prever riscos naturais</h4>
-    <p>O fenômeno El Niño intensificou eventos climáticos no Sul e Sudeste, elevando os custos logísticos em 27% no segundo trimestre. Recomenda-se a instalação de sensores em 12 pontos críticos para antecipação de 48h em eventos climáticos severos.</p>
-</div>
-""", unsafe_allow_html=True)
-
-# Comentário sobre o El Niño
-st.markdown("""
-<div class="card">
-    <h4>Comentário sobre o El Niño (Q2/2025)</h4>
-    <p>"O fenômeno El Niño intensificou eventos climáticos no Sul e Sudeste, elevando os custos logísticos em 27% no segundo trimestre. As enchentes em Minas Gerais em março foram o evento mais impactante, gerando custos de R$ 18,2 milhões e afetando principalmente as operações da JSL e Brado na região."</p>
-</div>
-""", unsafe_allow_html=True)
-
-# Rodapé
-st.markdown("""
-<div class="footer">
-    <p>Relatório Executivo Interativo sobre Riscos Logísticos | Brasil, 2025 | Atualizado em: 05/06/2025</p>
-</div>
-""", unsafe_allow_html=True)
+    fig_waterfall.update_layout(xaxis_title='ms desde o início do rerun', height=max(250, 18 * len(frame)),
+                                yaxis=dict(autorange='reversed'), margin=dict(l=0, r=0, t=20, b=0))
+    return fig_waterfall
+
+def datasets_frame(stats):
+    return pd.DataFrame([
+        {'Conjunto': d['title'], 'Carregado': d['loaded'], 'Memória (MB)': d['bytes'] / 2**20,
+         'Acessos': d['accesses'], 'Cargas': d['loads'],
+         'Última carga (s)': d['last_load_seconds'], 'Despejos': d['evictions'],
+         'Último despejo (ms)': None if d['last_eviction_seconds'] is None else d['last_eviction_seconds'] * 1000}
+        for d in stats['datasets'].values()
+    ])
+
+def ingestion_frame(reports):
+    return pd.DataFrame([
+        {'Arquivo': os.path.basename(r.source), 'Lido às': time.strftime('%H:%M:%S', time.localtime(r.created)),
+         'Linhas': r.rows, 'Rejeitadas': r.rejected, 'Linhas/s': r.rows_per_second, 'MB/s': r.mb_per_second,
+         'Quarentena': r.quarantine or ''}
+        for r in reversed(reports)
+    ])
+
+if is_admin:
+    with st.sidebar.expander("Diagnóstico", expanded=True):
+        # Conjuntos de dados: memória estimada, cargas a frio e despejos do registro
+        stats = datasets.stats()
+        st.caption("Conjuntos de dados: {:.0f} de {:.0f} MB".format(stats['used_bytes'] / 2**20,
+                                                                  stats['memory_budget'] / 2**20))
+        st.dataframe(datasets_frame(stats).round(3), hide_index=True)
+        # Leituras de CSV deste processo: vazão e linhas mandadas para a quarentena
+        reports = ingestion.recent_reports()
+        if reports:
+            st.caption("Ingestão de CSV")
+            st.dataframe(ingestion_frame(reports).round(1), hide_index=True)
+        st.checkbox("Rastrear etapas", key='trace_on')
+        st.checkbox("Amostrar memória (tracemalloc)", key='trace_memory')
+        traces = st.session_state.get('traces', [])
+        if not traces:
+            st.caption("Ligue o rastreamento e interaja com o relatório para registrar os reruns.")
+        else:
+            labels = ['{} · {} · {:.0f} ms'.format(t.label, time.strftime('%H:%M:%S', time.localtime(t.created)), t.total_ms)
+                      for t in traces]
+            choice = st.selectbox("Rerun", range(len(traces)), index=len(traces) - 1, format_func=labels.__getitem__)
+            frame = traces[choice].to_frame()
+            st.plotly_chart(waterfall_figure(frame), width='stretch', key='fig-waterfall')
+            by_stage = frame.groupby('Etapa')['Duração (ms)'].agg(['count', 'sum']).sort_values('sum', ascending=False)
+            st.dataframe(by_stage.rename(columns={'count': 'Spans', 'sum': 'Total (ms)'}).round(1))
+            if st.button("Exportar rastros"):
+                st.caption("Gravado em {}".format(tracing.export(traces)))
+            st.download_button("Baixar rastros (Chrome Trace)", json.dumps(tracing.to_chrome(traces), ensure_ascii=False),
+                               file_name='rerun.json', mime='application/json')
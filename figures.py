@@ -0,0 +1,133 @@
+# Pipeline de figuras Plotly com redução de payload
+#
+#   - séries temporais longas são reduzidas no servidor (LTTB ou mín/máx por balde) para um
+#     número alvo de pontos antes de virar figura
+#   - o spec de cada figura (JSON serializado e decodificado uma vez) é cacheado pela chave do
+#     estado de filtros; figuras cujas entradas não mudaram não são reconstruídas e saem byte a
+#     byte idênticas, o que permite ao frontend reaproveitar o gráfico já desenhado (mesma key,
+#     mesmo spec)
+
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+import tracing
+
+# Pontos por série a partir dos quais a série é reduzida
+TARGET_POINTS = 500
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: devolve os índices dos pontos mantidos
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(y, n_buckets):
+    # Mínimo e máximo de cada balde (preserva picos); devolve índices ordenados
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    starts = edges[:-1]
+    idx_min = starts + np.array([np.argmin(y[s:e]) for s, e in zip(edges[:-1], edges[1:])])
+    idx_max = starts + np.array([np.argmax(y[s:e]) for s, e in zip(edges[:-1], edges[1:])])
+    return np.unique(np.concatenate([idx_min, idx_max]))
+
+
+def downsample(df, x, y, color=None, target=TARGET_POINTS, method='lttb'):
+    # Reduz cada série (uma por valor de color) a ~target pontos; séries curtas passam intactas
+    groups = [df] if color is None else [g for _, g in df.groupby(color, observed=True, sort=False)]
+    if all(len(g) <= target for g in groups):
+        return df
+    parts = []
+    for g in groups:
+        g = g.sort_values(x)
+        xs = g[x]
+        if pd.api.types.is_datetime64_any_dtype(xs):
+            xs = xs.astype('int64')
+        elif not pd.api.types.is_numeric_dtype(xs):
+            xs = pd.factorize(xs, sort=True)[0]
+        keep = lttb(xs, g[y], target) if method == 'lttb' else minmax(g[y].to_numpy(), target // 2)
+        parts.append(g.iloc[keep])
+    return pd.concat(parts, ignore_index=True)
+
+
+class FigureCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def _lookup(self, cache_key):
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                return self._entries[cache_key]
+        return None
+
+    def get(self, name, key, build):
+        # build() só é chamado quando (name, key) não está no cache; quem pede uma figura já em
+        # construção (ex.: pré-cálculo em segundo plano) espera por ela em vez de construí-la de novo.
+        # O cache guarda o spec já decodificado do JSON (serializado uma vez, na construção) e
+        # o devolve a todas as chamadas sem cópia nem novo parse: o spec é somente leitura (o
+        # st.plotly_chart monta um Figure novo a partir dele e não o altera)
+        cache_key = (name, key)
+        spec = self._lookup(cache_key)
+        if spec is None:
+            spec = self._spec(name, cache_key, build)
+        return spec
+
+    def _spec(self, name, cache_key, build):
+        with self._lock:
+            if cache_key in self._entries:
+                return self._entries[cache_key]
+            future = self._inflight.get(cache_key)
+            owner = future is None
+            if owner:
+                future = self._inflight[cache_key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            with tracing.span(f'figura.{name}', 'figura'):
+                fig = build()
+            with tracing.span(f'figura.{name}.json', 'figura'):
+                spec = json.loads(fig.to_json())
+            with self._lock:
+                self._entries[cache_key] = spec
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(spec)
+        finally:
+            with self._lock:
+                self._inflight.pop(cache_key, None)
+        return spec
+
+
+FIGURE_CACHE = FigureCache()
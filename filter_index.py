@@ -0,0 +1,70 @@
+# Índice de filtros dos incidentes
+#
+# Construído uma única vez sobre o DataFrame carregado:
+#   - linhas ordenadas por data, com busca binária para recortar o período
+#   - códigos inteiros por dimensão categórica; a seleção da sidebar vira uma tabela
+#     de consulta (LUT) por dimensão, aplicada só às linhas dentro do período
+# A seleção devolve posições de linha; o DataFrame original nunca é copiado inteiro.
+
+import numpy as np
+import pandas as pd
+
+import temporal
+
+# Dimensões filtráveis na sidebar
+DIMENSIONS = ['Transportadora', 'Tipo de Risco', 'Modal Afetado', 'Região']
+
+
+class FilterIndex:
+    def __init__(self, df, dimensions=DIMENSIONS):
+        dates = df['Data'].to_numpy('datetime64[D]')
+        if len(dates) > 1 and (dates[1:] < dates[:-1]).any():
+            order = np.argsort(dates, kind='stable')
+            df = df.iloc[order].reset_index(drop=True)
+            dates = dates[order]
+        self.df = df
+        self.dates = dates
+        self.days = temporal.day_ordinals(dates)
+        self.codes = {}
+        self.categories = {}
+        for col in dimensions:
+            values = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype('category')
+            self.codes[col] = values.cat.codes.to_numpy()
+            self.categories[col] = list(values.cat.categories)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def date_bounds(self, start=None, end=None):
+        # Offsets [lo, hi) das linhas com start <= Data <= end
+        return temporal.range_bounds(self.days, start, end)
+
+    def _lut(self, col, selected):
+        # None/vazio = sem filtro (mesma semântica do multiselect vazio na sidebar)
+        if not selected:
+            return None
+        categories = self.categories[col]
+        wanted = set(selected)
+        if wanted.issuperset(categories):
+            return None
+        lut = np.zeros(len(categories) + 1, dtype=bool)  # última posição = código -1 (NaN)
+        for i, value in enumerate(categories):
+            lut[i] = value in wanted
+        return lut
+
+    def select(self, start=None, end=None, selections=None):
+        # selections: {coluna: valores selecionados}; devolve slice ou array de posições
+        lo, hi = self.date_bounds(start, end)
+        mask = None
+        for col, selected in (selections or {}).items():
+            lut = self._lut(col, selected)
+            if lut is None:
+                continue
+            dim_mask = lut[self.codes[col][lo:hi]]
+            mask = dim_mask if mask is None else (mask & dim_mask)
+        if mask is None:
+            return slice(lo, hi)
+        return lo + np.flatnonzero(mask)
+
+    def filter(self, start=None, end=None, selections=None):
+        return self.df.iloc[self.select(start, end, selections)]
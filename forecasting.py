@@ -0,0 +1,339 @@
+# Previsão de incidentes e custos por segmento (transportadora × tipo de risco × região)
+#
+# Cada segmento tem duas séries diárias (incidentes e custo), ajustadas todas de uma vez:
+#   - perfil semanal por série, encolhido para o perfil global quando o segmento tem pouco histórico
+#   - suavização exponencial simples do nível dessazonalizado, com alpha escolhido por série
+#     em uma grade (erro quadrático de um passo à frente)
+# O ajuste é vetorizado sobre todas as séries; com muitas células o trabalho é dividido entre
+# processos. Os parâmetros ficam no Forecaster e são atualizados incrementalmente quando chegam
+# dias novos (só o nível e a variância avançam); alpha e sazonalidade são reajustados a cada
+# REFIT_DAYS dias novos ou quando dias já ajustados mudam. Custos diários extremos são limitados
+# antes do ajuste: a previsão de custo é a de um mês sem eventos extraordinários.
+#
+# Uma previsão para qualquer combinação de filtros soma os segmentos selecionados: a média é a
+# soma das médias e a variância a soma das variâncias (erros independentes entre segmentos),
+# com intervalo normal. O filtro de modal, que não é dimensão dos segmentos, entra como a
+# participação histórica dos modais selecionados.
+
+import datetime
+import os
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+
+from cube import rollup
+from schema import MONTH_NAMES_PT, MONTHS_PT
+
+# Dimensões dos segmentos
+SEGMENT_DIMENSIONS = ['Transportadora', 'Tipo de Risco', 'Região']
+
+# Grade de alphas testada por série
+ALPHAS = np.array([0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.3])
+
+# Peso (em dias com incidentes) do perfil semanal global no perfil de cada segmento
+SEASON_PRIOR = 50
+
+# Dias usados para iniciar o nível
+INIT_DAYS = 28
+
+# Dias novos acumulados a partir dos quais alpha e sazonalidade são reajustados
+REFIT_DAYS = 28
+
+# Custo diário limitado no ajuste a este múltiplo da mediana dos dias com custo da série
+COST_CAP_FACTOR = 5
+
+# Intervalo de previsão de 90%
+INTERVAL_Z = 1.645
+
+# Séries × dias a partir dos quais o ajuste é dividido entre processos
+PARALLEL_MIN_CELLS = 5_000_000
+
+# Tipo de risco do cartão de protestos
+STRIKE_RISK = 'Greve'
+
+
+@dataclass
+class Forecast:
+    start: datetime.date
+    end: datetime.date
+    incidents: float
+    incidents_low: float
+    incidents_high: float
+    cost: float
+    cost_low: float
+    cost_high: float
+
+    @property
+    def days(self):
+        return (self.end - self.start).days + 1
+
+    @property
+    def probability_daily(self):
+        # Probabilidade de ao menos um incidente num dia do período (Poisson com a taxa diária
+        # prevista); sobre o período inteiro a probabilidade satura em 100% para qualquer
+        # segmento com histórico
+        return 1.0 - float(np.exp(-self.incidents / max(self.days, 1)))
+
+
+def weekday(day):
+    # Dia da semana (segunda = 0) de um datetime64[D]; 01/01/1970 foi uma quinta-feira
+    return (day.astype(np.int64) + 3) % 7
+
+
+def days_between(first, last):
+    return int((last - first).astype(np.int64))
+
+
+def daily_matrix(cube, first_day, n_days, start=None):
+    # Séries diárias (2 × segmentos, dias): incidentes nas primeiras linhas, custos nas seguintes
+    index = cube.index
+    shape = [len(index.categories[col]) for col in SEGMENT_DIMENSIONS]
+    n_segments = int(np.prod(shape))
+    lo, hi = index.date_bounds(start, None)
+    codes = [index.codes[col][lo:hi] for col in SEGMENT_DIMENSIONS]
+    valid = np.all([c >= 0 for c in codes], axis=0)
+    segment = np.ravel_multi_index([c[valid] for c in codes], shape)
+    day = (index.dates[lo:hi][valid] - first_day).astype(np.int64)
+    flat = segment * n_days + day
+    cells = cube.cells.iloc[lo:hi]
+    size = n_segments * n_days
+    incidents = np.bincount(flat, weights=cells['Incidentes'].to_numpy()[valid], minlength=size)
+    cost = np.bincount(flat, weights=cells['Custo'].to_numpy(dtype=np.float64)[valid], minlength=size)
+    return np.concatenate([incidents, cost]).reshape(2 * n_segments, n_days)
+
+
+def weekly_profile(y, dow):
+    # Média por dia da semana / média geral, por série; nan onde não há dados
+    sums = np.stack([y[:, dow == d].sum(axis=1) for d in range(7)], axis=1)
+    days = np.array([(dow == d).sum() for d in range(7)], dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / days
+        return means / y.mean(axis=1, keepdims=True)
+
+
+def fit_segments(task):
+    # Ajusta um bloco de séries; task = (y, dias da semana, perfil global de cada série)
+    y, dow, prior = task
+    n_series, n_days = y.shape
+    profile = weekly_profile(y, dow)
+    weight = (y > 0).sum(axis=1, keepdims=True)
+    profile = np.where(np.isnan(profile), prior, profile)
+    season = (weight * profile + SEASON_PRIOR * prior) / (weight + SEASON_PRIOR)
+    season = season / season.mean(axis=1, keepdims=True)
+    season = np.where(np.isfinite(season) & (season > 0), season, 1.0)
+
+    z = y / season[:, dow]
+    init = z[:, :INIT_DAYS].mean(axis=1)
+    level = np.tile(init, (len(ALPHAS), 1))
+    sse = np.zeros_like(level)
+    alphas = ALPHAS[:, None]
+    for t in range(n_days):
+        err = y[:, t] - level * season[:, dow[t]]
+        sse += err * err
+        level += alphas * (z[:, t] - level)
+
+    best = sse.argmin(axis=0)
+    rows = np.arange(n_series)
+    return ALPHAS[best], level[best, rows], season, sse[best, rows]
+
+
+class Forecaster:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self.data_id = None
+        self.categories = None
+        self.first_day = None
+        self.last_day = None
+        self.fitted_day = None
+        self.version = None
+
+    def sync(self, store):
+        # Acompanha o IncidentStore: ajuste completo na primeira vez, após recarga, quando dias
+        # já ajustados mudam ou a cada REFIT_DAYS dias; fora isso só avança com os dias novos
+        with self._lock:
+            cube = store.cube
+            if not len(cube.index.dates):
+                # Conjunto sem dias (novo, ou com todas as linhas em quarentena): previsão vazia
+                # até chegarem dados
+                self.data_id = self.last_day = self.fitted_day = self.version = None
+                return self
+            categories = [cube.index.categories[col] for col in SEGMENT_DIMENSIONS]
+            last_day = cube.index.dates[-1]
+            data_id = (store.fingerprint, store.reload_version)
+            if (self.data_id != data_id or self.categories != categories
+                    or store.version_for(None, self.last_day) != self.version
+                    or days_between(self.fitted_day, last_day) >= REFIT_DAYS):
+                self.fit(cube)
+                self.data_id = data_id
+            elif last_day > self.last_day:
+                self.advance(cube)
+            self.version = store.version_for(None, self.last_day)
+        return self
+
+    def fit(self, cube):
+        index = cube.index
+        self.categories = [index.categories[col] for col in SEGMENT_DIMENSIONS]
+        self.first_day, self.last_day = index.dates[0], index.dates[-1]
+        self.fitted_day = self.last_day
+        n_days = days_between(self.first_day, self.last_day) + 1
+        y = daily_matrix(cube, self.first_day, n_days)
+        dow = weekday(self.first_day + np.arange(n_days))
+
+        # Custos diários extremos (ex.: enchentes) são limitados a COST_CAP_FACTOR × a mediana
+        # da série, para que poucos eventos não dominem o nível e a largura do intervalo
+        half = len(y) // 2
+        self.caps = np.full(len(y), np.inf)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # séries sem nenhum custo
+            median = np.nanmedian(np.where(y[half:] > 0, y[half:], np.nan), axis=1)
+        self.caps[half:] = np.where(np.isnan(median), np.inf, COST_CAP_FACTOR * median)
+        y = np.minimum(y, self.caps[:, None])
+
+        # Perfil global por métrica (incidentes, custo), usado como prior de todos os segmentos
+        prior = np.empty((len(y), 7))
+        for rows in (slice(0, half), slice(half, None)):
+            prior[rows] = weekly_profile(y[rows].sum(axis=0, keepdims=True), dow)
+        prior = np.where(np.isfinite(prior), prior, 1.0)
+
+        if y.size >= PARALLEL_MIN_CELLS and self.workers > 1:
+            blocks = np.array_split(np.arange(len(y)), self.workers)
+            tasks = [(y[b], dow, prior[b]) for b in blocks if len(b)]
+            with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+                parts = list(pool.map(fit_segments, tasks))
+            alpha, level, season, sse = (np.concatenate(p) for p in zip(*parts))
+        else:
+            alpha, level, season, sse = fit_segments((y, dow, prior))
+        self.alpha, self.level, self.season, self.sse = alpha, level, season, sse
+        self.observations = n_days
+
+    def advance(self, cube):
+        # Atualiza nível e variância com os dias posteriores ao último ajustado
+        new_days = days_between(self.last_day, cube.index.dates[-1])
+        y = daily_matrix(cube, self.last_day + 1, new_days, start=self.last_day + 1)
+        y = np.minimum(y, self.caps[:, None])
+        dow = weekday(self.last_day + 1 + np.arange(new_days))
+        for t in range(new_days):
+            seasonal = self.season[:, dow[t]]
+            err = y[:, t] - self.level * seasonal
+            self.sse += err * err
+            self.level += self.alpha * (y[:, t] / seasonal - self.level)
+        self.observations += new_days
+        self.last_day = self.last_day + new_days
+
+    def segment_mask(self, filters):
+        masks = []
+        for col, values in zip(SEGMENT_DIMENSIONS, self.categories):
+            selected = filters.selections()[col]
+            masks.append(np.array([not selected or v in selected for v in values]))
+        return np.logical_and.outer(np.logical_and.outer(masks[0], masks[1]), masks[2]).ravel()
+
+    def forecast(self, filters, start, end, modal_share=(1.0, 1.0)):
+        # Previsão dos dias [start, end] posteriores ao último dia observado
+        if self.last_day is None:
+            return Forecast(start, end, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        first = max(np.datetime64(start, 'D'), self.last_day + 1)
+        last = np.datetime64(end, 'D')
+        if last < first:
+            return Forecast(start, end, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        a, b = days_between(self.last_day, first), days_between(self.last_day, last)
+
+        # Média: nível × soma dos fatores sazonais dos dias do período
+        dow_counts = np.bincount(weekday(first + np.arange(b - a + 1)), minlength=7)
+        mean = self.level * (self.season @ dow_counts)
+
+        # Variância da soma de h = a..b passos à frente: e_h = ε_h + alpha Σ_{j<h} ε_j, então
+        # Var = σ² Σ_j (1[a≤j≤b] + alpha n_j)², com n_j = #{h em [a, b] : h > j}
+        j = np.arange(1, b + 1)
+        inside = (j >= a).astype(np.float64)
+        after = np.maximum(0, b - np.maximum(j, a - 1)).astype(np.float64)
+        sigma2 = self.sse / self.observations
+        var = sigma2 * (inside.sum() + 2 * self.alpha * (inside * after).sum()
+                        + self.alpha ** 2 * (after * after).sum())
+
+        selected = np.tile(self.segment_mask(filters), 2)
+        half = len(mean) // 2
+        values = []
+        for rows, share in ((slice(0, half), modal_share[0]), (slice(half, None), modal_share[1])):
+            m = mean[rows][selected[rows]].sum() * share
+            s = np.sqrt(var[rows][selected[rows]].sum()) * share
+            values += [float(m), float(max(0.0, m - INTERVAL_Z * s)), float(m + INTERVAL_Z * s)]
+        return Forecast(start, end, *values)
+
+    def next_month(self):
+        # Primeiro e último dia do mês seguinte ao do último dia observado (sem dados, ao de hoje)
+        last_day = pd.Timestamp.today() if self.last_day is None else pd.Timestamp(self.last_day)
+        month = last_day.to_period('M') + 1
+        return month.start_time.date(), month.end_time.date()
+
+
+def modal_share(cube, filters):
+    # Participação histórica (incidentes, custo) dos modais selecionados nos segmentos filtrados
+    if not filters.modals:
+        return 1.0, 1.0
+    selections = filters.selections()
+    total = cube.slice(None, None, {**selections, 'Modal Afetado': []})
+    chosen = cube.slice(None, None, selections)
+    return tuple(chosen[c].sum() / total[c].sum() if total[c].sum() else 0.0
+                 for c in ('Incidentes', 'Custo'))
+
+
+def month_label(period, with_year=False):
+    label = MONTHS_PT[period.month - 1]
+    return f'{label}/{period.year % 100:02d}' if with_year else label
+
+
+def outlook(forecaster, cube, filters):
+    # Histórico mensal + previsão até o fim do mês seguinte ao último dia observado, para os
+    # filtros de dimensão (o período da sidebar não se aplica à previsão)
+    filters = replace(filters, start=None, end=None)
+    target_start, target_end = forecaster.next_month()
+    label = f'{MONTH_NAMES_PT[target_start.month - 1]}/{target_start.year}'
+    if forecaster.last_day is None:
+        empty = Forecast(target_start, target_end, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        months = pd.DataFrame(columns=['Período', 'Incidentes', 'Previsão', 'Mínimo', 'Máximo', 'Custo', 'Mês', 'Parcial'])
+        return {'label': label, 'months': months, 'target': empty, 'strike': empty}
+    share = modal_share(cube, filters)
+    monthly = rollup(cube.slice(None, None, filters.selections()), 'Mês')
+    monthly['Mês'] = pd.PeriodIndex(monthly['Mês'], freq='M')
+    monthly = monthly.set_index('Mês')
+
+    last_day = pd.Timestamp(forecaster.last_day)
+    current = last_day.to_period('M')
+    months = pd.period_range(monthly.index.min() if len(monthly) else current, current + 1, freq='M')
+    rows = []
+    for period in months:
+        observed = monthly['Incidentes'].get(period, 0) if period <= current else np.nan
+        observed_cost = monthly['Custo'].get(period, 0) if period <= current else 0.0
+        if period < current or (period == current and last_day == period.end_time.normalize()):
+            rows.append((period, observed, observed, observed, observed, observed_cost))
+            continue
+        # Mês corrente (parcial): observado + restante previsto; mês seguinte: só previsão
+        start = (last_day + pd.Timedelta(days=1)).date() if period == current else target_start
+        end = period.end_time.date() if period == current else target_end
+        f = forecaster.forecast(filters, start, end, share)
+        base = 0 if np.isnan(observed) else observed
+        rows.append((period, observed, base + f.incidents, base + f.incidents_low,
+                     base + f.incidents_high, observed_cost + f.cost))
+    frame = pd.DataFrame(rows, columns=['Período', 'Incidentes', 'Previsão', 'Mínimo', 'Máximo', 'Custo'])
+    with_year = len({p.year for p in months}) > 1
+    frame['Mês'] = [month_label(p, with_year) for p in frame['Período']]
+    frame['Parcial'] = [p == current and last_day < p.end_time.normalize() for p in frame['Período']]
+    frame['Período'] = frame['Período'].astype(str)
+
+    target = forecaster.forecast(filters, target_start, target_end, share)
+    # Protestos só quando o filtro de tipos de risco os inclui (None quando os exclui)
+    strike = None
+    if not filters.risk_types or STRIKE_RISK in filters.risk_types:
+        strikes = replace(filters, risk_types=(STRIKE_RISK,))
+        strike = forecaster.forecast(strikes, target_start, target_end, modal_share(cube, strikes))
+    return {
+        'label': label,
+        'months': frame,
+        'target': target,
+        'strike': strike,
+    }
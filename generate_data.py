@@ -1,241 +1,315 @@
-import pandas as pd
-import numpy as np
+# Gerador de incidentes logísticos fictícios (também usado como gerador de carga)
+#
+# Exemplos:
+#   python generate_data.py                                   # dataset do dashboard (1.240 incidentes)
+#   python generate_data.py --rows 10000000 --seed 7 --format parquet --output /tmp/incidentes.parquet
+#   python generate_data.py --rows 1000000 --geo --output /tmp/incidentes_geo.parquet   # com Latitude/Longitude
+#
+# Tudo é vetorizado com np.random.Generator. As linhas são geradas em blocos (chunks)
+# em paralelo por processos e gravadas em streaming, sem montar o DataFrame inteiro.
+# As datas são sorteadas globalmente (contagem por dia) antes da divisão em blocos,
+# então a saída já sai ordenada por data.
+
+import argparse
 import datetime
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import geo
+import storage
+from schema import CARRIERS, COLUMNS, GEO_COLUMNS, CRITICALITY_LEVELS, MODALS, REGIONS, RISK_TYPES, ROUTES
 
 # Parâmetros
 start_date = datetime.date(2025, 1, 1)
 end_date = datetime.date(2025, 6, 5)
 num_incidents = 1240
-total_cost_target = 89.7  # R$ milhões
-carriers = ["JSL", "Rumo", "Tegma", "Brado", "Mercúrio", "LATAM Cargo"]
-risk_types = ["Climático", "Roubo", "Acidente", "Greve", "Operacional"]
-criticality_levels = ["Baixo", "Médio", "Alto"]
-modals = ["Rodoviário", "Ferroviário", "Aéreo"]
-regions = ["Sudeste", "Sul", "Nordeste", "Centro-Oeste", "Norte"]
+total_cost_target = 89.7  # R$ milhões para num_incidents (escala com o número de linhas)
+mean_cost_per_incident = (total_cost_target * 1_000_000) / num_incidents
+carriers = CARRIERS
+risk_types = RISK_TYPES
+criticality_levels = CRITICALITY_LEVELS
+modals = MODALS
+regions = REGIONS
 
 # Pesos para simular a distribuição desejada
 carrier_weights = [0.20, 0.15, 0.18, 0.22, 0.13, 0.12] # JSL, Rumo, Tegma, Brado, Mercúrio, LATAM
 risk_weights = [0.25, 0.30, 0.15, 0.05, 0.25] # Climático, Roubo, Acidente, Greve, Operacional
 region_weights = [0.58, 0.15, 0.12, 0.10, 0.05] # Sudeste, Sul, Nordeste, Centro-Oeste, Norte
-modal_weights = [0.70, 0.20, 0.10] # Rodoviário, Ferroviário, Aéreo
 criticality_weights = [0.4, 0.35, 0.25] # Baixo, Médio, Alto
 
-# Gerar datas aleatórias no período
-date_range = pd.date_range(start_date, end_date)
-dates = np.random.choice(date_range, num_incidents)
-
-# Gerar dados aleatórios com base nos pesos
-data = {
-    "Data": dates,
-    "Transportadora": np.random.choice(carriers, num_incidents, p=carrier_weights),
-    "Tipo de Risco": np.random.choice(risk_types, num_incidents, p=risk_weights),
-    "Nível de Criticidade": np.random.choice(criticality_levels, num_incidents, p=criticality_weights),
-    "Modal Afetado": np.random.choice(modals, num_incidents, p=modal_weights),
-    "Região": np.random.choice(regions, num_incidents, p=region_weights)
+# Participação alvo das TOP 3 (Brado 142, JSL 128, Tegma 119 em 1.240 incidentes);
+# as demais transportadoras dividem o restante conforme carrier_weights
+carrier_targets = {"Brado": 142 / 1240, "JSL": 128 / 1240, "Tegma": 119 / 1240}
+
+# Risco predominante forçado por transportadora: Brado Roubos (62%), JSL Climáticos (57%),
+# Tegma Operacionais (48%)
+dominant_risks = {"Brado": ("Roubo", 0.62), "JSL": ("Climático", 0.57), "Tegma": ("Operacional", 0.48)}
+
+# Modal por transportadora (linha = transportadora, colunas = Rodoviário, Ferroviário, Aéreo)
+carrier_modal_weights = {
+    "Rumo": [0.0, 1.0, 0.0],
+    "Brado": [0.2, 0.8, 0.0],
+    "LATAM Cargo": [0.0, 0.0, 1.0],
 }
 
-df = pd.DataFrame(data)
-
-# Ajustar modais por transportadora (simplificado)
-df.loc[df["Transportadora"] == "Rumo", "Modal Afetado"] = "Ferroviário"
-df.loc[df["Transportadora"] == "Brado", "Modal Afetado"] = np.random.choice(["Ferroviário", "Rodoviário"], size=len(df[df["Transportadora"] == "Brado"]), p=[0.8, 0.2])
-df.loc[df["Transportadora"] == "LATAM Cargo", "Modal Afetado"] = "Aéreo"
-df.loc[~df["Transportadora"].isin(["Rumo", "Brado", "LATAM Cargo"]), "Modal Afetado"] = "Rodoviário"
-
-# Ajustar tipos de risco predominantes para TOP 3
-# Brado: Roubos (62%)
-brado_indices = df[df["Transportadora"] == "Brado"].index
-num_brado = len(brado_indices)
-if num_brado > 0:
-    df.loc[np.random.choice(brado_indices, int(num_brado * 0.62), replace=False), "Tipo de Risco"] = "Roubo"
-
-# JSL: Climáticos (57%)
-jsl_indices = df[df["Transportadora"] == "JSL"].index
-num_jsl = len(jsl_indices)
-if num_jsl > 0:
-    df.loc[np.random.choice(jsl_indices, int(num_jsl * 0.57), replace=False), "Tipo de Risco"] = "Climático"
-
-# Tegma: Operacionais (48%)
-tegma_indices = df[df["Transportadora"] == "Tegma"].index
-num_tegma = len(tegma_indices)
-if num_tegma > 0:
-    df.loc[np.random.choice(tegma_indices, int(num_tegma * 0.48), replace=False), "Tipo de Risco"] = "Operacional"
-
-# Gerar custos associados (distribuição log-normal para simular custos maiores menos frequentes)
-# Ajustar a média para chegar perto do total desejado
-mean_cost_per_incident = (total_cost_target * 1_000_000) / num_incidents
-# Usar uma distribuição gamma ou log-normal para custos
-# Log-normal: Média = exp(mu + sigma^2 / 2), Var = (exp(sigma^2) - 1) * exp(2*mu + sigma^2)
-# Vamos simplificar com uma exponencial + base, ajustando a escala
+# Rotas críticas por região
+region_routes = {
+    "Sudeste": {"BR-040 (RJ-MG)": 0.3, "Porto de Santos (SP)": 0.3, "Aeroporto de Guarulhos (GRU)": 0.2, "Outra Sudeste": 0.2},
+    "Sul": {"BR-116 (PR-SC)": 0.4, "Outra Sul": 0.6},
+}
+
+# Custos: exponencial + base, multiplicador uniforme por criticidade
 base_cost = 10000
-scale_cost = mean_cost_per_incident * 0.8 # Ajustar escala para tentar atingir o alvo
-costs = np.random.exponential(scale=scale_cost, size=num_incidents) + base_cost
+criticality_cost_multipliers = {"Baixo": (1.0, 1.0), "Médio": (1.1, 1.8), "Alto": (1.5, 3.0)}
 
-# Aumentar custo para riscos críticos
-costs[df["Nível de Criticidade"] == "Alto"] *= np.random.uniform(1.5, 3.0, size=len(costs[df["Nível de Criticidade"] == "Alto"]))
-costs[df["Nível de Criticidade"] == "Médio"] *= np.random.uniform(1.1, 1.8, size=len(costs[df["Nível de Criticidade"] == "Médio"]))
+# Eventos específicos
+enchentes_date = datetime.date(2025, 3, 15)  # Março: Enchentes em MG (bloco que contém o meio do mês)
+enchentes_cost = 18_200_000
+num_high_cost_floods = 5
+ciberataque_date = datetime.date(2025, 4, 15)  # Abril: Ciberataque à Tegma
 
-# Ajustar custo total para ficar próximo de R$ 89.7M
-costs = (costs / costs.sum()) * (total_cost_target * 1_000_000)
-df["Custo Associado (R$)"] = costs.astype(int)
 
-# Inserir eventos específicos
-# Março: Enchentes em MG -> R$ 18,2 milhões (vamos alocar parte do custo total para isso)
-enchentes_cost = 18_200_000
-enchentes_indices = df[(df["Data"].dt.month == 3) & (df["Região"] == "Sudeste") & (df["Tipo de Risco"] == "Climático")].index
-if len(enchentes_indices) > 0:
-    # Selecionar alguns incidentes de enchente em março no Sudeste para ter custo alto
-    num_high_cost_floods = min(len(enchentes_indices), 5) # Ex: 5 incidentes somam o custo
-    chosen_flood_indices = np.random.choice(enchentes_indices, num_high_cost_floods, replace=False)
-
-    # Reduzir custo de outros incidentes para compensar
-    current_total_cost = df["Custo Associado (R$)"].sum()
-    if current_total_cost > enchentes_cost:
-        reduction_factor = 1 - (enchentes_cost / current_total_cost)
-        df["Custo Associado (R$)"] = (df["Custo Associado (R$)"] * reduction_factor).astype(int)
-    else:
-        # Caso raro onde o custo das enchentes é maior que o total atual (improvável com os ajustes)
-        df["Custo Associado (R$)"] = (df["Custo Associado (R$)"] * 0.1).astype(int) # Reduzir drasticamente
-
-    # Atribuir custo aos incidentes de enchente escolhidos
-    cost_per_flood = enchentes_cost / num_high_cost_floods
-    df.loc[chosen_flood_indices, "Custo Associado (R$)"] = int(cost_per_flood)
-    df.loc[chosen_flood_indices, "Nível de Criticidade"] = "Alto"
-    # Garantir que o custo total ainda esteja próximo
-    df["Custo Associado (R$)"] = (df["Custo Associado (R$)"] / df["Custo Associado (R$)"].sum()) * (total_cost_target * 1_000_000)
-    df["Custo Associado (R$)"] = df["Custo Associado (R$)"].astype(int)
-
-# Abril: Ciberataque à Tegma (vamos adicionar um evento específico)
-ciberataque_date = datetime.date(2025, 4, 15) # Data exemplo
-ciberataque_cost = np.random.randint(500_000, 2_000_000) # Custo exemplo
-ciberataque_event = pd.DataFrame([{
-    "Data": pd.Timestamp(ciberataque_date),
-    "Transportadora": "Tegma",
-    "Tipo de Risco": "Operacional",
-    "Nível de Criticidade": "Alto",
-    "Modal Afetado": "Rodoviário", # Ou relevante para Tegma
-    "Região": "Sudeste", # Exemplo
-    "Custo Associado (R$)": ciberataque_cost
-}])
-df = pd.concat([df, ciberataque_event], ignore_index=True)
-
-# 05/06: Alerta de greve na Brado (SP) (Não é um incidente passado, mas um alerta. Será adicionado no texto do dashboard)
-
-# Ajustar contagem total de incidentes para exatamente 1240, se necessário
-if len(df) > num_incidents:
-    df = df.sample(n=num_incidents, random_state=42).reset_index(drop=True)
-elif len(df) < num_incidents:
-    # Adicionar mais alguns incidentes genéricos se faltar
-    num_missing = num_incidents - len(df)
-    missing_dates = np.random.choice(date_range, num_missing)
-    missing_data = {
-        "Data": missing_dates,
-        "Transportadora": np.random.choice(carriers, num_missing, p=carrier_weights),
-        "Tipo de Risco": np.random.choice(risk_types, num_missing, p=risk_weights),
-        "Nível de Criticidade": np.random.choice(criticality_levels, num_missing, p=criticality_weights),
-        "Modal Afetado": np.random.choice(modals, num_missing, p=modal_weights),
-        "Região": np.random.choice(regions, num_missing, p=region_weights),
-        "Custo Associado (R$)": np.random.exponential(scale=mean_cost_per_incident * 0.5, size=num_missing).astype(int)
-    }
-    missing_df = pd.DataFrame(missing_data)
-    # Ajustar modais para transportadoras específicas nos dados faltantes
-    missing_df.loc[missing_df["Transportadora"] == "Rumo", "Modal Afetado"] = "Ferroviário"
-    missing_df.loc[missing_df["Transportadora"] == "Brado", "Modal Afetado"] = np.random.choice(["Ferroviário", "Rodoviário"], size=len(missing_df[missing_df["Transportadora"] == "Brado"]), p=[0.8, 0.2])
-    missing_df.loc[missing_df["Transportadora"] == "LATAM Cargo", "Modal Afetado"] = "Aéreo"
-    missing_df.loc[~missing_df["Transportadora"].isin(["Rumo", "Brado", "LATAM Cargo"]), "Modal Afetado"] = "Rodoviário"
-    df = pd.concat([df, missing_df], ignore_index=True)
-
-# Reajustar custo total final
-df["Custo Associado (R$)"] = (df["Custo Associado (R$)"] / df["Custo Associado (R$)"].sum()) * (total_cost_target * 1_000_000)
-df["Custo Associado (R$)"] = df["Custo Associado (R$)"].astype(int)
-
-# Adicionar coluna de rota crítica (simulada baseada na região)
-def assign_route(region):
-    if region == "Sudeste":
-        return np.random.choice(["BR-040 (RJ-MG)", "Porto de Santos (SP)", "Aeroporto de Guarulhos (GRU)", "Outra Sudeste"], p=[0.3, 0.3, 0.2, 0.2])
-    elif region == "Sul":
-        return np.random.choice(["BR-116 (PR-SC)", "Outra Sul"], p=[0.4, 0.6])
-    else:
-        return f"Outra {region}"
-
-df["Rota/Local Crítico"] = df["Região"].apply(assign_route)
-
-# Garantir que as contagens das TOP 3 transportadoras estejam próximas do desejado
-# Reajustar levemente se necessário (pode distorcer outras métricas, usar com cuidado)
-# Exemplo: forçar contagem da Brado para 142
-brado_target = 142
-current_brado_count = df[df["Transportadora"] == "Brado"].shape[0]
-diff = brado_target - current_brado_count
-if diff != 0:
-    other_indices = df[df["Transportadora"] != "Brado"].index
-    brado_indices = df[df["Transportadora"] == "Brado"].index
-    if diff > 0 and len(other_indices) >= diff:
-        # Precisa adicionar Brado
-        change_indices = np.random.choice(other_indices, diff, replace=False)
-        df.loc[change_indices, "Transportadora"] = "Brado"
-        # Reajustar modal e risco para Brado
-        df.loc[change_indices, "Modal Afetado"] = np.random.choice(["Ferroviário", "Rodoviário"], size=len(change_indices), p=[0.8, 0.2])
-        df.loc[np.random.choice(change_indices, int(len(change_indices) * 0.62), replace=False), "Tipo de Risco"] = "Roubo"
-    elif diff < 0 and len(brado_indices) >= -diff:
-        # Precisa remover Brado
-        change_indices = np.random.choice(brado_indices, -diff, replace=False)
-        # Trocar para outra transportadora (ex: JSL)
-        df.loc[change_indices, "Transportadora"] = "JSL"
-        # Reajustar modal e risco para JSL
-        df.loc[change_indices, "Modal Afetado"] = "Rodoviário"
-        df.loc[np.random.choice(change_indices, int(len(change_indices) * 0.57), replace=False), "Tipo de Risco"] = "Climático"
-
-# Garantir contagem JSL
-jsl_target = 128
-current_jsl_count = df[df["Transportadora"] == "JSL"].shape[0]
-diff_jsl = jsl_target - current_jsl_count
-if diff_jsl != 0:
-    other_indices_jsl = df[df["Transportadora"] != "JSL"].index
-    jsl_indices = df[df["Transportadora"] == "JSL"].index
-    if diff_jsl > 0 and len(other_indices_jsl) >= diff_jsl:
-        change_indices_jsl = np.random.choice(other_indices_jsl, diff_jsl, replace=False)
-        df.loc[change_indices_jsl, "Transportadora"] = "JSL"
-        df.loc[change_indices_jsl, "Modal Afetado"] = "Rodoviário"
-        df.loc[np.random.choice(change_indices_jsl, int(len(change_indices_jsl) * 0.57), replace=False), "Tipo de Risco"] = "Climático"
-    elif diff_jsl < 0 and len(jsl_indices) >= -diff_jsl:
-        change_indices_jsl = np.random.choice(jsl_indices, -diff_jsl, replace=False)
-        df.loc[change_indices_jsl, "Transportadora"] = "Mercúrio" # Trocar para outra menos proeminente
-        df.loc[change_indices_jsl, "Modal Afetado"] = "Rodoviário"
-
-# Garantir contagem Tegma
-tegma_target = 119
-current_tegma_count = df[df["Transportadora"] == "Tegma"].shape[0]
-diff_tegma = tegma_target - current_tegma_count
-if diff_tegma != 0:
-    other_indices_tegma = df[df["Transportadora"] != "Tegma"].index
-    tegma_indices = df[df["Transportadora"] == "Tegma"].index
-    if diff_tegma > 0 and len(other_indices_tegma) >= diff_tegma:
-        change_indices_tegma = np.random.choice(other_indices_tegma, diff_tegma, replace=False)
-        df.loc[change_indices_tegma, "Transportadora"] = "Tegma"
-        df.loc[change_indices_tegma, "Modal Afetado"] = "Rodoviário"
-        df.loc[np.random.choice(change_indices_tegma, int(len(change_indices_tegma) * 0.48), replace=False), "Tipo de Risco"] = "Operacional"
-    elif diff_tegma < 0 and len(tegma_indices) >= -diff_tegma:
-        change_indices_tegma = np.random.choice(tegma_indices, -diff_tegma, replace=False)
-        df.loc[change_indices_tegma, "Transportadora"] = "Mercúrio"
-        df.loc[change_indices_tegma, "Modal Afetado"] = "Rodoviário"
-
-# Ordenar por data
-df = df.sort_values(by="Data").reset_index(drop=True)
-
-# Salvar em CSV
-output_path = "/home/ubuntu/riscos_logisticos_2025.csv"
-df.to_csv(output_path, index=False, date_format='%Y-%m-%d')
-
-print(f"Dados fictícios gerados e salvos em {output_path}")
-print(f"Total de incidentes: {len(df)}")
-print(f"Custo total: R$ {df['Custo Associado (R$)'].sum() / 1_000_000:.1f} milhões")
-
-# Verificar algumas métricas
-print("\nVerificação de Métricas:")
-print(f"Incidentes Brado: {df[df['Transportadora'] == 'Brado'].shape[0]}")
-print(f"Incidentes JSL: {df[df['Transportadora'] == 'JSL'].shape[0]}")
-print(f"Incidentes Tegma: {df[df['Transportadora'] == 'Tegma'].shape[0]}")
-print(f"% Roubos Brado: {df[(df['Transportadora'] == 'Brado') & (df['Tipo de Risco'] == 'Roubo')].shape[0] / df[df['Transportadora'] == 'Brado'].shape[0]:.1%}")
-print(f"% Climáticos JSL: {df[(df['Transportadora'] == 'JSL') & (df['Tipo de Risco'] == 'Climático')].shape[0] / df[df['Transportadora'] == 'JSL'].shape[0]:.1%}")
-print(f"% Operacionais Tegma: {df[(df['Transportadora'] == 'Tegma') & (df['Tipo de Risco'] == 'Operacional')].shape[0] / df[df['Transportadora'] == 'Tegma'].shape[0]:.1%}")
-print(f"% Região Sudeste: {df[df['Região'] == 'Sudeste'].shape[0] / len(df):.1%}")
+def carrier_probabilities():
+    p = np.zeros(len(carriers))
+    others = [i for i, c in enumerate(carriers) if c not in carrier_targets]
+    other_weights = np.array([carrier_weights[i] for i in others])
+    remaining = 1 - sum(carrier_targets.values())
+    for i, c in enumerate(carriers):
+        if c in carrier_targets:
+            p[i] = carrier_targets[c]
+    p[others] = remaining * other_weights / other_weights.sum()
+    return p
+
+
+def _cdf_table(rows):
+    # Uma linha de probabilidades por código → CDF para amostragem por busca vetorizada
+    table = np.cumsum(np.asarray(rows, dtype=float), axis=1)
+    table[:, -1] = 1.0
+    return table
+
+
+def _draw(rng, cdf, keys):
+    # Amostra uma categoria por linha usando a CDF da linha keys[i]
+    u = rng.random(len(keys))
+    return (u[:, None] >= cdf[keys]).sum(axis=1)
+
+
+def _route_table():
+    table = np.zeros((len(regions), len(ROUTES)))
+    for r, region in enumerate(regions):
+        for route, p in region_routes.get(region, {f"Outra {region}": 1.0}).items():
+            table[r, ROUTES.index(route)] = p
+    return _cdf_table(table)
+
+
+def _modal_table():
+    rows = [carrier_modal_weights.get(c, [1.0, 0.0, 0.0]) for c in carriers]
+    return _cdf_table(rows)
+
+
+def generate_chunk(task):
+    # task: (seed_seq, lo, hi, day_cum, start, events, with_geo); devolve o DataFrame do bloco
+    seed_seq, lo, hi, day_cum, start, events, with_geo = task
+    rng = np.random.default_rng(seed_seq)
+    n = hi - lo
+
+    # Datas: posição global da linha → dia pela contagem acumulada (saída ordenada)
+    day = np.searchsorted(day_cum, np.arange(lo, hi), side='right')
+    dates = np.datetime64(start, 'D') + day
+
+    carrier = rng.choice(len(carriers), n, p=carrier_probabilities())
+    risk = rng.choice(len(risk_types), n, p=risk_weights)
+    crit = rng.choice(len(criticality_levels), n, p=criticality_weights)
+    region = rng.choice(len(regions), n, p=region_weights)
+    modal = _draw(rng, _modal_table(), carrier)
+    route = _draw(rng, _route_table(), region)
+
+    # Risco predominante: sobrescreve o risco sorteado com a probabilidade alvo
+    dominant = np.full(len(carriers), -1)
+    share = np.zeros(len(carriers))
+    for c, (r, p) in dominant_risks.items():
+        dominant[carriers.index(c)] = risk_types.index(r)
+        share[carriers.index(c)] = p
+    override = rng.random(n) < share[carrier]
+    risk = np.where(override, dominant[carrier], risk)
+
+    # Custos: exponencial + base, multiplicados por criticidade
+    costs = rng.exponential(scale=mean_cost_per_incident * 0.8, size=n) + base_cost
+    low = np.array([criticality_cost_multipliers[c][0] for c in criticality_levels])
+    high = np.array([criticality_cost_multipliers[c][1] for c in criticality_levels])
+    costs *= rng.uniform(low[crit], high[crit])
+
+    event_mask = np.zeros(n, dtype=bool)
+    if events["floods"]:
+        event_mask |= _inject_floods(rng, dates, risk, crit, region, costs)
+    if events["attack"]:
+        event_mask |= _inject_attack(rng, dates, carrier, risk, crit, modal, region, route, costs)
+
+    # Normalizar os demais incidentes para que o bloco fique na média alvo (eventos inclusos)
+    budget = n * mean_cost_per_incident - costs[event_mask].sum()
+    rest = ~event_mask
+    if rest.any() and budget > 0:
+        costs[rest] *= budget / costs[rest].sum()
+
+    df = pd.DataFrame({
+        "Data": dates,
+        "Transportadora": pd.Categorical.from_codes(carrier, carriers),
+        "Tipo de Risco": pd.Categorical.from_codes(risk, risk_types),
+        "Nível de Criticidade": pd.Categorical.from_codes(crit, criticality_levels),
+        "Modal Afetado": pd.Categorical.from_codes(modal, modals),
+        "Região": pd.Categorical.from_codes(region, regions),
+        "Custo Associado (R$)": costs.astype(np.int64),
+        "Rota/Local Crítico": pd.Categorical.from_codes(route, ROUTES),
+    })[COLUMNS]
+    if with_geo:
+        # Coordenadas na geometria da rota (geo.py), com gerador próprio: as demais colunas não mudam
+        lat, lon = geo.scatter(np.random.default_rng(seed_seq.spawn(1)[0]), route)
+        for col, values in zip(GEO_COLUMNS, (lat, lon)):
+            df[col] = values.round(5).astype(np.float32)
+    return df
+
+
+def _inject_floods(rng, dates, risk, crit, region, costs):
+    # Enchentes em MG (março, Sudeste, Climático): poucos incidentes concentram o custo
+    mask = np.zeros(len(dates), dtype=bool)
+    months = dates.astype('datetime64[M]').astype(int) % 12 + 1
+    floods = np.flatnonzero((months == 3) & (region == regions.index("Sudeste")) &
+                            (risk == risk_types.index("Climático")))
+    if len(floods):
+        chosen = rng.choice(floods, min(len(floods), num_high_cost_floods), replace=False)
+        costs[chosen] = enchentes_cost / len(chosen)
+        crit[chosen] = criticality_levels.index("Alto")
+        mask[chosen] = True
+    return mask
+
+
+def _inject_attack(rng, dates, carrier, risk, crit, modal, region, route, costs):
+    # Ciberataque à Tegma: um incidente operacional crítico no dia do ataque
+    mask = np.zeros(len(dates), dtype=bool)
+    attack = np.flatnonzero(dates == np.datetime64(ciberataque_date, 'D'))
+    if len(attack):
+        i = attack[0]
+        carrier[i] = carriers.index("Tegma")
+        risk[i] = risk_types.index("Operacional")
+        crit[i] = criticality_levels.index("Alto")
+        modal[i] = modals.index("Rodoviário")
+        region[i] = regions.index("Sudeste")
+        route[i] = ROUTES.index("Outra Sudeste")
+        costs[i] = rng.integers(500_000, 2_000_000)
+        mask[i] = True
+    return mask
+
+
+def plan_chunks(rows, seed, start, end, chunk_size, with_geo=False):
+    rng = np.random.default_rng(seed)
+    num_days = (end - start).days + 1
+    day_cum = np.cumsum(rng.multinomial(rows, np.full(num_days, 1 / num_days)))
+    bounds = list(range(0, rows, chunk_size)) + [rows]
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds) - 1)
+
+    # Cada evento específico entra uma única vez, no bloco que contém a sua data
+    def event_row(date):
+        if not start <= date <= end:
+            return -1
+        return int(day_cum[(date - start).days]) - 1
+
+    flood_row, attack_row = event_row(enchentes_date), event_row(ciberataque_date)
+    tasks = []
+    for i in range(len(bounds) - 1):
+        lo, hi = bounds[i], bounds[i + 1]
+        events = {"floods": lo <= flood_row < hi, "attack": lo <= attack_row < hi}
+        tasks.append((seeds[i], lo, hi, day_cum, start, events, with_geo))
+    return tasks
+
+
+def generate(rows, seed=None, start=start_date, end=end_date, chunk_size=1_000_000, workers=None,
+             with_geo=False):
+    # Gera os blocos em ordem; no máximo 2 × workers blocos ficam em memória ao mesmo tempo
+    tasks = plan_chunks(rows, seed, start, end, chunk_size, with_geo)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        for task in tasks:
+            yield generate_chunk(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for task in tasks:
+            pending.append(pool.submit(generate_chunk, task))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def write(chunks, output_path, fmt):
+    # Grava em streaming e acumula as métricas de verificação por bloco
+    summary = {"rows": 0, "cost": 0, "carriers": np.zeros(len(carriers)),
+               "dominant": np.zeros(len(carriers)), "sudeste": 0}
+    if fmt == 'parquet' and os.path.isdir(output_path):
+        shutil.rmtree(output_path)
+    backend = storage.ParquetBackend(output_path)
+    for i, chunk in enumerate(chunks):
+        if fmt == 'csv':
+            chunk.to_csv(output_path, index=False, date_format='%Y-%m-%d',
+                         mode='w' if i == 0 else 'a', header=i == 0)
+        else:
+            backend.write(chunk)
+        carrier = chunk["Transportadora"].cat.codes.to_numpy()
+        summary["rows"] += len(chunk)
+        summary["cost"] += int(chunk["Custo Associado (R$)"].sum())
+        summary["carriers"] += np.bincount(carrier, minlength=len(carriers))
+        for c, (r, _) in dominant_risks.items():
+            summary["dominant"][carriers.index(c)] += int(
+                ((carrier == carriers.index(c)) & (chunk["Tipo de Risco"] == r).to_numpy()).sum())
+        summary["sudeste"] += int((chunk["Região"] == "Sudeste").sum())
+    return summary
+
+
+def print_summary(summary, output_path):
+    print(f"Dados fictícios gerados e salvos em {output_path}")
+    print(f"Total de incidentes: {summary['rows']}")
+    print(f"Custo total: R$ {summary['cost'] / 1_000_000:.1f} milhões")
+
+    # Verificar algumas métricas
+    print("\nVerificação de Métricas:")
+    counts = summary["carriers"]
+    for c in carrier_targets:
+        print(f"Incidentes {c}: {int(counts[carriers.index(c)])}")
+    for c, (r, _) in dominant_risks.items():
+        n = counts[carriers.index(c)]
+        share = summary["dominant"][carriers.index(c)] / n if n else 0
+        print(f"% {r} {c}: {share:.1%}")
+    print(f"% Região Sudeste: {summary['sudeste'] / max(summary['rows'], 1):.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera incidentes logísticos fictícios")
+    parser.add_argument("--rows", type=int, default=num_incidents)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--start", type=datetime.date.fromisoformat, default=start_date)
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=end_date)
+    parser.add_argument("--output", default=storage.CSV_PATH)
+    parser.add_argument("--format", choices=["csv", "parquet"], default=None,
+                        help="padrão: deduzido da extensão de --output")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--geo", action="store_true", help="incluir Latitude/Longitude por incidente")
+    args = parser.parse_args()
+
+    fmt = args.format or ('csv' if args.output.endswith('.csv') else 'parquet')
+    chunks = generate(args.rows, args.seed, args.start, args.end, args.chunk_size, args.workers, args.geo)
+    summary = write(chunks, args.output, fmt)
+
+    # Cópia colunar (Parquet particionado por ano/mês) lida pelo dashboard
+    if fmt == 'csv' and args.output == storage.CSV_PATH:
+        storage.ingest(args.output, storage.columnar_path(args.output))
+
+    print_summary(summary, args.output)
+
+
+if __name__ == '__main__':
+    main()
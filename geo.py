@@ -0,0 +1,245 @@
+# Mapa de calor geográfico: coordenadas das rotas/locais críticos e grade de tiles multi-resolução
+#
+# Cada rota/local tem uma geometria (ROUTE_GEOMETRY): trecho de rodovia (linha entre cidades) ou
+# área (pontos de referência com dispersão). Quando a fonte traz Latitude/Longitude por incidente
+# (schema.GEO_COLUMNS), a distribuição espacial de cada rota sai desses pontos; senão, de uma
+# amostra fixa da geometria.
+#
+# A grade é uma quadtree sobre o retângulo BBOX: no nível z há 2^z × 2^z tiles, identificados pelo
+# código de Morton (bits de x e y intercalados), então o tile pai é code >> 2. Os pontos são
+# agregados uma única vez no nível mais fino, por (rota, tile), como participação da rota em
+# incidentes e em custo; os níveis mais grossos são somas dos filhos. O mapa de um estado de
+# filtros multiplica os totais por rota (visão 'route' do cubo) pelas participações do nível
+# pedido: zoom e recorte de área percorrem tiles pré-calculados, nunca os incidentes. Como os
+# totais vêm do cubo, lotes novos aparecem no mapa sem reconstruir a grade.
+
+import numpy as np
+import pandas as pd
+
+import storage
+from schema import GEO_COLUMNS, ROUTES
+
+# Retângulo coberto pela grade: (lat_min, lat_max, lon_min, lon_max)
+BBOX = (-34.0, 6.0, -74.0, -34.0)
+MAX_LEVEL = 12  # tiles de ~1 km no nível mais fino
+SAMPLE_POINTS = 20_000  # pontos por rota na distribuição vinda da geometria
+SEED = 2025
+
+# Rota/local → ('linha', cidades ao longo do trecho, largura em graus)
+#            ou ('área', pontos de referência, dispersão em graus)
+ROUTE_GEOMETRY = {
+    'BR-040 (RJ-MG)': ('linha', [(-22.88, -43.23), (-22.70, -43.30), (-22.51, -43.18), (-22.12, -43.21),
+                                 (-21.76, -43.35), (-21.22, -43.77), (-20.66, -43.79), (-19.92, -43.94)], 0.02),
+    'Porto de Santos (SP)': ('área', [(-23.96, -46.31), (-23.93, -46.36)], 0.015),
+    'Aeroporto de Guarulhos (GRU)': ('área', [(-23.435, -46.473)], 0.01),
+    'Outra Sudeste': ('área', [(-22.91, -47.06), (-20.32, -40.34), (-21.18, -47.81), (-18.92, -48.28),
+                               (-22.47, -44.45)], 0.25),
+    'BR-116 (PR-SC)': ('linha', [(-25.43, -49.27), (-25.66, -49.31), (-25.78, -49.33), (-26.11, -49.80),
+                                 (-26.37, -50.14), (-26.96, -50.43), (-27.82, -50.33), (-28.08, -50.77)], 0.02),
+    'Outra Sul': ('área', [(-30.03, -51.23), (-27.59, -48.55), (-23.31, -51.16), (-29.17, -51.18),
+                           (-26.30, -48.85)], 0.25),
+    'Outra Nordeste': ('área', [(-12.97, -38.50), (-8.05, -34.88), (-3.73, -38.52), (-2.53, -44.30),
+                                (-5.79, -35.21)], 0.3),
+    'Outra Centro-Oeste': ('área', [(-15.79, -47.88), (-16.68, -49.25), (-15.60, -56.10), (-20.44, -54.65),
+                                    (-16.47, -54.64)], 0.3),
+    'Outra Norte': ('área', [(-3.12, -60.02), (-1.46, -48.49), (-8.76, -63.90), (-10.18, -48.33),
+                             (-5.37, -49.12)], 0.3),
+}
+
+
+def _route_viewport(points, spread):
+    lat, lon = np.asarray(points).T
+    margin = max(0.15, 4 * spread)
+    return (float(lat.min() - margin), float(lat.max() + margin), float(lon.min() - margin), float(lon.max() + margin))
+
+
+# Recortes do mapa: nome → (lat_min, lat_max, lon_min, lon_max); None = BBOX inteiro.
+# Regiões e cada rota/local com geometria própria
+VIEWPORTS = {
+    'Brasil': None,
+    'Sudeste': (-25.5, -14.0, -53.5, -39.5),
+    'Sul': (-34.0, -22.5, -58.0, -48.0),
+    'Nordeste': (-18.5, -1.0, -48.5, -34.5),
+    'Centro-Oeste': (-24.5, -7.0, -61.5, -45.5),
+    'Norte': (-13.5, 5.5, -74.0, -46.0),
+    **{name: _route_viewport(points, spread) for name, (_, points, spread) in ROUTE_GEOMETRY.items()
+       if not name.startswith('Outra')},
+}
+
+
+def scatter(rng, codes, routes=ROUTES):
+    # Posições sorteadas na geometria de cada rota (codes: índices em routes); NaN sem geometria
+    lat = np.full(len(codes), np.nan)
+    lon = np.full(len(codes), np.nan)
+    for code, name in enumerate(routes):
+        rows = np.flatnonzero(codes == code)
+        if not len(rows) or name not in ROUTE_GEOMETRY:
+            continue
+        kind, points, spread = ROUTE_GEOMETRY[name]
+        points = np.asarray(points)
+        if kind == 'linha':
+            # Posição uniforme ao longo do trecho
+            length = np.concatenate([[0.0], np.cumsum(np.hypot(*np.diff(points, axis=0).T))])
+            t = rng.random(len(rows)) * length[-1]
+            base = np.column_stack([np.interp(t, length, points[:, 0]), np.interp(t, length, points[:, 1])])
+        else:
+            base = points[rng.integers(len(points), size=len(rows))]
+        base = base + rng.normal(0.0, spread, (len(rows), 2))
+        lat[rows], lon[rows] = base[:, 0], base[:, 1]
+    return lat, lon
+
+
+def inside(lat, lon, bbox=BBOX):
+    lat_min, lat_max, lon_min, lon_max = bbox
+    return (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+
+
+def _spread_bits(v):
+    # Intercala zeros entre os 16 bits baixos de v
+    v = v.astype(np.uint64) & 0xFFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+
+def _compact_bits(v):
+    v = v.astype(np.uint64) & 0x55555555
+    v = (v | (v >> 1)) & 0x33333333
+    v = (v | (v >> 2)) & 0x0F0F0F0F
+    v = (v | (v >> 4)) & 0x00FF00FF
+    v = (v | (v >> 8)) & 0x0000FFFF
+    return v
+
+
+def tile_codes(lat, lon, level):
+    # Coordenadas → código de Morton do tile no nível pedido
+    lat_min, lat_max, lon_min, lon_max = BBOX
+    n = 1 << level
+    x = np.clip(((lon - lon_min) / (lon_max - lon_min) * n).astype(np.int64), 0, n - 1)
+    y = np.clip(((lat - lat_min) / (lat_max - lat_min) * n).astype(np.int64), 0, n - 1)
+    return (_spread_bits(x) | (_spread_bits(y) << 1)).astype(np.int64)
+
+
+def tile_centers(codes, level):
+    lat_min, lat_max, lon_min, lon_max = BBOX
+    n = 1 << level
+    x = _compact_bits(codes).astype(np.float64)
+    y = _compact_bits(codes >> 1).astype(np.float64)
+    return lat_min + (y + 0.5) * (lat_max - lat_min) / n, lon_min + (x + 0.5) * (lon_max - lon_min) / n
+
+
+def tile_size(level):
+    # Lado do tile em graus
+    return (BBOX[1] - BBOX[0]) / (1 << level)
+
+
+def level_for(viewport, detail):
+    # Nível em que o recorte tem ~2^detail tiles de largura
+    lat_min, lat_max, lon_min, lon_max = viewport or BBOX
+    span = max(lat_max - lat_min, lon_max - lon_min)
+    level = int(round(np.log2((BBOX[1] - BBOX[0]) / span))) + detail
+    return min(max(level, 0), MAX_LEVEL)
+
+
+def view(viewport):
+    # Centro e zoom do mapa (tiles de 512 px) para enquadrar o recorte
+    lat_min, lat_max, lon_min, lon_max = viewport or BBOX
+    span = max(lat_max - lat_min, lon_max - lon_min)
+    center = {'lat': (lat_min + lat_max) / 2, 'lon': (lon_min + lon_max) / 2}
+    return center, float(np.log2(360 / span))
+
+
+def _rollup_level(route, codes, counts, costs, shift):
+    # Soma (rota, tile) ao subir shift níveis na quadtree
+    key = (route << 48) | (codes >> (2 * shift))
+    unique, inverse = np.unique(key, return_inverse=True)
+    return (unique >> 48, unique & ((1 << 48) - 1),
+            np.bincount(inverse, weights=counts), np.bincount(inverse, weights=costs))
+
+
+class TilePyramid:
+    def __init__(self, routes, codes, lat, lon, cost=None, max_level=MAX_LEVEL):
+        # routes: nomes das rotas; codes: índice da rota de cada ponto (-1 = sem rota)
+        self.routes = list(routes)
+        self.position = {name: i for i, name in enumerate(self.routes)}
+        self.max_level = max_level
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        valid = (np.asarray(codes) >= 0) & inside(lat, lon)
+        route = np.asarray(codes, dtype=np.int64)[valid]
+        counts = np.ones(len(route))
+        costs = counts if cost is None else np.asarray(cost, dtype=np.float64)[valid]
+        tiles = tile_codes(lat[valid], lon[valid], max_level)
+        route, tiles, counts, costs = _rollup_level(route, tiles, counts, costs, 0)
+
+        # Participação de cada tile no total da rota
+        n = len(self.routes)
+        counts = counts / np.bincount(route, weights=counts, minlength=n)[route]
+        route_cost = np.bincount(route, weights=costs, minlength=n)[route]
+        costs = np.divide(costs, route_cost, out=counts.copy(), where=route_cost > 0)
+
+        self.levels = {max_level: self._level(route, tiles, counts, costs, max_level)}
+        for level in range(max_level - 1, -1, -1):
+            route, tiles, counts, costs = _rollup_level(route, tiles, counts, costs, 1)
+            self.levels[level] = self._level(route, tiles, counts, costs, level)
+
+    @staticmethod
+    def _level(route, tiles, counts, costs, level):
+        unique, inverse = np.unique(tiles, return_inverse=True)
+        lat, lon = tile_centers(unique, level)
+        return {'route': route, 'tile': inverse, 'count_share': counts, 'cost_share': costs,
+                'codes': unique, 'lat': lat, 'lon': lon}
+
+    @classmethod
+    def from_geometry(cls, routes=ROUTES, points=SAMPLE_POINTS, seed=SEED):
+        codes = np.repeat(np.arange(len(routes)), points)
+        lat, lon = scatter(np.random.default_rng(seed), codes, routes)
+        return cls(routes, codes, lat, lon)
+
+    def __len__(self):
+        return len(self.levels[self.max_level]['codes'])
+
+    def tiles(self, level, route_totals, viewport=None):
+        # route_totals: visão 'route' (Rota/Local Crítico, Incidentes, Custo) → tiles do recorte
+        data = self.levels[min(max(level, 0), self.max_level)]
+        incidents = np.zeros(len(self.routes))
+        cost = np.zeros(len(self.routes))
+        for name, n, c in zip(route_totals['Rota/Local Crítico'], route_totals['Incidentes'], route_totals['Custo']):
+            # Rotas sem geometria (ex.: valores novos na fonte) ficam fora do mapa
+            i = self.position.get(name)
+            if i is not None:
+                incidents[i] += n
+                cost[i] += c
+        n_tiles = len(data['codes'])
+        frame = pd.DataFrame({
+            'Latitude': data['lat'],
+            'Longitude': data['lon'],
+            'Incidentes': np.bincount(data['tile'], weights=data['count_share'] * incidents[data['route']],
+                                      minlength=n_tiles),
+            'Custo': np.bincount(data['tile'], weights=data['cost_share'] * cost[data['route']],
+                                 minlength=n_tiles),
+        })
+        keep = frame['Incidentes'].to_numpy() > 0
+        if viewport is not None:
+            keep &= inside(frame['Latitude'].to_numpy(), frame['Longitude'].to_numpy(), viewport)
+        return frame[keep].reset_index(drop=True)
+
+
+def read_points(path=storage.CSV_PATH):
+    # Coordenadas por incidente da fonte; None se ela não tiver as colunas opcionais
+    backend = storage.preferred_backend(path)
+    if not set(GEO_COLUMNS).issubset(backend.columns()):
+        return None
+    return backend.read(['Rota/Local Crítico', 'Custo Associado (R$)'] + GEO_COLUMNS)
+
+
+def load_pyramid(path=storage.CSV_PATH):
+    points = read_points(path)
+    if points is None:
+        return TilePyramid.from_geometry()
+    routes = points['Rota/Local Crítico']
+    return TilePyramid(list(routes.cat.categories), routes.cat.codes.to_numpy(),
+                       points['Latitude'].to_numpy(), points['Longitude'].to_numpy(),
+                       points['Custo Associado (R$)'].to_numpy())
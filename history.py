@@ -0,0 +1,195 @@
+# Histórico multi-anual em agregados por período
+#
+# Agregados diários e mensais (mesmas dimensões do cubo) ficam em Parquet particionado por ano
+# em home/historico/ (níveis dia/ e mes/). Um período qualquer é resolvido com os meses completos
+# do nível mensal + no máximo dois trechos parciais do nível diário, então comparar com o ano ou
+# trimestre anterior custa duas consultas a agregados, sem varrer incidentes. Os meses cobertos
+# pelo store atual (IncidentStore) substituem os do arquivo.
+#
+#   python history.py add home/riscos_logisticos_2024.csv   # grava (ou substitui) os anos do arquivo
+#   python history.py add home/varejo/2024.csv --path home/varejo/historico   # arquivo de outro conjunto
+
+import argparse
+import os
+import shutil
+import uuid
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import storage
+from cube import DIMENSIONS, aggregate, rollup
+from filter_index import DIMENSIONS as FILTER_DIMENSIONS
+from filter_index import FilterIndex
+
+HISTORY_PATH = 'home/historico'
+LEVELS = ('dia', 'mes')
+YEAR_PARTITION = pa.schema([('ano', pa.int16())])
+
+# Dimensões selecionáveis nas comparações (filtros da sidebar + rota)
+HISTORY_DIMENSIONS = FILTER_DIMENSIONS + ['Rota/Local Crítico']
+
+
+def month_cells(cells):
+    # Células diárias → mensais (Data = primeiro dia do mês)
+    cells = cells.assign(Data=cells['Data'].dt.to_period('M').dt.start_time)
+    return rollup(cells, DIMENSIONS)
+
+
+def archive_version(path=HISTORY_PATH):
+    # Muda quando `history.py add` grava algum ano; path None = sem arquivo
+    return storage.ParquetBackend(path).mtime() if path and os.path.isdir(path) else 0.0
+
+
+def read_level(level, path=HISTORY_PATH):
+    if not path:
+        return None
+    level_path = os.path.join(path, level)
+    if not os.path.isdir(level_path):
+        return None
+    table = pq.read_table(level_path, partitioning=ds.partitioning(YEAR_PARTITION, flavor='hive'),
+                          memory_map=True)
+    cells = table.unify_dictionaries().to_pandas(date_as_object=False).drop(columns='ano')
+    cells['Data'] = cells['Data'].astype('datetime64[ns]')
+    return storage.to_categorical(cells)
+
+
+def write_level(cells, level, path=HISTORY_PATH):
+    # Substitui por inteiro as partições dos anos presentes em cells
+    level_path = os.path.join(path, level)
+    years = cells['Data'].dt.year
+    for year in years.unique():
+        partition = os.path.join(level_path, f'ano={year}')
+        if os.path.isdir(partition):
+            shutil.rmtree(partition)
+    columns = DIMENSIONS + ['Incidentes', 'Custo']
+    table = pa.Table.from_pandas(cells.assign(Data=cells['Data'].dt.date)[columns], preserve_index=False)
+    table = table.append_column('ano', pa.array(years.to_numpy('int16')))
+    ds.write_dataset(table, level_path, format='parquet',
+                     partitioning=ds.partitioning(YEAR_PARTITION, flavor='hive'),
+                     existing_data_behavior='overwrite_or_ignore',
+                     basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet')
+
+
+def add(src, path=HISTORY_PATH):
+    # Agrega um arquivo de incidentes (CSV/Parquet/Arrow) e grava os anos que ele cobre
+    daily = aggregate(storage.open_backend(src).read())
+    write_level(daily, 'dia', path)
+    write_level(month_cells(daily), 'mes', path)
+    return sorted(int(y) for y in daily['Data'].dt.year.unique())
+
+
+@dataclass
+class Comparison:
+    label: str  # período de referência (ex.: '2024', 'Q1')
+    current: tuple  # (incidentes, custo)
+    previous: tuple = None  # None quando o histórico não cobre o período de referência
+
+    def change(self, metric='incidents'):
+        # Variação percentual; None sem histórico ou com referência zerada
+        i = 0 if metric == 'incidents' else 1
+        if self.previous is None or not self.previous[i]:
+            return None
+        return (self.current[i] / self.previous[i] - 1) * 100
+
+
+class PeriodHistory:
+    def __init__(self, daily, monthly):
+        self.daily = FilterIndex(daily, HISTORY_DIMENSIONS)
+        self.monthly = FilterIndex(monthly, HISTORY_DIMENSIONS)
+        self.values = {
+            level: (index.df['Incidentes'].to_numpy(), index.df['Custo'].to_numpy())
+            for level, index in (('dia', self.daily), ('mes', self.monthly))
+        }
+        self.first_day = self.daily.dates[0] if len(self.daily) else None
+        self.last_day = self.daily.dates[-1] if len(self.daily) else None
+
+    @classmethod
+    def combine(cls, cube, path=HISTORY_PATH):
+        # Arquivo em disco + células do cubo atual, que substituem os meses que cobrem
+        current = cube.cells[DIMENSIONS + ['Incidentes', 'Custo']]
+        daily_parts, monthly_parts = [current], [month_cells(current)]
+        if len(current):
+            first = current['Data'].iloc[0].to_period('M').start_time
+            last = current['Data'].iloc[-1].to_period('M').end_time
+            for level, parts in (('dia', daily_parts), ('mes', monthly_parts)):
+                archived = read_level(level, path)
+                if archived is not None:
+                    parts.append(archived[(archived['Data'] < first) | (archived['Data'] > last)])
+        daily = storage.to_categorical(pd.concat(daily_parts, ignore_index=True))
+        monthly = storage.to_categorical(pd.concat(monthly_parts, ignore_index=True))
+        return cls(daily, monthly)
+
+    def _sum(self, level, start, end, selections):
+        index = self.daily if level == 'dia' else self.monthly
+        rows = index.select(start, end, selections)
+        incidents, cost = self.values[level]
+        return int(incidents[rows].sum()), float(cost[rows].sum())
+
+    def aggregate(self, start, end, selections=None):
+        # (incidentes, custo) de [start, end]: meses completos do nível mensal, bordas do diário
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        day = pd.Timedelta(days=1)
+        first_month = start if start.is_month_start else start + pd.offsets.MonthBegin(1)
+        last_full_day = end if end.is_month_end else end.to_period('M').start_time - day
+        if first_month > last_full_day:
+            return self._sum('dia', start, end, selections)
+        parts = [self._sum('mes', first_month, last_full_day.to_period('M').start_time, selections)]
+        if start < first_month:
+            parts.append(self._sum('dia', start, first_month - day, selections))
+        if end > last_full_day:
+            parts.append(self._sum('dia', last_full_day + day, end, selections))
+        return sum(p[0] for p in parts), sum(p[1] for p in parts)
+
+    def covers(self, start):
+        return self.first_day is not None and pd.Timestamp(start) >= pd.Timestamp(self.first_day)
+
+    def _compare(self, label, start, end, previous_start, previous_end, selections):
+        current = self.aggregate(start, end, selections)
+        previous = (self.aggregate(previous_start, previous_end, selections)
+                    if self.covers(previous_start) else None)
+        return Comparison(label, current, previous)
+
+    def year_over_year(self, start, end, selections=None):
+        # Mesmo período do ano anterior
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        year = pd.DateOffset(years=1)
+        return self._compare(str(start.year - 1), start, end, start - year, end - year, selections)
+
+    def quarter_over_quarter(self, end, selections=None):
+        # Trimestre de end até end vs. o mesmo número de dias do trimestre anterior
+        end = pd.Timestamp(end)
+        quarter = end.to_period('Q')
+        start = quarter.start_time
+        previous = quarter - 1
+        previous_end = min(previous.start_time + (end - start), previous.end_time.normalize())
+        return self._compare(f'Q{previous.quarter}', start, end, previous.start_time, previous_end,
+                             selections)
+
+
+def narrow(selections, col, values):
+    # Seleção da sidebar restrita a values em col; None se a interseção for vazia
+    if selections is None:
+        return None
+    selected = selections.get(col) or values
+    kept = [v for v in values if v in selected]
+    return {**selections, col: kept} if kept else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arquivo histórico de agregados por período")
+    parser.add_argument("command", choices=['add'])
+    parser.add_argument("sources", nargs='+', help="arquivos de incidentes (CSV/Parquet/Arrow)")
+    parser.add_argument("--path", default=HISTORY_PATH,
+                        help="pasta do arquivo histórico do conjunto (campo history de home/datasets.json)")
+    args = parser.parse_args()
+    for src in args.sources:
+        years = add(src, args.path)
+        print(f"{src}: anos {', '.join(map(str, years))} gravados em {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+# Ingestão incremental de incidentes
+#
+# O log de incidentes (CSV) só cresce. Em vez de recarregar tudo a cada novo lote:
+#   - CSVTail lê apenas os bytes acrescentados desde a última leitura (validados por
+#     ingestion.py; linhas ruins vão para a quarentena do log)
+#   - DropFolder acrescenta ao log os arquivos deixados em home/incoming/ e os arquiva
+#   - IncidentStore aplica só as linhas novas ao cubo e à cópia colunar, e registra quais
+#     dias foram afetados, para que apenas as visões que cobrem esses dias sejam invalidadas
+#   - inscritos (ex.: o detector de alertas) recebem o histórico uma vez e depois cada lote novo
+
+import os
+import shutil
+import threading
+
+import numpy as np
+
+import ingestion
+import storage
+import streaming
+from cube import IncidentCube
+
+INCOMING_PATH = 'home/incoming'
+
+
+class CSVTail:
+    def __init__(self, path, offset=None):
+        self.path = path
+        self.offset = os.path.getsize(path) if offset is None else offset
+        self.columns = ingestion.header(path)
+
+    def poll(self):
+        # Devolve (DataFrame com as linhas novas, truncado?)
+        size = os.path.getsize(self.path)
+        if size < self.offset:
+            return None, True
+        if size == self.offset:
+            return None, False
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        # Só linhas completas; uma linha ainda sendo escrita fica para a próxima leitura
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return None, False
+        start = self.offset
+        self.offset += end
+        batch, _ = ingestion.read_lines(data[:end], self.columns, self.path, lambda: self._line_at(start))
+        return storage.to_categorical(batch), False
+
+    def _line_at(self, offset):
+        # Número da linha que começa em offset (contado só quando a cauda tem linhas rejeitadas)
+        lines = 1
+        with open(self.path, 'rb') as f:
+            while f.tell() < offset:
+                lines += f.read(min(2**24, offset - f.tell())).count(b'\n')
+        return lines
+
+
+class DropFolder:
+    def __init__(self, path=INCOMING_PATH):
+        self.path = path
+
+    def pending(self):
+        # path None: conjunto sem pasta de entrada
+        if not self.path or not os.path.isdir(self.path):
+            return []
+        names = sorted(n for n in os.listdir(self.path)
+                       if n.endswith(('.csv', '.parquet', '.arrow', '.feather')))
+        return [os.path.join(self.path, n) for n in names]
+
+    def flush_into(self, log_path):
+        # Acrescenta cada arquivo novo ao final do log e o move para incoming/processed/
+        moved = 0
+        for path in self.pending():
+            batch = storage.open_backend(path).read()
+            batch.to_csv(log_path, mode='a', header=False, index=False, date_format='%Y-%m-%d')
+            done = os.path.join(self.path, 'processed')
+            os.makedirs(done, exist_ok=True)
+            shutil.move(path, os.path.join(done, os.path.basename(path)))
+            moved += len(batch)
+        return moved
+
+
+class IncidentStore:
+    def __init__(self, path=storage.CSV_PATH, incoming=INCOMING_PATH, streaming=False):
+        # streaming: histórico lido em blocos (streaming.py); só as células ficam em memória
+        self.path = path
+        self.streaming = streaming
+        self.drop_folder = DropFolder(incoming)
+        self._lock = threading.Lock()
+        self.subscribers = []
+        self._load()
+
+    def _load(self):
+        offset = os.path.getsize(self.path)
+        # Identifica o conteúdo carregado entre reinícios (chaves do cache em disco)
+        self.fingerprint = f'{os.path.abspath(self.path)}:{offset}:{os.stat(self.path).st_mtime_ns}'
+        if self.streaming:
+            self.cube = streaming.load_cube(self.path, on_batch=self._history_feed(self.subscribers))
+        else:
+            # Carga completa em arrays compactos; só as células do cubo viram DataFrame
+            incidents = storage.load_compact(self.path)
+            self.cube = IncidentCube(incidents)
+            for fn in self.subscribers:
+                fn(incidents, True)
+        self.tail = CSVTail(self.path, offset)
+        self.version = 0
+        # Versão da última alteração de cada dia (ordinal numpy) e da carga completa
+        self.day_versions = {}
+        self.reload_version = 0
+
+    def refresh(self):
+        # Aplica lotes novos; devolve o número de linhas ingeridas
+        with self._lock:
+            self.drop_folder.flush_into(self.path)
+            batch, truncated = self.tail.poll()
+            if truncated:
+                # Log reescrito/rotacionado: única situação que exige recarga completa
+                version = self.version
+                self._load()
+                self.version = self.reload_version = version + 1
+                return 0
+            if batch is None or len(batch) == 0:
+                return 0
+            self.append(batch, persist=True)
+            return len(batch)
+
+    def subscribe(self, fn):
+        # fn(lote, reset): chamado com o histórico completo (reset=True, CompactIncidents) agora e
+        # após recargas, e com cada lote novo (DataFrame) depois disso
+        with self._lock:
+            self.subscribers.append(fn)
+            if self.streaming:
+                feed = self._history_feed([fn])
+                for chunk in streaming.iter_batches(self.path):
+                    feed(chunk)
+            else:
+                fn(storage.load_compact(self.path), True)
+
+    def _history_feed(self, subscribers):
+        # Histórico em blocos: o primeiro com reset=True, os seguintes como lotes comuns
+        first = [True]
+
+        def feed(chunk):
+            for fn in subscribers:
+                fn(chunk, first[0])
+            first[0] = False
+        return feed
+
+    def append(self, batch, persist=False):
+        self.cube.update(batch)
+        for fn in self.subscribers:
+            fn(batch, False)
+        if persist:
+            columnar = storage.ParquetBackend(storage.columnar_path(self.path))
+            if os.path.isdir(columnar.path):
+                try:
+                    columnar.write(batch)
+                except OSError:
+                    pass
+        self.version += 1
+        for day in np.unique(batch['Data'].to_numpy('datetime64[D]')):
+            self.day_versions[day] = self.version
+
+    def data_key(self, start=None, end=None):
+        # Parte da chave de cache que depende dos dados: conteúdo carregado + lotes no período
+        return (self.fingerprint, self.version_for(start, end))
+
+    def version_for(self, start=None, end=None):
+        # Versão dos dados vista por uma visão que cobre [start, end]: muda só se algum
+        # lote tocou esse período (ou se houve recarga completa)
+        lo = None if start is None else np.datetime64(start, 'D')
+        hi = None if end is None else np.datetime64(end, 'D')
+        version = self.reload_version
+        for day, v in self.day_versions.items():
+            if (lo is None or day >= lo) and (hi is None or day <= hi):
+                version = max(version, v)
+        return version
@@ -0,0 +1,357 @@
+# Ingestão validada dos CSVs de incidentes: esquema declarado, leitura tipada em blocos paralelos
+# e quarentena das linhas ruins
+#
+# Toda leitura de CSV de incidentes passa por aqui (CSVBackend, cauda do log, lotes de
+# home/incoming, leitura em streaming). O arquivo é cortado em blocos de ~CHUNK_BYTES em fronteiras
+# de linha; cada bloco é lido pelo parser do pyarrow num pool de threads (o parser libera o GIL),
+# com todas as colunas como texto, e validado coluna a coluna de forma vetorizada:
+#   - número de campos igual ao do cabeçalho
+#   - Data no formato AAAA-MM-DD
+#   - Custo Associado (R$): inteiro entre 0 e schema.MAX_COST
+#   - Transportadora, Tipo de Risco, Nível de Criticidade, Modal Afetado e Região: valores de
+#     schema.ALLOWED; Rota/Local Crítico: preenchida (rotas novas são aceitas)
+#   - Latitude/Longitude (quando o arquivo as tem): números dentro de schema.GEO_BOUNDS
+# Linhas reprovadas vão para a quarentena (<pasta do arquivo>/quarentena/<arquivo>) com o número
+# da linha no arquivo, os motivos e o conteúdo; só as linhas limpas, já com os tipos finais (data,
+# custo int64, coordenadas float32, categóricas), seguem adiante. Uma leitura completa reescreve a
+# quarentena do arquivo; linhas novas da cauda do log são acrescentadas a ela. Cada leitura gera
+# um IngestReport (linhas, rejeitadas, bytes, vazão); os últimos ficam em recent_reports().
+#
+#   python ingestion.py home/riscos_logisticos_2025.csv        # valida e mostra o relatório
+
+import argparse
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+import parallel
+import tracing
+from compact import COST_COLUMN
+from schema import ALLOWED, COLUMNS, DATE_FORMAT, GEO_BOUNDS, GEO_COLUMNS, MAX_COST
+
+ROUTE_COLUMN = 'Rota/Local Crítico'
+QUARANTINE_DIR = 'quarentena'
+QUARANTINE_COLUMNS = ['Linha', 'Motivo', 'Conteúdo']
+
+# Blocos menores que isto não compensam uma thread; arquivos menores são lidos num bloco só
+CHUNK_BYTES = 16 * 2**20
+# Bytes por linha, em média, dos CSVs de incidentes (para converter blocos de linhas em bytes)
+ROW_BYTES = 80
+KEEP_REPORTS = 20
+
+_reports = deque(maxlen=KEEP_REPORTS)
+_reports_lock = threading.Lock()
+
+
+@dataclass
+class IngestReport:
+    source: str
+    rows: int = 0  # linhas de dados lidas (limpas + rejeitadas)
+    rejected: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    chunks: int = 0
+    workers: int = 1
+    reasons: dict = field(default_factory=dict)  # motivo → linhas rejeitadas por ele
+    quarantine: str = None  # arquivo de quarentena (None sem rejeitadas)
+    created: float = field(default_factory=time.time)
+
+    @property
+    def clean(self):
+        return self.rows - self.rejected
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self):
+        return self.bytes / 2**20 / self.seconds if self.seconds else 0.0
+
+    def add(self, rejected):
+        self.rejected += len(rejected)
+        for reason, n in rejected['Motivo'].str.split('; ').explode().value_counts().items():
+            self.reasons[reason] = self.reasons.get(reason, 0) + int(n)
+
+    def summary(self):
+        text = '{}: {} linhas, {} rejeitadas, {:.1f} MB em {:.3f} s ({:,.0f} linhas/s, {:.1f} MB/s, {} blocos, {} workers)'.format(
+            self.source, self.rows, self.rejected, self.bytes / 2**20, self.seconds, self.rows_per_second,
+            self.mb_per_second, self.chunks, self.workers)
+        if self.quarantine:
+            text += f'\nquarentena: {self.quarantine}'
+            for reason, n in sorted(self.reasons.items(), key=lambda item: -item[1]):
+                text += f'\n  {n:>8}  {reason}'
+        return text
+
+
+def remember(report):
+    with _reports_lock:
+        _reports.append(report)
+    return report
+
+
+def recent_reports():
+    with _reports_lock:
+        return list(_reports)
+
+
+def quarantine_path(path):
+    return os.path.join(os.path.dirname(path), QUARANTINE_DIR, os.path.basename(path))
+
+
+def header(path):
+    # Colunas do cabeçalho; sem as colunas obrigatórias o arquivo inteiro é recusado
+    with open(path, 'rb') as f:
+        columns = f.readline().decode('utf-8-sig').rstrip('\r\n').split(',')
+    missing = [c for c in COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f'{path}: colunas ausentes no cabeçalho: {", ".join(missing)}')
+    return columns
+
+
+def _empty(columns):
+    return pa.table({c: pa.array([], pa.string()) for c in columns})
+
+
+def _validate(table):
+    # Colunas tipadas e [(motivo, máscara das linhas reprovadas)], em pyarrow.compute: o texto não
+    # passa pelo pandas
+    typed, checks = {}, []
+    # Datas e categorias se repetem muito: valida-se o dicionário de valores distintos, e cada
+    # linha herda o resultado pelo seu índice
+    values, index = _encode(table['Data'])
+    dates = pc.strptime(values, format=DATE_FORMAT, unit='s', error_is_null=True)
+    # strptime aceita 2025-1-2 e normaliza 2025-02-30; só vale a data que volta ao mesmo texto
+    valid = _mask(pc.equal(pc.strftime(dates, format=DATE_FORMAT), values), False)
+    checks.append(('Data inválida', ~valid[index]))
+    typed['Data'] = dates.to_numpy(zero_copy_only=False).astype('datetime64[ns]')[index]
+
+    for col, allowed in ALLOWED.items():
+        values, index = _encode(table[col])
+        codes = pc.fill_null(pc.index_in(values, value_set=pa.array(allowed)), -1).to_numpy(zero_copy_only=False)[index]
+        checks.append((f'{col} fora do esquema', codes < 0))
+        typed[col] = pd.Categorical.from_codes(codes, allowed)
+
+    text = table[COST_COLUMN]
+    digits = pc.match_substring_regex(text, r'^[0-9]{1,10}$')
+    cost = pc.cast(pc.if_else(digits, text, '0'), pa.int64()).to_numpy(zero_copy_only=False)
+    bad = ~_mask(digits) | (cost > MAX_COST)
+    typed[COST_COLUMN] = np.where(bad, 0, cost)
+    checks.extend(_cost_reasons(text, np.flatnonzero(bad)))
+
+    routes = table[ROUTE_COLUMN]
+    checks.append((f'{ROUTE_COLUMN} vazia', _mask(pc.equal(pc.utf8_length(pc.utf8_trim_whitespace(routes)), 0))))
+    typed[ROUTE_COLUMN] = pc.dictionary_encode(routes).to_pandas()
+
+    for col in GEO_COLUMNS:
+        if col in table.column_names:
+            lo, hi = GEO_BOUNDS[col]
+            values = pd.to_numeric(table[col].to_pandas(), errors='coerce').to_numpy(np.float64)
+            # NaN falha nas duas comparações
+            checks.append((f'{col} inválida', ~((values >= lo) & (values <= hi))))
+            typed[col] = values.astype(np.float32)
+    return typed, checks
+
+
+def _encode(column):
+    # Valores distintos e o índice de cada linha neles
+    encoded = pc.dictionary_encode(column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column)
+    return encoded.dictionary, encoded.indices.to_numpy(zero_copy_only=False)
+
+
+def _mask(array, null=True):
+    return pc.fill_null(array, null).to_numpy(zero_copy_only=False)
+
+
+def _cost_reasons(text, idx):
+    # Motivos dos custos fora do formato (só as linhas reprovadas são convertidas de novo)
+    n = len(text)
+    values = pd.to_numeric(pd.Series(text.take(idx).to_pylist(), dtype=object), errors='coerce').to_numpy(np.float64)
+    missing = np.isnan(values)
+    rules = [
+        ('Custo não numérico', missing),
+        ('Custo negativo', values < 0),
+        ('Custo não inteiro', ~missing & (values != np.floor(values))),
+        (f'Custo acima de {MAX_COST}', values > MAX_COST),
+    ]
+    # Ex.: '+5' ou ' 5' (número, mas fora do formato de dígitos)
+    rules.append(('Custo fora do formato', ~np.logical_or.reduce([hit for _, hit in rules])))
+    checks = []
+    for reason, hit in rules:
+        mask = np.zeros(n, dtype=bool)
+        mask[idx[hit]] = True
+        checks.append((reason, mask))
+    return checks
+
+
+def parse_block(data, columns):
+    # Linhas completas sem cabeçalho → (limpas tipadas, rejeitadas, linhas lidas). 'Linha' das
+    # rejeitadas conta a partir de 1 no início do bloco
+    invalid = []
+
+    def on_invalid(row):
+        invalid.append((row.number, f'{row.actual_columns} campos (esperados {row.expected_columns})', row.text))
+        return 'skip'
+
+    if data:
+        # Linhas vazias viram linhas de campos vazios (e são rejeitadas), para a numeração bater
+        table = pacsv.read_csv(
+            pa.py_buffer(data),
+            read_options=pacsv.ReadOptions(column_names=columns, use_threads=False),
+            parse_options=pacsv.ParseOptions(invalid_row_handler=on_invalid, ignore_empty_lines=False),
+            convert_options=pacsv.ConvertOptions(column_types={c: pa.string() for c in columns},
+                                                 strings_can_be_null=False, quoted_strings_can_be_null=False))
+    else:
+        table = _empty(columns)
+    rows = table.num_rows + len(invalid)
+    typed, checks = _validate(table)
+    bad = np.zeros(table.num_rows, dtype=bool)
+    for _, mask in checks:
+        bad |= mask
+
+    order = [c for c in COLUMNS + GEO_COLUMNS if c in typed]
+    clean = pd.DataFrame({c: typed[c] for c in order})
+    if bad.any():
+        clean = clean[~bad].reset_index(drop=True)
+
+    idx = np.flatnonzero(bad)
+    reasons = np.full(len(idx), '', dtype=object)
+    for reason, mask in checks:
+        hit = mask[idx]
+        reasons[hit] = reasons[hit] + reason + '; '
+    # Número de cada linha aceita pelo parser: as que não foram puladas por contagem de campos
+    numbers = idx + 1
+    if invalid and len(idx):
+        numbers = np.setdiff1d(np.arange(1, rows + 1), [n for n, _, _ in invalid])[idx]
+    rejected = pd.DataFrame({
+        'Linha': np.concatenate([numbers, np.array([n for n, _, _ in invalid], dtype=np.int64)]).astype(np.int64),
+        'Motivo': [r[:-2] for r in reasons] + [reason for _, reason, _ in invalid],
+        'Conteúdo': [','.join(row) for row in zip(*table.take(idx).select(columns).to_pydict().values())] +
+                    [text for _, _, text in invalid],
+    }, columns=QUARANTINE_COLUMNS)
+    return clean, rejected.sort_values('Linha', kind='stable').reset_index(drop=True), rows
+
+
+def write_quarantine(rejected, source, append=False):
+    # Grava as rejeitadas de source na sua quarentena; sem rejeitadas, uma leitura completa
+    # (append=False) apaga a quarentena anterior. Devolve o caminho (None se não houver arquivo)
+    path = quarantine_path(source)
+    if not len(rejected):
+        if not append and os.path.exists(path):
+            os.remove(path)
+        return path if os.path.exists(path) else None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    new = not append or not os.path.exists(path)
+    rejected.to_csv(path, mode='w' if new else 'a', header=new, index=False)
+    return path
+
+
+def _ranges(path, size, chunk_bytes):
+    # Cortes [início, fim) de ~chunk_bytes depois do cabeçalho, terminando em quebras de linha
+    ranges = []
+    with open(path, 'rb') as f:
+        start = len(f.readline())
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _read_range(path, start, end, columns):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return parse_block(data, columns)
+
+
+def iter_csv(path, report=None, chunk_bytes=CHUNK_BYTES, workers=None):
+    # Blocos limpos do arquivo, em ordem. Os blocos são lidos em paralelo, com no máximo dois por
+    # worker adiantados (memória limitada mesmo com um consumidor lento). Ao final, a quarentena é
+    # reescrita e o relatório (report, se dado) fica completo
+    report = IngestReport(path) if report is None else report
+    t0 = time.perf_counter()
+    columns = header(path)
+    size = os.path.getsize(path)
+    ranges = _ranges(path, size, chunk_bytes)
+    report.workers = workers = min(parallel.workers_for(size, chunk_bytes, workers), max(len(ranges), 1))
+
+    def results():
+        if workers == 1:
+            for start, end in ranges:
+                yield _read_range(path, start, end, columns)
+            return
+        pending = deque()
+        for start, end in ranges:
+            pending.append(parallel.thread_pool().submit(_read_range, path, start, end, columns))
+            if len(pending) > 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    line, rejected = 1, []  # linha 1: cabeçalho
+    if not ranges:
+        clean, _, _ = parse_block(b'', columns)
+        yield clean
+    for clean, bad, rows in results():
+        if len(bad):
+            bad['Linha'] += line
+            rejected.append(bad)
+            report.add(bad)
+        line += rows
+        report.rows += rows
+        report.chunks += 1
+        yield clean
+    report.quarantine = write_quarantine(
+        pd.concat(rejected, ignore_index=True) if rejected else pd.DataFrame(columns=QUARANTINE_COLUMNS), path)
+    report.bytes = size
+    report.seconds = time.perf_counter() - t0
+    remember(report)
+
+
+def read_csv(path, chunk_bytes=CHUNK_BYTES, workers=None):
+    # Arquivo inteiro → (DataFrame limpo, IngestReport)
+    report = IngestReport(path)
+    with tracing.span('ingestão.csv', 'ingestão', path=path):
+        parts = list(iter_csv(path, report, chunk_bytes, workers))
+    clean = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    return clean, report
+
+
+def read_lines(data, columns, source, first_line):
+    # Linhas completas acrescentadas a source (ex.: cauda do log) → (DataFrame limpo, IngestReport).
+    # first_line() dá o número no arquivo da primeira linha do bloco e só é chamada se houver
+    # rejeitadas; elas são acrescentadas à quarentena
+    t0 = time.perf_counter()
+    clean, rejected, rows = parse_block(data, columns)
+    report = IngestReport(source, rows, bytes=len(data), chunks=1)
+    if len(rejected):
+        rejected['Linha'] += first_line() - 1
+        report.add(rejected)
+        report.quarantine = write_quarantine(rejected, source, append=True)
+    report.seconds = time.perf_counter() - t0
+    return clean, remember(report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida um CSV de incidentes e mostra a vazão da ingestão")
+    parser.add_argument("path")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / 2**20, help="tamanho de cada bloco")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    _, report = read_csv(args.path, int(args.chunk_mb * 2**20), args.workers)
+    print(report.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# Teste de carga da API (api.py) contra um servidor local
+#
+#   python loadtest.py --requests 5000 --concurrency 64
+#   python loadtest.py --port 8765 --no-spawn      # servidor já em execução
+#
+# Sem --no-spawn, sobe api.py em um subprocesso, espera o /health e o encerra ao final.
+# Cada cliente mantém uma conexão keep-alive e sorteia filtros de um conjunto fixo (mistura
+# de consultas repetidas, que exercitam o cache, e combinações variadas).
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+
+from schema import CARRIERS, MODALS, REGIONS, RISK_TYPES
+
+ENDPOINTS = ['report', 'kpis', 'carriers', 'regions', 'routes', 'timeline', 'costs']
+
+
+def random_query(rng, variants):
+    # variants pequeno → muitas repetições (cache quente); grande → mais consultas distintas
+    seed = rng.randrange(variants)
+    r = random.Random(seed)
+    params = {}
+    if r.random() < 0.5:
+        month = r.randint(1, 5)
+        params['start'] = f'2025-{month:02d}-01'
+        params['end'] = f'2025-{month + 1:02d}-05'
+    for name, values in (('carriers', CARRIERS), ('risk_types', RISK_TYPES),
+                         ('modals', MODALS), ('regions', REGIONS)):
+        if r.random() < 0.3:
+            params[name] = ','.join(r.sample(values, r.randint(1, len(values))))
+    endpoint = ENDPOINTS[seed % len(ENDPOINTS)]
+    return f'/{endpoint}?{urlencode(params)}' if params else f'/{endpoint}'
+
+
+async def request(reader, writer, host, path):
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, queue, latencies, errors, rng, variants):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            path = random_query(rng, variants)
+            t0 = time.perf_counter()
+            status = await request(reader, writer, host, path)
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                errors.append((status, path))
+    finally:
+        writer.close()
+
+
+async def run(host, port, total, concurrency, variants, seed):
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+    latencies, errors = [], []
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(host, port, queue, latencies, errors, random.Random(rng.random()), variants)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    lat = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'latency_ms': {p: round(float(np.percentile(lat, q)), 2)
+                       for p, q in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))},
+    }
+
+
+async def wait_health(host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            status = await request(reader, writer, host, '/health')
+            writer.close()
+            if status == 200:
+                return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"API não respondeu em {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API de riscos logísticos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--variants", type=int, default=200,
+                        help="número de consultas distintas sorteadas")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-spawn", action="store_true", help="não subir api.py")
+    args = parser.parse_args()
+
+    server = None
+    if not args.no_spawn:
+        server = subprocess.Popen([sys.executable, 'api.py', '--host', args.host, '--port', str(args.port)])
+    try:
+        asyncio.run(wait_health(args.host, args.port))
+        result = asyncio.run(run(args.host, args.port, args.requests, args.concurrency,
+                                 args.variants, args.seed))
+        print(json.dumps(result, indent=2))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+# Índices de risco e realocação de carga entre modais e transportadoras
+#
+# Faixa = rota × modal × transportadora. O risco de uma faixa é o custo esperado por unidade de
+# carga. Os dados não têm volumes de carga, então a exposição de cada faixa é estimada pelos
+# incidentes dela em todo o histórico (mesmas transportadoras/modais/regiões filtrados, todos os
+# tipos de risco): a premissa neutra é que toda faixa tem a mesma taxa de incidentes por unidade de
+# carga. O custo vem do recorte atual (período e tipos de risco), então o índice aponta as faixas
+# em que os riscos selecionados pesam mais do que a exposição explica. Faixas com poucos
+# incidentes são puxadas para a média da rota (PRIOR_INCIDENTS incidentes de peso).
+#
+# Realocação: em cada rota a carga total é mantida e redistribuída entre as faixas existentes;
+# cada faixa perde no máximo MAX_SHIFT da sua carga e cresce no máximo a folga do seu modal
+# (HEADROOM). Faixas paralisadas (ex.: greve) ficam com capacidade zero. Com uma única restrição
+# de soma por rota e limites por faixa, o PL é uma mochila fracionária: o ótimo é encher primeiro
+# as faixas de menor custo unitário, o que é resolvido de uma vez para todas as rotas com numpy.
+
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+
+from cube import rollup
+
+LANE = ['Rota/Local Crítico', 'Modal Afetado', 'Transportadora']
+
+# Fração máxima da carga de uma faixa que pode ser movida para outras faixas
+MAX_SHIFT = 0.4
+
+# Capacidade ociosa por modal (fração da carga atual que a faixa consegue absorver)
+HEADROOM = {'Rodoviário': 0.30, 'Ferroviário': 0.20, 'Aéreo': 0.10}
+
+# Peso (em incidentes) da média da rota no custo unitário de cada faixa
+PRIOR_INCIDENTS = 20
+
+# Realocações abaixo desta fração da carga da rota não viram recomendação
+MIN_SHARE = 0.02
+
+
+@dataclass
+class Recommendation:
+    route: str
+    kind: str  # 'modal', 'transportadora' ou 'capacidade'
+    share: float  # fração da carga da rota realocada
+    sources: tuple
+    targets: tuple
+    carriers: tuple = ()  # transportadoras que recebem a carga (realocação entre modais)
+    saving: float = 0.0  # redução do custo esperado no período (R$; negativa = aumento)
+    saving_pct: float = 0.0
+    shortfall: float = 0.0  # fração da carga da rota sem capacidade disponível
+
+    @property
+    def title(self):
+        if self.kind == 'modal':
+            return f'Redirecionar carga em {self.route} para o modal {" e ".join(self.targets)}'
+        if self.kind == 'capacidade':
+            return f'Contratar capacidade extra em {self.route}'
+        return f'Redistribuir carga entre transportadoras em {self.route}'
+
+    @property
+    def text(self):
+        if self.kind == 'capacidade':
+            return ('{:.0f}% da carga da rota fica sem capacidade nas faixas disponíveis, mesmo com a folga '
+                    'de todos os modais.'.format(self.shortfall * 100))
+        if self.kind == 'modal':
+            move = 'Redirecionar {:.0f}% da carga do modal {} para o {} ({})'.format(
+                self.share * 100, ' e '.join(self.sources), ' e '.join(self.targets), ', '.join(self.carriers))
+        else:
+            move = 'Transferir {:.0f}% da carga de {} para {}'.format(
+                self.share * 100, ', '.join(self.sources), ', '.join(self.targets))
+        effect = '{} o custo esperado em R$ {} mil ({:.0f}%) no período'.format(
+            'reduz' if self.saving >= 0 else 'eleva', f'{abs(self.saving) / 1000:,.0f}'.replace(',', '.'),
+            abs(self.saving_pct))
+        text = f'{move}: {effect}.'
+        if self.shortfall > 0:
+            text += ' {:.0f}% da carga da rota fica sem capacidade nas demais faixas.'.format(self.shortfall * 100)
+        return text
+
+
+@dataclass
+class Plan:
+    lanes: pd.DataFrame  # LANE + Carga Atual, Custo, Custo Unitário, Carga Proposta
+    recommendations: list = field(default_factory=list)
+    cost: float = 0.0  # custo esperado com a alocação atual
+    optimized_cost: float = 0.0
+
+    @property
+    def saving(self):
+        return self.cost - self.optimized_cost
+
+    def scores(self, dimension):
+        # Índice de risco por valor da dimensão (1 = média do recorte)
+        frame = self.lanes.groupby(dimension, observed=True).agg(
+            Exposição=('Carga Atual', 'sum'), Custo=('Custo', 'sum')).reset_index()
+        overall = self.lanes['Custo'].sum() / max(self.lanes['Carga Atual'].sum(), 1)
+        rate = frame['Custo'] / frame['Exposição'].where(frame['Exposição'] > 0)
+        frame['Índice de Risco'] = (rate / overall if overall > 0 else rate * 0).fillna(0.0)
+        return frame.sort_values('Índice de Risco', ascending=False).reset_index(drop=True)
+
+
+def solve(groups, unit_cost, total, lower, upper):
+    # min Σ custo·x  s.a.  Σ_grupo x = total[grupo], lower ≤ x ≤ upper
+    # Devolve (x, carga sem capacidade por grupo)
+    n_groups = len(total)
+    order = np.lexsort((unit_cost, groups))
+    g = groups[order]
+    room = (upper - lower)[order]
+    free = total - np.bincount(groups, weights=lower, minlength=n_groups)
+    # Capacidade já tomada pelas faixas mais baratas do mesmo grupo
+    before = np.cumsum(room) - room
+    before -= np.concatenate([[0.0], np.cumsum(np.bincount(g, weights=room, minlength=n_groups))[:-1]])[g]
+    fill = np.clip(free[g] - before, 0.0, room)
+    x = lower.astype(np.float64).copy()
+    x[order] += fill
+    shortfall = np.maximum(free - np.bincount(g, weights=room, minlength=n_groups), 0.0)
+    return x, shortfall
+
+
+def lane_table(cube, filters):
+    # Exposição (histórico inteiro, todos os riscos) e custo do recorte por faixa
+    selections = filters.selections()
+    exposure = rollup(cube.slice(None, None, {**selections, 'Tipo de Risco': []}), LANE)
+    cost = rollup(cube.slice(filters.start, filters.end, selections), LANE)
+    lanes = exposure[LANE + ['Incidentes']].rename(columns={'Incidentes': 'Carga Atual'})
+    lanes = lanes.merge(cost[LANE + ['Custo']], on=LANE, how='left')
+    lanes['Custo'] = lanes['Custo'].fillna(0.0).astype(np.float64)
+    lanes['Carga Atual'] = lanes['Carga Atual'].astype(np.float64)
+    return lanes
+
+
+def plan(cube, filters, unavailable=()):
+    # unavailable: pares (transportadora, modal) paralisados
+    lanes = lane_table(cube, filters)
+    routes, route = np.unique(lanes['Rota/Local Crítico'].astype(str).to_numpy(), return_inverse=True)
+    volume = lanes['Carga Atual'].to_numpy()
+    cost = lanes['Custo'].to_numpy()
+
+    route_volume = np.bincount(route, weights=volume, minlength=len(routes))
+    route_rate = np.bincount(route, weights=cost, minlength=len(routes)) / np.maximum(route_volume, 1)
+    unit = (cost + PRIOR_INCIDENTS * route_rate[route]) / (volume + PRIOR_INCIDENTS)
+
+    headroom = lanes['Modal Afetado'].astype(str).map(HEADROOM).fillna(0.0).to_numpy()
+    lower = volume * (1 - MAX_SHIFT)
+    upper = volume * (1 + headroom)
+    stopped = np.array([(c, m) in set(unavailable) for c, m in
+                        zip(lanes['Transportadora'].astype(str), lanes['Modal Afetado'].astype(str))], dtype=bool)
+    lower[stopped] = upper[stopped] = 0.0
+
+    proposed, shortfall = solve(route, unit, route_volume, lower, upper)
+    lanes['Custo Unitário'] = unit
+    lanes['Carga Proposta'] = proposed
+    current_cost = unit * volume
+    new_cost = unit * proposed
+    result = Plan(lanes, cost=float(current_cost.sum()), optimized_cost=float(new_cost.sum()))
+
+    for i, name in enumerate(routes):
+        rows = route == i
+        if route_volume[i] <= 0:
+            continue
+        saving = float(current_cost[rows].sum() - new_cost[rows].sum())
+        rec = _recommendation(lanes[rows], name, route_volume[i], saving, float(current_cost[rows].sum()),
+                              shortfall[i] / route_volume[i])
+        if rec is not None:
+            result.recommendations.append(rec)
+    result.recommendations.sort(key=lambda r: (r.shortfall, r.saving), reverse=True)
+    return result
+
+
+def _recommendation(lanes, route, volume, saving, cost, shortfall):
+    delta = lanes['Carga Proposta'] - lanes['Carga Atual']
+    by_modal = delta.groupby(lanes['Modal Afetado'].astype(str)).sum()
+    gained = by_modal[by_modal > 0]
+    rec = Recommendation(route, 'modal', float(gained.sum() / volume),
+                         tuple(by_modal[by_modal < 0].index), tuple(gained.index),
+                         saving=saving, saving_pct=saving / cost * 100 if cost else 0.0, shortfall=float(shortfall))
+    if rec.share >= MIN_SHARE:
+        receivers = lanes[(delta > 0).to_numpy() & lanes['Modal Afetado'].astype(str).isin(gained.index).to_numpy()]
+        order = delta[receivers.index].sort_values(ascending=False).index
+        rec.carriers = tuple(dict.fromkeys(receivers.loc[order, 'Transportadora'].astype(str)))
+        return rec
+    by_carrier = delta.groupby(lanes['Transportadora'].astype(str)).sum()
+    gained = by_carrier[by_carrier > 0].sort_values(ascending=False)
+    rec = replace(rec, kind='transportadora', share=float(gained.sum() / volume),
+                  sources=tuple(by_carrier[by_carrier < 0].sort_values().index), targets=tuple(gained.index))
+    if rec.share >= MIN_SHARE:
+        return rec
+    if shortfall > 0:
+        return replace(rec, kind='capacidade', share=0.0, sources=(), targets=())
+    return None
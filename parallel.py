@@ -0,0 +1,126 @@
+# Execução paralela das agregações pesadas
+#
+# Os dados são particionados por faixa de dias e cada partição produz agregados parciais, que
+# depois são fundidos:
+#   - incidentes → células do cubo (aggregate): pool de processos. Os arrays compactos são
+#     copiados uma vez para um bloco de memória compartilhada (multiprocessing.shared_memory) e
+#     cada processo lê só a sua faixa, sem pickle dos dados; volta só o agregado parcial. Os
+#     cortes caem em fronteiras de dia, então as partições não têm células em comum e a fusão é
+#     uma concatenação (na mesma ordem do caminho serial).
+#   - células recortadas → visões das seções (map_reduce): pool de threads sobre fatias do mesmo
+#     DataFrame (memória compartilhada por construção; numpy e os groupbys do pandas liberam o
+#     GIL nas partes pesadas). Cada visão define seu parcial e sua fusão (queries.VIEW_PARTIALS).
+# Entradas pequenas ficam no caminho serial: abaixo de MIN_ROWS_PER_WORKER linhas (ou
+# MIN_CELLS_PER_WORKER células) por worker, criar e coordenar o pool custa mais que o ganho.
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from compact import CODE_COLUMNS, CompactIncidents
+
+WORKERS = os.cpu_count() or 1
+MIN_ROWS_PER_WORKER = 2_000_000
+MIN_CELLS_PER_WORKER = 250_000
+
+_threads = None
+_threads_lock = threading.Lock()
+
+
+def workers_for(n, min_per_worker, workers=None):
+    return max(1, min(workers or WORKERS, n // min_per_worker))
+
+
+def day_partitions(days, parts):
+    # Cortes [lo, hi) com ~o mesmo número de linhas, ajustados para o início de um dia
+    cuts = [0]
+    for i in range(1, parts):
+        cut = int(np.searchsorted(days, days[len(days) * i // parts], side='left'))
+        if cut > cuts[-1]:
+            cuts.append(cut)
+    cuts.append(len(days))
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+class SharedIncidents:
+    # Arrays de um CompactIncidents num único bloco de memória compartilhada
+    def __init__(self, incidents):
+        arrays = [('days', incidents.days)] + [(col, incidents.codes[col]) for col in CODE_COLUMNS] + \
+                 [('cost', incidents.cost)]
+        self.layout, offset = [], 0
+        for key, array in arrays:
+            self.layout.append((key, array.dtype.str, offset, len(array)))
+            offset += array.nbytes
+        self.tables = incidents.tables
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (key, dtype, start, n), (_, array) in zip(self.layout, arrays):
+            np.ndarray(n, dtype, buffer=self.shm.buf, offset=start)[:] = array
+
+    def spec(self):
+        return self.shm.name, self.layout, self.tables
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shm.close()
+        self.shm.unlink()
+        return False
+
+
+def _aggregate_partition(task):
+    # Executado no worker: liga-se ao bloco compartilhado e agrega só [lo, hi)
+    (name, layout, tables), lo, hi, dimensions = task
+    # Os workers compartilham o resource_tracker do processo principal, que remove o bloco
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        arrays = {key: np.ndarray(n, dtype, buffer=shm.buf, offset=start)[lo:hi]
+                  for key, dtype, start, n in layout}
+        part = CompactIncidents(arrays['days'], {col: arrays[col] for col in CODE_COLUMNS},
+                                arrays['cost'], tables)
+        cells = part.aggregate(dimensions)
+        del part, arrays
+        return cells
+    finally:
+        shm.close()
+
+
+def aggregate(incidents, dimensions, workers=None):
+    # CompactIncidents → células do cubo, em paralelo quando a entrada é grande
+    parts = workers_for(len(incidents), MIN_ROWS_PER_WORKER, workers)
+    if parts == 1:
+        return incidents.aggregate(dimensions)
+    ranges = day_partitions(incidents.days, parts)
+    with SharedIncidents(incidents) as shared:
+        tasks = [(shared.spec(), lo, hi, dimensions) for lo, hi in ranges]
+        with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+            cells = list(pool.map(_aggregate_partition, tasks))
+    for col in dimensions[1:]:
+        # Categorias iguais em todas as partes (a tabela é a mesma), concat mantém a categórica
+        for part in cells:
+            part[col] = part[col].cat.set_categories(incidents.tables[col])
+    return pd.concat(cells, ignore_index=True)
+
+
+def thread_pool():
+    global _threads
+    with _threads_lock:
+        if _threads is None:
+            _threads = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='agregacao')
+    return _threads
+
+
+def map_reduce(frame, tasks, workers=None):
+    # tasks: {nome: (parcial(pedaço), fusão(parciais))}; None se o frame for pequeno demais
+    parts = workers_for(len(frame), MIN_CELLS_PER_WORKER, workers)
+    if parts == 1:
+        return None
+    bounds = np.linspace(0, len(frame), parts + 1).astype(int)
+    chunks = [frame.iloc[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+    futures = {name: [thread_pool().submit(partial, chunk) for chunk in chunks]
+               for name, (partial, _) in tasks.items()}
+    return {name: merge([f.result() for f in futures[name]]) for name, (_, merge) in tasks.items()}
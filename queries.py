@@ -0,0 +1,249 @@
+# Camada de consultas do relatório, independente do Streamlit
+#
+# Filters é a forma canônica do estado da sidebar (seleções ordenadas, sem duplicatas; seleção
+# vazia ou completa = sem filtro), usada como chave de cache. compute_view() produz uma visão
+# isolada (o dashboard calcula e cacheia cada seção separadamente) e compute_views() todas de
+# uma vez, com um único recorte do cubo; as funções query_* devolvem estruturas prontas para JSON,
+# usadas pela API HTTP (api.py) e por qualquer outra ferramenta que precise dos mesmos números.
+
+import datetime
+from dataclasses import asdict, dataclass
+
+import pandas as pd
+
+import parallel
+import temporal
+import tracing
+from aggregations import TOP_CARRIERS, compute_kpis, kpi_tensors, merge_kpi_tensors
+from cube import rollup
+
+# Campo do Filters → coluna filtrada
+FILTER_COLUMNS = {
+    'carriers': 'Transportadora',
+    'risk_types': 'Tipo de Risco',
+    'modals': 'Modal Afetado',
+    'regions': 'Região',
+}
+
+
+def _parse_date(value):
+    if value is None or value == '' or isinstance(value, datetime.date):
+        return value or None
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+@dataclass(frozen=True)
+class Filters:
+    start: datetime.date = None
+    end: datetime.date = None
+    carriers: tuple = ()
+    risk_types: tuple = ()
+    modals: tuple = ()
+    regions: tuple = ()
+
+    @classmethod
+    def from_dict(cls, params):
+        # Aceita listas ou strings separadas por vírgula (query string)
+        values = {}
+        for name in FILTER_COLUMNS:
+            raw = params.get(name) or ()
+            if isinstance(raw, str):
+                raw = [v for v in raw.split(',') if v]
+            values[name] = tuple(raw)
+        return cls(_parse_date(params.get('start')), _parse_date(params.get('end')), **values)
+
+    def normalized(self, categories=None):
+        # categories: {coluna: valores existentes}; seleção que cobre todos vira "sem filtro"
+        values = {}
+        for name, col in FILTER_COLUMNS.items():
+            selected = tuple(sorted(set(getattr(self, name))))
+            if categories is not None and set(selected).issuperset(categories.get(col, ())):
+                selected = ()
+            values[name] = selected
+        return Filters(_parse_date(self.start), _parse_date(self.end), **values)
+
+    def selections(self):
+        return {col: list(getattr(self, name)) for name, col in FILTER_COLUMNS.items()}
+
+    def to_dict(self):
+        return {
+            'start': self.start.isoformat() if self.start else None,
+            'end': self.end.isoformat() if self.end else None,
+            **{name: list(getattr(self, name)) for name in FILTER_COLUMNS},
+        }
+
+
+def normalize(cube, filters):
+    return filters.normalized(cube.index.categories)
+
+
+def period_partial(cells, granularity, by):
+    # Incidentes/custo por (código inteiro do balde temporal, by); parcial somável entre pedaços
+    codes = temporal.buckets(temporal.day_ordinals(cells['Data']), granularity)
+    return rollup(cells[by + ['Incidentes', 'Custo']].assign(Período=codes), ['Período'] + by)
+
+
+def label_periods(partial, granularity):
+    # Código do balde → coluna de rótulo (temporal.LABELS), em ordem cronológica
+    frame = partial.sort_values('Período', kind='stable')
+    labels = temporal.bucket_labels(frame['Período'].to_numpy(), granularity)
+    frame = frame.drop(columns='Período')
+    frame.insert(0, temporal.LABELS[granularity], labels.astype(object))
+    return frame.reset_index(drop=True)
+
+
+def _period_view(granularity, by=('Tipo de Risco',)):
+    by = list(by)
+    view = lambda cells: label_periods(period_partial(cells, granularity, by), granularity)
+    partial = lambda cells: period_partial(cells, granularity, by)
+    merge = lambda parts: label_periods(rollup(pd.concat(parts, ignore_index=True), ['Período'] + by), granularity)
+    return view, (partial, merge)
+
+
+# Série temporal por tipo de risco em cada granularidade: 'day_risk', 'week_risk', 'month_risk'...
+PERIOD_VIEWS = {g + '_risk': _period_view(g) for g in temporal.GRANULARITIES}
+
+# Visão → função sobre as células recortadas pelos filtros
+VIEWS = {
+    'kpis': compute_kpis,
+    **{name: view for name, (view, _) in PERIOD_VIEWS.items()},
+    'risk': lambda cells: rollup(cells, 'Tipo de Risco'),
+    'carrier': lambda cells: rollup(cells, 'Transportadora'),
+    'region': lambda cells: rollup(cells, 'Região'),
+    'route': lambda cells: rollup(cells, 'Rota/Local Crítico'),
+}
+
+# Visões do relatório completo (API/CLI); as outras granularidades só quando pedidas
+REPORT_VIEWS = ['kpis', 'month_risk', 'risk', 'carrier', 'region', 'route']
+
+
+def _rollup_partials(by):
+    return (lambda cells: rollup(cells, by)), (lambda parts: rollup(pd.concat(parts, ignore_index=True), by))
+
+
+# Visão → (parcial sobre um pedaço das células, fusão dos parciais), para recortes grandes
+VIEW_PARTIALS = {
+    'kpis': (kpi_tensors, merge_kpi_tensors),
+    **{name: partials for name, (_, partials) in PERIOD_VIEWS.items()},
+    'risk': _rollup_partials('Tipo de Risco'),
+    'carrier': _rollup_partials('Transportadora'),
+    'region': _rollup_partials('Região'),
+    'route': _rollup_partials('Rota/Local Crítico'),
+}
+
+
+def run_views(cells, names):
+    # Recortes grandes são divididos entre threads (parallel.py) e os parciais fundidos
+    results = parallel.map_reduce(cells, {name: VIEW_PARTIALS[name] for name in names})
+    if results is None:
+        results = {name: VIEWS[name](cells) for name in names}
+    return results
+
+
+def compute_view(cube, name, filters):
+    with tracing.span('cubo.recorte', 'consulta', view=name):
+        cells = cube.slice(filters.start, filters.end, filters.selections())
+    with tracing.span(f'consulta.{name}', 'consulta', cells=len(cells)):
+        return run_views(cells, [name])[name]
+
+
+def compute_views(cube, filters):
+    cells = cube.slice(filters.start, filters.end, filters.selections())
+    return run_views(cells, REPORT_VIEWS)
+
+
+def _records(df):
+    out = df.copy()
+    for col in out.columns:
+        if isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype(str)
+    return out.to_dict(orient='records')
+
+
+def query_kpis(views):
+    k = views['kpis']
+    return {
+        'total_incidents': k.total_incidents,
+        'total_cost': k.total_cost,
+        'high_criticality': k.high_criticality,
+        'high_criticality_pct': k.high_criticality_pct,
+        'top_route': k.top_route,
+        'top_route_count': k.top_route_count,
+        'top_route_pct': k.top_route_pct,
+    }
+
+
+def query_carriers(views, carriers=TOP_CARRIERS):
+    k = views['kpis']
+    return {
+        'top': [
+            {
+                'carrier': s.carrier,
+                'incidents': s.incidents,
+                'total_cost': s.total_cost,
+                'mean_cost': s.mean_cost,
+                'predominant_risk': s.top_risk,
+                'predominant_risk_pct': s.top_risk_pct,
+            }
+            for s in (k.carriers[c] for c in carriers) if s.incidents > 0
+        ],
+        'incidents': _records(views['carrier'].sort_values('Incidentes', ascending=False)),
+    }
+
+
+def query_regions(views):
+    regions = views['region'].copy()
+    total = regions['Incidentes'].sum()
+    regions['Percentual'] = regions['Incidentes'] / total * 100 if total else 0.0
+    return _records(regions)
+
+
+def query_routes(views, top=5):
+    return _records(views['route'].sort_values('Incidentes', ascending=False).head(top))
+
+
+def query_timeline(views):
+    return _records(views['month_risk'])
+
+
+def query_costs_by_risk(views):
+    return _records(views['risk'])
+
+
+QUERIES = {
+    'kpis': query_kpis,
+    'carriers': query_carriers,
+    'regions': query_regions,
+    'routes': query_routes,
+    'timeline': query_timeline,
+    'costs': query_costs_by_risk,
+}
+
+
+def query_forecast(outlook):
+    # outlook: resultado de forecasting.outlook()
+    return {
+        'label': outlook['label'],
+        'months': _records(outlook['months'].astype(object).where(outlook['months'].notna(), None)),
+        'target': asdict(outlook['target']),
+        'strike_probability_daily': outlook['strike'].probability_daily if outlook['strike'] else None,
+    }
+
+
+def query_alerts(alerts):
+    # alerts: lista de alerts.Alert (ex.: AnomalyDetector.active())
+    return [{**asdict(a), 'message': a.message, 'recommendation': a.recommendation} for a in alerts]
+
+
+def query_plan(plan, top=5):
+    # plan: resultado de optimizer.plan()
+    return {
+        'cost': plan.cost,
+        'optimized_cost': plan.optimized_cost,
+        'recommendations': [{**asdict(r), 'title': r.title, 'text': r.text} for r in plan.recommendations[:top]],
+        'scores': {dim: _records(plan.scores(dim)) for dim in ('Rota/Local Crítico', 'Modal Afetado', 'Transportadora')},
+    }
+
+
+def query_report(views):
+    return {name: fn(views) for name, fn in QUERIES.items()}
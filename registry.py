@@ -0,0 +1,230 @@
+# Registro de conjuntos de dados (um por unidade de negócio) servidos pelo mesmo processo
+#
+# Os conjuntos são declarados num arquivo JSON (DATASETS_CONFIG, padrão home/datasets.json):
+#
+#   {"memory_budget_mb": 2048,
+#    "datasets": {
+#      "logistica": {"title": "Logística", "path": "home/riscos_logisticos_2025.csv",
+#                    "history": "home/historico", "incoming": "home/incoming"},
+#      "varejo": {"title": "Varejo", "path": "home/varejo/incidentes.csv", "streaming": true}}}
+#
+# Sem o arquivo, o registro tem só o conjunto padrão (storage.CSV_PATH, home/historico e
+# home/incoming). history (arquivo de anos anteriores) é opcional; incoming vale por padrão
+# home/incoming/<conjunto>, para que um lote nunca caia no log de outra unidade.
+#
+# Cada conjunto é carregado no primeiro acesso (store incremental, detector de alertas, modelos
+# de previsão, grade do mapa) e compartilhado por todas as sessões; acessos simultâneos a um
+# conjunto frio esperam uma única carga. Quando a memória estimada dos conjuntos carregados passa
+# do orçamento, os usados há mais tempo saem do registro (o próximo acesso recarrega; sessões que
+# ainda os usam seguem com a referência que já têm, e a memória é liberada quando a soltam).
+# Cargas, despejos, seus tempos e a memória de cada conjunto ficam em stats().
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import alerts
+import forecasting
+import geo
+import history
+import storage
+import tracing
+from incremental import INCOMING_PATH, IncidentStore
+
+CONFIG_PATH = 'home/datasets.json'
+DEFAULT_BUDGET_MB = 2048
+DEFAULT_DATASET = 'padrao'
+
+
+@dataclass(frozen=True)
+class Dataset:
+    name: str
+    title: str
+    path: str
+    history: str = None  # pasta do arquivo histórico (history.py); None = sem arquivo
+    incoming: str = None  # pasta de lotes novos (incremental.DropFolder)
+    streaming: bool = False
+
+
+class LoadedDataset:
+    # Tudo o que o relatório usa de um conjunto, carregado uma vez e compartilhado pelas sessões
+    def __init__(self, dataset):
+        self.dataset = dataset
+        with tracing.span('registro.store', 'registro', dataset=dataset.name):
+            self.store = IncidentStore(dataset.path, incoming=dataset.incoming, streaming=dataset.streaming)
+        with tracing.span('registro.detector', 'registro', dataset=dataset.name):
+            self.detector = alerts.AnomalyDetector().attach(self.store)
+        self.forecaster = forecasting.Forecaster()
+        with tracing.span('registro.geo', 'registro', dataset=dataset.name):
+            self.geo = geo.load_pyramid(dataset.path)
+        self._history = None
+        self._history_key = None
+        self._lock = threading.Lock()
+
+    def history(self):
+        # Histórico por período (arquivo + dados atuais), refeito só quando um dos dois muda
+        key = (self.store.data_key(), history.archive_version(self.dataset.history))
+        with self._lock:
+            if self._history_key != key:
+                self._history = history.PeriodHistory.combine(self.store.cube, self.dataset.history)
+                self._history_key = key
+            return self._history
+
+    def nbytes(self):
+        return footprint(self.store, self.detector, self.forecaster, self.geo, self._history)
+
+
+def footprint(*objects):
+    # Memória estimada: arrays numpy e objetos pandas alcançáveis a partir dos objetos (o resto é
+    # desprezível perto deles). Views contam o array base uma vez
+    seen, total, stack = set(), 0, list(objects)
+    while stack:
+        obj = stack.pop()
+        if obj is None or id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, np.ndarray):
+            if isinstance(obj.base, np.ndarray):
+                stack.append(obj.base)
+            else:
+                total += obj.nbytes
+        elif isinstance(obj, pd.DataFrame):
+            total += int(obj.memory_usage(deep=True).sum())
+        elif isinstance(obj, (pd.Series, pd.Index)):
+            total += int(obj.memory_usage(deep=True))
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dict__') and not isinstance(obj, type) and not callable(obj):
+            stack.extend(vars(obj).values())
+    return total
+
+
+class Registry:
+    def __init__(self, datasets, memory_budget=DEFAULT_BUDGET_MB * 2**20):
+        self.datasets = OrderedDict((d.name, d) for d in datasets)
+        self.memory_budget = memory_budget
+        self._loaded = OrderedDict()  # nome → (LoadedDataset, bytes), do menos ao mais recente
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.metrics = {name: {'accesses': 0, 'loads': 0, 'load_seconds': 0.0, 'last_load_seconds': None,
+                               'evictions': 0, 'last_eviction_seconds': None}
+                        for name in self.datasets}
+
+    @classmethod
+    def from_config(cls, path=None):
+        path = path or os.environ.get('DATASETS_CONFIG') or CONFIG_PATH
+        streaming = os.environ.get('DASHBOARD_STREAMING') == '1'
+        if not os.path.exists(path):
+            return cls([Dataset(DEFAULT_DATASET, 'Riscos logísticos 2025', storage.CSV_PATH,
+                                history.HISTORY_PATH, INCOMING_PATH, streaming)])
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        datasets = [
+            Dataset(name, entry.get('title', name), entry['path'], entry.get('history'),
+                    entry.get('incoming') or os.path.join(INCOMING_PATH, name),
+                    bool(entry.get('streaming', streaming)))
+            for name, entry in config['datasets'].items()
+        ]
+        if not datasets:
+            raise ValueError(f'{path}: nenhum conjunto de dados declarado')
+        return cls(datasets, int(float(config.get('memory_budget_mb', DEFAULT_BUDGET_MB)) * 2**20))
+
+    @property
+    def default(self):
+        return next(iter(self.datasets))
+
+    def title(self, name):
+        return self.datasets[name].title
+
+    def get(self, name):
+        # Conjunto carregado (carga no primeiro acesso ou após um despejo)
+        if name not in self.datasets:
+            raise KeyError(f'conjunto de dados desconhecido: {name}')
+        with self._lock:
+            self.metrics[name]['accesses'] += 1
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                return self._loaded[name][0]
+            lock = self._inflight.setdefault(name, threading.Lock())
+        with lock:
+            # Outra sessão pode ter carregado enquanto esperávamos
+            with self._lock:
+                if name in self._loaded:
+                    self._loaded.move_to_end(name)
+                    return self._loaded[name][0]
+            t0 = time.perf_counter()
+            with tracing.span('registro.carga', 'registro', dataset=name):
+                loaded = LoadedDataset(self.datasets[name])
+            elapsed = time.perf_counter() - t0
+            size = loaded.nbytes()
+            with self._lock:
+                metrics = self.metrics[name]
+                metrics['loads'] += 1
+                metrics['load_seconds'] += elapsed
+                metrics['last_load_seconds'] = elapsed
+                self._loaded[name] = (loaded, size)
+                self._inflight.pop(name, None)
+                self._evict()
+        return loaded
+
+    def _evict(self):
+        # Chamado com o lock: despeja os menos recentes até caber no orçamento (o recém-usado fica)
+        while len(self._loaded) > 1 and self.used_bytes() > self.memory_budget:
+            t0 = time.perf_counter()
+            with tracing.span('registro.despejo', 'registro'):
+                name, entry = self._loaded.popitem(last=False)
+                # Sem outras referências (sessões em andamento), a memória é liberada aqui
+                del entry
+            metrics = self.metrics[name]
+            metrics['evictions'] += 1
+            metrics['last_eviction_seconds'] = time.perf_counter() - t0
+
+    def used_bytes(self):
+        return sum(size for _, size in self._loaded.values())
+
+    def remeasure(self, name):
+        # Atualiza a memória estimada de um conjunto carregado (ex.: após lotes novos) e despeja
+        # outros conjuntos se o orçamento estourou
+        with self._lock:
+            entry = self._loaded.get(name)
+        if entry is None:
+            return
+        size = entry[0].nbytes()
+        with self._lock:
+            if name in self._loaded:
+                self._loaded[name] = (entry[0], size)
+                self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'memory_budget': self.memory_budget,
+                'used_bytes': self.used_bytes(),
+                'datasets': {
+                    name: {'title': d.title, 'loaded': name in self._loaded,
+                           'bytes': self._loaded[name][1] if name in self._loaded else 0,
+                           **self.metrics[name]}
+                    for name, d in self.datasets.items()
+                },
+            }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_registry():
+    # Instância única por processo, lida do arquivo de configuração na primeira chamada
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Registry.from_config()
+        return _shared
@@ -0,0 +1,406 @@
+# Peças do relatório executivo: estilo, figuras Plotly e blocos HTML
+#
+# Compartilhadas pelo dashboard (dashboard.py) e pelos snapshots estáticos (snapshots.py), para
+# que as duas formas do relatório mostrem exatamente as mesmas figuras e cartões.
+
+import functools
+
+import plotly.express as px
+import plotly.graph_objects as go
+
+import geo
+import history
+import simulation
+import temporal
+from figures import downsample
+
+
+STYLE = """
+<style>
+    .main-header {
+        font-size: 2.5rem;
+        font-weight: 700;
+        color: #1E3A8A;
+        text-align: center;
+        margin-bottom: 1rem;
+        padding-bottom: 1rem;
+        border-bottom: 2px solid #E5E7EB;
+    }
+    .sub-header {
+        font-size: 1.8rem;
+        font-weight: 600;
+        color: #1E3A8A;
+        margin-top: 2rem;
+        margin-bottom: 1rem;
+    }
+    .card {
+        background-color: #F3F4F6;
+        border-radius: 10px;
+        padding: 1.5rem;
+        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+        margin-bottom: 1rem;
+    }
+    .metric-container {
+        display: flex;
+        justify-content: space-between;
+        flex-wrap: wrap;
+    }
+    .metric-card {
+        background-color: white;
+        border-radius: 8px;
+        padding: 1rem;
+        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
+        margin-bottom: 1rem;
+        flex: 1;
+        min-width: 200px;
+        margin-right: 1rem;
+    }
+    .metric-title {
+        font-size: 1rem;
+        color: #6B7280;
+        margin-bottom: 0.5rem;
+    }
+    .metric-value {
+        font-size: 1.8rem;
+        font-weight: 700;
+        color: #1E3A8A;
+    }
+    .metric-change {
+        font-size: 0.9rem;
+        font-weight: 500;
+    }
+    .metric-change-positive {
+        color: #10B981;
+    }
+    .metric-change-negative {
+        color: #EF4444;
+    }
+    .alert-box {
+        background-color: #FECACA;
+        border-left: 5px solid #EF4444;
+        padding: 1rem;
+        border-radius: 5px;
+        margin-bottom: 1rem;
+    }
+    .insight-box {
+        background-color: #DBEAFE;
+        border-left: 5px solid #3B82F6;
+        padding: 1rem;
+        border-radius: 5px;
+        margin-bottom: 1rem;
+    }
+    .footer {
+        text-align: center;
+        margin-top: 3rem;
+        padding-top: 1rem;
+        border-top: 1px solid #E5E7EB;
+        color: #6B7280;
+        font-size: 0.9rem;
+    }
+</style>
+"""
+
+
+def timeline_figure(period_risk, granularity='month'):
+    # Séries longas (ex.: granularidade diária em anos de histórico) são reduzidas no servidor
+    period = temporal.LABELS[granularity]
+    incidents_by_period_risk = downsample(period_risk, period, 'Incidentes', color='Tipo de Risco')
+    fig_timeline = px.line(incidents_by_period_risk, x=period, y='Incidentes', color='Tipo de Risco',
+                          title='Evolução de Incidentes por Tipo de Risco',
+                          markers=True, line_shape='linear')
+    fig_timeline.update_layout(xaxis_title=period, yaxis_title='Número de Incidentes',
+                             legend_title='Tipo de Risco', height=500)
+    return fig_timeline
+
+
+def cost_pie_figure(risk):
+    # Gráfico de pizza para distribuição de custos por tipo de risco
+    cost_by_risk = risk.assign(**{'Custo (R$ milhões)': risk['Custo'] / 1_000_000})
+
+    fig_cost_pie = px.pie(cost_by_risk, values='Custo (R$ milhões)', names='Tipo de Risco',
+                         title='Distribuição de Custos por Tipo de Risco')
+    fig_cost_pie.update_traces(textposition='inside', textinfo='percent+label')
+    return fig_cost_pie
+
+
+def carriers_figure(carrier):
+    # Gráfico de barras comparativo
+    carrier_incidents = carrier.sort_values('Incidentes', ascending=False)
+
+    fig_carriers = px.bar(carrier_incidents, x='Transportadora', y='Incidentes',
+                         title='Número de Incidentes por Transportadora',
+                         color='Transportadora')
+    fig_carriers.update_layout(xaxis_title='Transportadora', yaxis_title='Número de Incidentes')
+    return fig_carriers
+
+
+def regions_figure(region_incidents):
+    # Distribuição de incidentes por região
+    region_incidents = region_incidents.assign(
+        Percentual=region_incidents['Incidentes'] / region_incidents['Incidentes'].sum() * 100)
+
+    fig_regions = px.bar(region_incidents, x='Região', y='Percentual',
+                        title='Distribuição de Incidentes por Região (%)',
+                        color='Região')
+    fig_regions.update_layout(xaxis_title='Região', yaxis_title='Percentual de Incidentes (%)')
+    return fig_regions
+
+
+def map_figure(pyramid, route_incidents, area, detail, measure):
+    # Tiles pré-agregados do recorte, no nível de detalhe pedido
+    viewport = geo.VIEWPORTS[area]
+    level = geo.level_for(viewport, detail)
+    tiles = pyramid.tiles(level, route_incidents, viewport)
+    center, zoom = geo.view(viewport)
+    radius = min(max(geo.tile_size(level) * 512 * 2 ** zoom / 360, 3), 40)
+    fig_map = px.density_map(tiles, lat='Latitude', lon='Longitude', z=measure, radius=radius,
+                             center=center, zoom=zoom, map_style='carto-positron',
+                             hover_data={'Incidentes': ':.1f', 'Custo': ':,.0f'},
+                             title='Densidade de {} ({})'.format('Incidentes' if measure == 'Incidentes' else 'Custos', area))
+    fig_map.update_layout(height=550, margin={'l': 0, 'r': 0, 't': 40, 'b': 0})
+    return fig_map
+
+
+def routes_figure(route_incidents):
+    # Rotas críticas
+    route_incidents = route_incidents.sort_values('Incidentes', ascending=False).head(5)
+
+    fig_routes = px.bar(route_incidents, x='Rota/Local Crítico', y='Incidentes',
+                       title='Top 5 Rotas Críticas',
+                       color='Rota/Local Crítico')
+    fig_routes.update_layout(xaxis_title='Rota/Local Crítico', yaxis_title='Número de Incidentes')
+    return fig_routes
+
+
+# Figura → (visões usadas, construtor); o mapa depende também da grade de tiles (map_figure)
+CHARTS = {
+    **{'timeline_' + g: ((g + '_risk',), functools.partial(timeline_figure, granularity=g))
+       for g in temporal.GRANULARITIES},
+    'cost_pie': (('risk',), cost_pie_figure),
+    'carriers': (('carrier',), carriers_figure),
+    'regions': (('region',), regions_figure),
+    'routes': (('route',), routes_figure),
+}
+
+
+def forecast_figure(outlook):
+    months = outlook['months']
+    past = months[months['Incidentes'].notna() & ~months['Parcial']]
+    # A linha de previsão parte do último mês fechado
+    predicted = months.iloc[max(len(past) - 1, 0):]
+
+    fig_forecast = go.Figure()
+    fig_forecast.add_trace(go.Scatter(
+        x=list(predicted['Mês']) + list(predicted['Mês'][::-1]),
+        y=list(predicted['Máximo']) + list(predicted['Mínimo'][::-1]),
+        fill='toself',
+        fillcolor='rgba(255, 0, 0, 0.12)',
+        line=dict(width=0),
+        hoverinfo='skip',
+        name='Intervalo de 90%'
+    ))
+    fig_forecast.add_trace(go.Scatter(
+        x=past['Mês'], y=past['Incidentes'],
+        mode='lines+markers',
+        name='Dados Históricos',
+        line=dict(color='blue')
+    ))
+    fig_forecast.add_trace(go.Scatter(
+        x=predicted['Mês'], y=predicted['Previsão'].round(),
+        mode='lines+markers',
+        name='Previsão',
+        line=dict(color='red', dash='dash')
+    ))
+    fig_forecast.update_layout(
+        title='Previsão de Incidentes para {}'.format(outlook['label']),
+        xaxis_title='Mês',
+        yaxis_title='Número de Incidentes'
+    )
+    return fig_forecast
+
+
+def change_badge(change, suffix):
+    # Alta de incidentes/custos em vermelho, queda em verde
+    if change is None:
+        return '<div class="metric-change">N/D {}</div>'.format(suffix)
+    css = 'metric-change-negative' if change > 0 else 'metric-change-positive'
+    return '<div class="metric-change {}">{}{:.0f}% {}</div>'.format(css, '↑' if change >= 0 else '↓', abs(change), suffix)
+
+
+def change_text(change, text):
+    return '{}{:.0f}% {}'.format('↑' if change >= 0 else '↓', abs(change), text)
+
+
+def exposure_card(outlook, exposure, routes):
+    # routes: rotas com alertas ativos nos filtros atuais (alerts.alert_routes)
+    target = outlook['target']
+    tail = ''.join('<li><strong>VaR {0:.0%} / ES {0:.0%}:</strong> R$ {1:.1f} / {2:.1f} milhões</li>'.format(
+        level, exposure.var[level] / 1_000_000, exposure.es[level] / 1_000_000) for level in simulation.LEVELS)
+    running = '' if exposure.done else ' <em>({:,} de {:,} cenários)</em>'.format(
+        exposure.scenarios, exposure.total).replace(',', '.')
+    strike = outlook['strike']
+    return """
+        <div class="card">
+            <h4>Previsões para {}</h4>
+            <ul>
+                <li><strong>Probabilidade de novos protestos (por dia):</strong> {}</li>
+                <li><strong>Rotas sob alerta:</strong> {}</li>
+                <li><strong>Custo estimado:</strong> R$ {:.1f} a {:.1f} milhões</li>
+                <li><strong>Perda esperada (simulação, taxa histórica):</strong> R$ {:.1f} milhões{}</li>
+                {}
+            </ul>
+        </div>
+        """.format(outlook['label'],
+                   '{:.0f}%'.format(strike.probability_daily * 100) if strike else 'N/D (greves fora dos filtros)',
+                   ', '.join(routes) or 'nenhuma no período',
+                   target.cost_low / 1_000_000, target.cost_high / 1_000_000,
+                   exposure.expected / 1_000_000, running, tail)
+
+
+# Insights acionáveis: recomendações do otimizador de alocação de carga para os filtros atuais
+MAX_INSIGHTS = 3
+
+SENSORS_INSIGHT = ('Investir em sensores climáticos para prever riscos naturais',
+                   'O fenômeno El Niño intensificou eventos climáticos no Sul e Sudeste, elevando os custos logísticos em 27% no segundo trimestre. Recomenda-se a instalação de sensores em 12 pontos críticos para antecipação de 48h em eventos climáticos severos.')
+
+
+def metric_cards(kpis, yoy, qoq, end):
+    # Cartões das métricas principais (um por coluna no dashboard)
+    return ["""
+        <div class="metric-card">
+            <div class="metric-title">Total de Incidentes</div>
+            <div class="metric-value">{}</div>
+            {}
+        </div>
+        """.format(kpis.total_incidents, change_badge(yoy.change(), f'vs {yoy.label}')), """
+        <div class="metric-card">
+            <div class="metric-title">Custo Acumulado</div>
+            <div class="metric-value">R$ {:.1f} milhões</div>
+            {}
+        </div>
+        """.format(kpis.total_cost / 1_000_000, change_badge(qoq.change('cost'), f'no Q{end.quarter} vs {qoq.label}')), """
+        <div class="metric-card">
+            <div class="metric-title">Incidentes Críticos</div>
+            <div class="metric-value">{} ({:.1f}%)</div>
+            <div class="metric-change">Nível de Criticidade Alto</div>
+        </div>
+        """.format(kpis.high_criticality, kpis.high_criticality_pct), """
+        <div class="metric-card">
+            <div class="metric-title">Rota Mais Crítica</div>
+            <div class="metric-value">{}</div>
+            <div class="metric-change">{} incidentes ({:.1f}%)</div>
+        </div>
+        """.format(kpis.top_route, kpis.top_route_count, kpis.top_route_pct)]
+
+
+def priority_box(week_start, week_end, priority):
+    # Alerta prioritário da semana (vazio sem dados)
+    if week_start is None:
+        return ''
+    return """
+    <div class="alert-box">
+        <h3>⚠️ Alerta Prioritário da Semana ({:%d/%m}–{:%d/%m})</h3>
+        <p>{}</p>
+    </div>
+    """.format(week_start, week_end,
+               f'{priority.message}. {priority.recommendation}' if priority is not None
+               else 'Nenhuma anomalia detectada nos incidentes da semana.')
+
+
+def events_card(events):
+    items = ''.join(f'<li><strong>{label}:</strong> {text}</li>' for label, text in events)
+    return """
+        <div class="card">
+            <h4>Eventos Críticos</h4>
+            <ul>
+                {}
+            </ul>
+        </div>
+        """.format(items or '<li>Nenhum evento crítico detectado no período.</li>')
+
+
+def comparisons_box(hist, start, end, selections):
+    # Estatísticas comparativas sobre os filtros atuais
+    robberies = history.narrow(history.narrow(selections, 'Tipo de Risco', ['Roubo']),
+                               'Rota/Local Crítico', ['BR-040 (RJ-MG)'])
+    accidents = history.narrow(history.narrow(selections, 'Tipo de Risco', ['Acidente']),
+                               'Modal Afetado', ['Ferroviário'])
+    items = []
+    if robberies is None:
+        items.append('Roubos na BR-040: fora dos filtros selecionados.')
+    else:
+        yoy = hist.year_over_year(start, end, robberies)
+        items.append(change_text(yoy.change(), f'nos roubos na BR-040 em relação ao mesmo período de {yoy.label}.')
+                     if yoy.change() is not None else
+                     f'Roubos na BR-040: sem histórico do mesmo período de {yoy.label} para comparar.')
+    qoq = hist.quarter_over_quarter(end, selections)
+    items.append(change_text(qoq.change('cost'), f'nos custos logísticos no Q{end.quarter} em relação ao mesmo intervalo do {qoq.label}.')
+                 if qoq.change('cost') is not None else
+                 f'Custos logísticos: sem histórico do {qoq.label} para comparar.')
+    if accidents is None:
+        items.append('Acidentes no modal ferroviário: fora dos filtros selecionados.')
+    else:
+        yoy = hist.year_over_year(start, end, accidents)
+        items.append(change_text(yoy.change(), f'em acidentes no modal ferroviário comparado ao mesmo período de {yoy.label}.')
+                     if yoy.change() is not None else
+                     f'Acidentes no modal ferroviário: sem histórico do mesmo período de {yoy.label} para comparar.')
+
+    return """
+    <div class="insight-box">
+        <h3>Estatísticas Comparativas</h3>
+        <ul>
+            {}
+        </ul>
+    </div>
+    """.format(''.join(f'<li>{item}</li>' for item in items))
+
+
+def insight_boxes(plan):
+    # Recomendações do otimizador + o insight fixo dos sensores
+    boxes = [(rec.title, rec.text) for rec in plan.recommendations[:MAX_INSIGHTS]]
+    if not boxes:
+        boxes.append(('Manter a alocação atual',
+                      'Nenhuma realocação entre modais ou transportadoras reduz o custo esperado dos riscos filtrados.'))
+    boxes.append(SENSORS_INSIGHT)
+    return ''.join("""
+    <div class="insight-box">
+        <h4>{}. {}</h4>
+        <p>{}</p>
+    </div>
+    """.format(i, title, text) for i, (title, text) in enumerate(boxes, 1))
+
+
+EL_NINO_COMMENT = """
+<div class="card">
+    <h4>Comentário sobre o El Niño (Q2/2025)</h4>
+    <p>"O fenômeno El Niño intensificou eventos climáticos no Sul e Sudeste, elevando os custos logísticos em 27% no segundo trimestre. As enchentes em Minas Gerais em março foram o evento mais impactante, gerando custos de R$ 18,2 milhões e afetando principalmente as operações da JSL e Brado na região."</p>
+</div>
+"""
+
+
+def subtitle(start, end):
+    # Linha abaixo do título: período filtrado
+    if start is None or end is None:
+        return 'Brasil'
+    return 'Brasil, {:%d/%m/%Y} - {:%d/%m/%Y}'.format(start, end)
+
+
+def overview_title(start, end):
+    # "1º Semestre de 2025" quando o período cabe em um semestre, senão os anos cobertos
+    if start is None or end is None:
+        return '1. Visão Geral'
+    if start.year != end.year:
+        return '1. Visão Geral de {} a {}'.format(start.year, end.year)
+    if (start.month - 1) // 6 == (end.month - 1) // 6:
+        return '1. Visão Geral do {}º Semestre de {}'.format((start.month - 1) // 6 + 1, start.year)
+    return '1. Visão Geral de {}'.format(start.year)
+
+
+def footer(updated):
+    # updated: último dia dos dados carregados (None sem dados)
+    stamp = ' | Brasil, {0:%Y} | Atualizado em: {0:%d/%m/%Y}'.format(updated) if updated else ' | Brasil'
+    return """
+<div class="footer">
+    <p>Relatório Executivo Interativo sobre Riscos Logísticos{}</p>
+</div>
+""".format(stamp)
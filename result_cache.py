@@ -0,0 +1,173 @@
+# Cache de resultados compartilhado pelo processo (todas as sessões do dashboard e a API)
+#
+# Chaves: tuplas canônicas (seção, Filters normalizado, impressão digital dos dados, versão),
+# então a ordem dos valores nos multiselects não importa. Memória com LRU limitado por um
+# orçamento em bytes (tamanho do pickle de cada valor), contadores de acerto/erro e uma
+# camada opcional em disco para que um servidor reiniciado já comece com o cache quente.
+# Requisições simultâneas da mesma chave calculam o resultado uma única vez.
+#
+# Configuração por ambiente: RESULT_CACHE_MB (padrão 256) e RESULT_CACHE_DIR (liga o disco).
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+DEFAULT_MAX_MB = 256
+
+
+class ResultCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 2**20, disk_path=None, disk_max_bytes=None):
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self.disk_max_bytes = disk_max_bytes if disk_max_bytes is not None else 4 * max_bytes
+        self._entries = OrderedDict()  # chave → (valor, tamanho)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_path:
+            os.makedirs(disk_path, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        max_mb = float(os.environ.get('RESULT_CACHE_MB', DEFAULT_MAX_MB))
+        return cls(int(max_mb * 2**20), os.environ.get('RESULT_CACHE_DIR') or None)
+
+    def _disk_file(self, key):
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.disk_path, digest + '.pkl')
+
+    def _store(self, key, value, payload):
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.evictions += 1
+
+    def get(self, key):
+        # Devolve (encontrado, valor)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key][0]
+        if self.disk_path:
+            try:
+                with open(self._disk_file(key), 'rb') as f:
+                    payload = f.read()
+                value = pickle.loads(payload)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, value, payload)
+                return True, value
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def put(self, key, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._store(key, value, payload)
+        if self.disk_path:
+            self._write_disk(key, payload)
+
+    def _write_disk(self, key, payload):
+        path = self._disk_file(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp, path)
+            self._prune_disk()
+        except OSError:
+            pass
+
+    def _prune_disk(self):
+        files = []
+        for name in os.listdir(self.disk_path):
+            if name.endswith('.pkl'):
+                st = os.stat(os.path.join(self.disk_path, name))
+                files.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            os.remove(os.path.join(self.disk_path, name))
+            total -= size
+
+    def get_or_compute(self, key, compute):
+        found, value = self.get(key)
+        if found:
+            return value
+        with self._lock:
+            # Outra requisição pode ter calculado enquanto consultávamos o disco
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            # Quem chega primeiro calcula; os demais esperam o mesmo Future e recebem o valor
+            # (mesmo que ele não caiba no orçamento) ou a exceção do cálculo
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+            self.put(key, value)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    # Instância única por processo, configurada pelo ambiente na primeira chamada
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ResultCache.from_env()
+        return _shared
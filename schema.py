@@ -0,0 +1,55 @@
+# Esquema dos incidentes logísticos: ordem das colunas e valores categóricos conhecidos
+
+COLUMNS = [
+    'Data',
+    'Transportadora',
+    'Tipo de Risco',
+    'Nível de Criticidade',
+    'Modal Afetado',
+    'Região',
+    'Custo Associado (R$)',
+    'Rota/Local Crítico',
+]
+
+# Colunas opcionais: coordenadas do incidente (graus decimais), quando a fonte as tiver
+GEO_COLUMNS = ['Latitude', 'Longitude']
+
+CARRIERS = ["JSL", "Rumo", "Tegma", "Brado", "Mercúrio", "LATAM Cargo"]
+RISK_TYPES = ["Climático", "Roubo", "Acidente", "Greve", "Operacional"]
+CRITICALITY_LEVELS = ["Baixo", "Médio", "Alto"]
+MODALS = ["Rodoviário", "Ferroviário", "Aéreo"]
+REGIONS = ["Sudeste", "Sul", "Nordeste", "Centro-Oeste", "Norte"]
+ROUTES = [
+    "BR-040 (RJ-MG)",
+    "Porto de Santos (SP)",
+    "Aeroporto de Guarulhos (GRU)",
+    "Outra Sudeste",
+    "BR-116 (PR-SC)",
+    "Outra Sul",
+    "Outra Nordeste",
+    "Outra Centro-Oeste",
+    "Outra Norte",
+]
+
+# Colunas de texto repetitivo guardadas como categóricas (códigos inteiros + dicionário)
+CATEGORIES = {
+    'Transportadora': CARRIERS,
+    'Tipo de Risco': RISK_TYPES,
+    'Nível de Criticidade': CRITICALITY_LEVELS,
+    'Modal Afetado': MODALS,
+    'Região': REGIONS,
+    'Rota/Local Crítico': ROUTES,
+}
+
+# Validação na ingestão (ingestion.py): linhas fora destas regras vão para a quarentena.
+# Só estas colunas têm valores fechados; rotas novas são aceitas (entram no fim do dicionário)
+ALLOWED = {col: CATEGORIES[col] for col in
+           ['Transportadora', 'Tipo de Risco', 'Nível de Criticidade', 'Modal Afetado', 'Região']}
+DATE_FORMAT = '%Y-%m-%d'
+MAX_COST = 2**31 - 1  # custo em reais inteiros, guardado como int32 (compact.py)
+GEO_BOUNDS = {'Latitude': (-90.0, 90.0), 'Longitude': (-180.0, 180.0)}
+
+# Meses (abreviados e por extenso) para rótulos
+MONTHS_PT = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+MONTH_NAMES_PT = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto',
+                  'Setembro', 'Outubro', 'Novembro', 'Dezembro']
@@ -0,0 +1,235 @@
+# Simulação de Monte Carlo da exposição a custos (VaR e expected shortfall)
+#
+# Reaproveita as premissas do gerador (generate_data.py), ajustadas aos dados carregados:
+#   - frequência: incidentes/dia de cada segmento transportadora × rota (o mix de região e modal
+#     entra pelos filtros). A taxa de cada cenário é sorteada da posterior Gama da taxa observada,
+#     então segmentos com pouco histórico ficam mais incertos
+#   - severidade: custo por incidente = (base + exponencial) × multiplicador uniforme da
+#     criticidade (base_cost e criticality_cost_multipliers do gerador). A escala da exponencial de
+#     cada tipo de risco × criticidade reproduz o custo médio observado, e o mix risco × criticidade
+#     de cada segmento sai dos dados (puxado para o mix geral quando há poucos incidentes)
+# Num cenário, o custo de um segmento com N incidentes (N ~ Poisson) é a soma de N custos
+# independentes, aproximada por uma Gama com a mesma média e variância; cada lote é um array
+# cenários × segmentos. Os lotes rodam num pool de processos e as estimativas (perda esperada, VaR,
+# ES) são refeitas a cada lote concluído, então o resultado melhora progressivamente.
+#
+#   python simulation.py --scenarios 200000 --carriers Brado,JSL --horizon 30
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+import generate_data
+import storage
+from cube import IncidentCube, rollup
+from queries import FILTER_COLUMNS, Filters
+
+SEGMENT = ['Transportadora', 'Rota/Local Crítico']
+SCENARIOS = 100_000
+BATCH = 10_000
+LEVELS = (0.95, 0.99)
+SEED = 2025
+
+# Peso (em incidentes) do mix geral de risco × criticidade no mix de cada segmento
+PRIOR_INCIDENTS = 10
+
+# Cenários × segmentos abaixo deste total rodam no próprio processo
+MIN_PARALLEL_DRAWS = 5_000_000
+
+WORKERS = os.cpu_count() or 1
+
+
+@dataclass
+class Model:
+    carriers: np.ndarray  # transportadora de cada segmento
+    routes: np.ndarray  # rota de cada segmento
+    incidents: np.ndarray  # incidentes observados no período de ajuste
+    days: int
+    mean: np.ndarray  # custo médio por incidente
+    var: np.ndarray  # variância do custo por incidente
+
+    def __len__(self):
+        return len(self.incidents)
+
+
+@dataclass
+class Exposure:
+    scenarios: int
+    total: int  # cenários previstos (scenarios < total enquanto a simulação roda)
+    horizon: int
+    expected: float
+    var: dict  # nível → VaR
+    es: dict  # nível → expected shortfall
+    carriers: pd.DataFrame = field(default_factory=pd.DataFrame)
+    routes: pd.DataFrame = field(default_factory=pd.DataFrame)
+
+    @property
+    def done(self):
+        return self.scenarios >= self.total
+
+
+def _multipliers(levels):
+    # E[U] e E[U²] do multiplicador uniforme de cada nível de criticidade
+    bounds = np.array([generate_data.criticality_cost_multipliers.get(str(c), (1.0, 1.0)) for c in levels])
+    lo, hi = bounds[:, 0], bounds[:, 1]
+    return (lo + hi) / 2, (lo * lo + lo * hi + hi * hi) / 3
+
+
+def fit(cube, filters):
+    # Modelo por segmento a partir das células do recorte (período dos filtros ou todos os dias)
+    cells = cube.slice(filters.start, filters.end, filters.selections())
+    dates = cube.index.dates
+    if not len(cells) or not len(dates):
+        empty = np.zeros(0)
+        return Model(np.array([], dtype=object), np.array([], dtype=object), empty, 1, empty, empty)
+    first = max(np.datetime64(filters.start, 'D'), dates[0]) if filters.start else dates[0]
+    last = min(np.datetime64(filters.end, 'D'), dates[-1]) if filters.end else dates[-1]
+    days = max(int((last - first).astype(np.int64)) + 1, 1)
+
+    by = rollup(cells, SEGMENT + ['Tipo de Risco', 'Nível de Criticidade'])
+    by = by[by['Incidentes'] > 0]
+    segments, segment = np.unique(by[SEGMENT].astype(str).agg('\x1f'.join, axis=1).to_numpy(), return_inverse=True)
+    classes, klass = np.unique(by[['Tipo de Risco', 'Nível de Criticidade']].astype(str)
+                               .agg('\x1f'.join, axis=1).to_numpy(), return_inverse=True)
+    counts = by['Incidentes'].to_numpy(np.float64)
+    costs = by['Custo'].to_numpy(np.float64)
+
+    # Severidade por risco × criticidade: escala da exponencial que reproduz o custo médio
+    class_counts = np.bincount(klass, weights=counts, minlength=len(classes))
+    class_mean = np.bincount(klass, weights=costs, minlength=len(classes)) / class_counts
+    u1, u2 = _multipliers([c.split('\x1f')[1] for c in classes])
+    base = float(generate_data.base_cost)
+    scale = np.maximum(class_mean / u1 - base, 0.0)
+    m1 = (base + scale) * u1
+    m2 = (base * base + 2 * base * scale + 2 * scale * scale) * u2
+
+    # Mix de classes de cada segmento, puxado para o mix geral
+    mix = np.zeros((len(segments), len(classes)))
+    np.add.at(mix, (segment, klass), counts)
+    incidents = mix.sum(axis=1)
+    mix = (mix + PRIOR_INCIDENTS * class_counts / class_counts.sum()) / (incidents + PRIOR_INCIDENTS)[:, None]
+    mean = mix @ m1
+    var = np.maximum(mix @ m2 - mean * mean, 1e-9 * mean * mean)
+    names = np.array([s.split('\x1f') for s in segments], dtype=object).reshape(-1, 2)
+    return Model(names[:, 0], names[:, 1], incidents, days, mean, var)
+
+
+def _simulate(task):
+    # Executado no worker: custos de n cenários → (total, por transportadora, por rota)
+    incidents, days, mean, var, horizon, n, seed, carrier_map, route_map = task
+    rng = np.random.default_rng(seed)
+    rates = rng.gamma(incidents + 0.5, 1.0 / days, size=(n, len(incidents)))
+    counts = rng.poisson(rates * horizon)
+    losses = rng.gamma(counts * (mean * mean / var), var / mean)
+    return losses.sum(axis=1), losses @ carrier_map, losses @ route_map
+
+
+def _one_hot(values):
+    labels, codes = np.unique(values.astype(str), return_inverse=True)
+    matrix = np.zeros((len(values), len(labels)))
+    matrix[np.arange(len(values)), codes] = 1.0
+    return labels, matrix
+
+
+def _tail(losses, levels):
+    # VaR (percentil) e ES (média acima do VaR) por coluna
+    var, es = {}, {}
+    for level in levels:
+        q = np.quantile(losses, level, axis=0)
+        tail = losses >= q
+        var[level] = q
+        es[level] = (losses * tail).sum(axis=0) / np.maximum(tail.sum(axis=0), 1)
+    return var, es
+
+
+class _Accumulator:
+    def __init__(self, model, horizon, total, levels):
+        self.horizon, self.total, self.levels = horizon, total, levels
+        self.carrier_labels, self.carrier_map = _one_hot(model.carriers)
+        self.route_labels, self.route_map = _one_hot(model.routes)
+        self.parts = []
+
+    def add(self, part):
+        self.parts.append(part)
+
+    def _table(self, name, labels, losses):
+        var, es = _tail(losses, self.levels)
+        frame = pd.DataFrame({name: labels, 'Perda Esperada': losses.mean(axis=0)})
+        for level in self.levels:
+            frame[f'VaR {level:.0%}'] = var[level]
+            frame[f'ES {level:.0%}'] = es[level]
+        return frame.sort_values(frame.columns[-1], ascending=False).reset_index(drop=True)
+
+    def estimate(self):
+        total = np.concatenate([p[0] for p in self.parts])
+        var, es = _tail(total, self.levels)
+        return Exposure(
+            len(total), self.total, self.horizon, float(total.mean()),
+            {level: float(v) for level, v in var.items()}, {level: float(v) for level, v in es.items()},
+            self._table('Transportadora', self.carrier_labels, np.concatenate([p[1] for p in self.parts])),
+            self._table('Rota/Local Crítico', self.route_labels, np.concatenate([p[2] for p in self.parts])),
+        )
+
+
+def run(model, horizon, scenarios=SCENARIOS, batch=BATCH, seed=SEED, levels=LEVELS, workers=None):
+    # Gera uma Exposure a cada lote concluído; a última cobre todos os cenários. O resultado final
+    # não depende do número de workers (cada lote tem a sua semente)
+    acc = _Accumulator(model, horizon, scenarios, levels)
+    if not len(model):
+        zeros = {level: 0.0 for level in levels}
+        yield Exposure(scenarios, scenarios, horizon, 0.0, zeros, dict(zeros))
+        return
+    sizes = [min(batch, scenarios - lo) for lo in range(0, scenarios, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(model.incidents, model.days, model.mean, model.var, horizon, n, s, acc.carrier_map, acc.route_map)
+             for n, s in zip(sizes, seeds)]
+    workers = min(workers or WORKERS, len(tasks))
+    if workers == 1 or scenarios * len(model) < MIN_PARALLEL_DRAWS:
+        for task in tasks:
+            acc.add(_simulate(task))
+            yield acc.estimate()
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(_simulate, task) for task in tasks]):
+            acc.add(future.result())
+            yield acc.estimate()
+
+
+def simulate(model, horizon, **kwargs):
+    # Só o resultado final
+    for exposure in run(model, horizon, **kwargs):
+        pass
+    return exposure
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exposição a custos por Monte Carlo (VaR/ES)")
+    parser.add_argument("path", nargs='?', default=storage.CSV_PATH)
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    for name in FILTER_COLUMNS:
+        parser.add_argument("--" + name.replace('_', '-'), dest=name, default=None)
+    parser.add_argument("--horizon", type=int, default=30, help="dias simulados")
+    parser.add_argument("--scenarios", type=int, default=SCENARIOS)
+    parser.add_argument("--batch", type=int, default=BATCH)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    filters = Filters.from_dict(vars(args)).normalized()
+    model = fit(IncidentCube(storage.load_compact(args.path)), filters)
+    for exposure in run(model, args.horizon, args.scenarios, args.batch, args.seed, workers=args.workers):
+        # Uma linha JSON por lote concluído
+        print(json.dumps({'scenarios': exposure.scenarios, 'expected': exposure.expected,
+                          'var': exposure.var, 'es': exposure.es}), flush=True)
+    print(json.dumps({'carriers': exposure.carriers.to_dict(orient='records'),
+                      'routes': exposure.routes.to_dict(orient='records')}, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+# Snapshots estáticos do relatório executivo
+#
+# Renderiza sem o Streamlit todas as seções do relatório de um conjunto de dados (registry.py)
+# para filtros predefinidos (PRESETS) e grava uma versão estática de cada um em
+# home/snapshots/<conjunto>/<versão>/:
+#   - <preset>.html: página autocontida (estilo, plotly.js e o JSON das figuras embutidos)
+#   - <preset>.json: agregados brutos, nos formatos da API (relatório, previsão, plano, exposição)
+#   - manifest.json: filtros normalizados de cada preset, usados para reconhecê-lo no dashboard
+# A versão identifica os dados de origem do conjunto (log de incidentes até o último byte aplicado
+# + seu arquivo histórico): com um lote novo os snapshots antigos deixam de coincidir e o dashboard volta a
+# calcular ao vivo até a próxima exportação. Os presets são renderizados em paralelo, um processo
+# por worker (cada um carrega o store uma vez).
+#
+#   python snapshots.py                        # todos os presets do conjunto padrão
+#   python snapshots.py padrao sudeste --dataset varejo --workers 2
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+
+import pandas as pd
+
+import alerts
+import forecasting
+import geo
+import history
+import optimizer
+import registry
+import report
+import simulation
+from aggregations import TOP_CARRIERS
+from incremental import DropFolder, IncidentStore
+from queries import (Filters, compute_views, normalize, query_alerts, query_forecast, query_plan,
+                     query_report)
+
+SNAPSHOT_PATH = 'home/snapshots'
+
+# Muda quando o layout das páginas ou o formato do JSON muda (invalida os snapshots antigos)
+FORMAT = 1
+
+# Versões mantidas em disco (as mais recentes)
+KEEP_VERSIONS = 3
+
+# Preset → (título, filtros); período vazio = todos os dias carregados, como o padrão da sidebar
+PRESETS = {
+    'padrao': ('Relatório completo', Filters()),
+    'rodoviario': ('Modal rodoviário', Filters(modals=('Rodoviário',))),
+    'sudeste': ('Região Sudeste', Filters(regions=('Sudeste',))),
+    'roubos': ('Roubos de carga', Filters(risk_types=('Roubo',))),
+}
+
+# Controles do mapa na abertura do dashboard (área, detalhe, medida)
+MAP_OPTIONS = (next(iter(geo.VIEWPORTS)), 6, 'Incidentes')
+
+WORKERS = os.cpu_count() or 1
+
+PAGE = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+{style}
+<style>
+    body {{ font-family: "Source Sans Pro", sans-serif; max-width: 1400px; margin: 0 auto; padding: 1rem 2rem; }}
+    .columns {{ display: grid; grid-template-columns: 1fr 1fr; gap: 1rem; }}
+    .snapshot-info {{ text-align: center; color: #6B7280; margin-top: -10px; }}
+    table.dataframe {{ border-collapse: collapse; width: 100%; margin-bottom: 1rem; }}
+    table.dataframe th, table.dataframe td {{ border-bottom: 1px solid #E5E7EB; padding: 0.4rem 0.6rem; text-align: left; }}
+</style>
+</head>
+<body>
+<div class="main-header">Relatório Executivo Interativo sobre Riscos Logísticos</div>
+<h3 style="text-align: center; margin-top: -10px;">{subtitle}</h3>
+<p class="snapshot-info">{info}</p>
+{body}
+</body>
+</html>
+"""
+
+
+@dataclass
+class Snapshot:
+    name: str
+    title: str
+    created: str
+    path: str  # página HTML
+
+
+def version(store, history_path=None):
+    # Dados de origem vistos pelo store: log até o último byte aplicado + arquivo histórico
+    source = f'{FORMAT}:{os.path.abspath(store.path)}:{store.tail.offset}:{history.archive_version(history_path)}'
+    return hashlib.sha1(source.encode()).hexdigest()[:12]
+
+
+def resolve(cube, preset):
+    # Filtros do preset na forma normalizada que o dashboard produz (período explícito)
+    dates = cube.index.dates
+    if len(dates):
+        first, last = (datetime.date.fromisoformat(str(d)) for d in (dates[0], dates[-1]))
+        preset = replace(preset, start=preset.start or first, end=preset.end or last)
+    return normalize(cube, preset)
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def lookup(dataset, store, filters, root=SNAPSHOT_PATH):
+    # Snapshot dos dados carregados do conjunto cujos filtros são os atuais, ou None
+    directory = os.path.join(root, dataset.name, version(store, dataset.history))
+    manifest = read_manifest(directory)
+    current = filters.to_dict()
+    for name, entry in manifest.get('presets', {}).items():
+        if entry['filters'] == current:
+            return Snapshot(name, entry['title'], manifest['created'], os.path.join(directory, entry['html']))
+    return None
+
+
+class Renderer:
+    # Tudo o que o relatório usa além do cubo, carregado uma vez por processo; log, pasta de
+    # entrada e arquivo histórico são os do conjunto
+    def __init__(self, dataset):
+        self.store = IncidentStore(dataset.path, incoming=dataset.incoming)
+        self.detector = alerts.AnomalyDetector().attach(self.store)
+        self.forecaster = forecasting.Forecaster().sync(self.store)
+        self.pyramid = geo.load_pyramid(dataset.path)
+        self.history = history.PeriodHistory.combine(self.store.cube, dataset.history)
+        self.version = version(self.store, dataset.history)
+
+    def render(self, name):
+        # Devolve (versão, HTML, JSON) do preset
+        title, preset = PRESETS[name]
+        cube = self.store.cube
+        filters = resolve(cube, preset)
+        undated = replace(filters, start=None, end=None)
+        views = compute_views(cube, filters)
+        outlook = forecasting.outlook(self.forecaster, cube, undated)
+        target = outlook['target']
+        exposure = simulation.simulate(simulation.fit(cube, undated), (target.end - target.start).days + 1)
+        plan = optimizer.plan(cube, filters)
+        active = self.detector.active(filters.start, filters.end, filters.selections())
+        figures = {
+            'timeline': report.timeline_figure(views['month_risk']),
+            'cost_pie': report.cost_pie_figure(views['risk']),
+            'carriers': report.carriers_figure(views['carrier']),
+            'map': report.map_figure(self.pyramid, views['route'], *MAP_OPTIONS),
+            'regions': report.regions_figure(views['region']),
+            'routes': report.routes_figure(views['route']),
+            'forecast': report.forecast_figure(outlook),
+        }
+        created = time.strftime('%Y-%m-%d %H:%M:%S')
+        html = PAGE.format(
+            title=f'Riscos Logísticos – {title}', style=report.STYLE,
+            subtitle=report.subtitle(filters.start, filters.end),
+            info=f'Snapshot "{title}" · versão {self.version} · gerado em {created}',
+            body=self._body(filters, views, outlook, exposure, plan, active, figures))
+        payload = {
+            'version': self.version, 'preset': name, 'title': title, 'created': created,
+            'filters': filters.to_dict(),
+            'data': {
+                'report': query_report(views),
+                'forecast': query_forecast(outlook),
+                'exposure': {'horizon': exposure.horizon, 'scenarios': exposure.scenarios,
+                             'expected': exposure.expected, 'var': exposure.var, 'es': exposure.es,
+                             'carriers': exposure.carriers.to_dict(orient='records'),
+                             'routes': exposure.routes.to_dict(orient='records')},
+                'plan': query_plan(plan),
+                'alerts': query_alerts(active),
+            },
+        }
+        return self.version, html, json.dumps(payload, ensure_ascii=False, default=str)
+
+    def _updated(self):
+        # Último dia dos dados carregados (None sem dados)
+        dates = self.store.cube.index.dates
+        return datetime.date.fromisoformat(str(dates[-1])) if len(dates) else None
+
+    def _body(self, filters, views, outlook, exposure, plan, active, figures):
+        # Mesma ordem e mesmos blocos do dashboard
+        charts = {name: fig.to_html(full_html=False, include_plotlyjs=(i == 0), div_id=f'fig-{name}')
+                  for i, (name, fig) in enumerate(figures.items())}
+        start, end = pd.Timestamp(filters.start), pd.Timestamp(filters.end)
+        selections = filters.selections()
+        yoy = self.history.year_over_year(start, end, selections)
+        qoq = self.history.quarter_over_quarter(end, selections)
+        carrier_table = views['kpis'].carrier_table(TOP_CARRIERS).to_html(index=False, border=0)
+        exposure_tables = ''.join(
+            table.assign(**{c: table[c] / 1_000_000 for c in table.columns[1:]}).round(2).to_html(index=False, border=0)
+            for table in (exposure.carriers, exposure.routes))
+        return ''.join([
+            '<div class="metric-container">{}</div>'.format(''.join(report.metric_cards(views['kpis'], yoy, qoq, end))),
+            report.priority_box(*self.detector.priority()),
+            '<div class="sub-header">{}</div>'.format(report.overview_title(filters.start, filters.end)),
+            charts['timeline'],
+            '<div class="columns"><div>{}</div><div>{}</div></div>'.format(
+                report.events_card(alerts.critical_events(active)), charts['cost_pie']),
+            '<div class="sub-header">2. Desempenho por Transportadora (TOP 3)</div>',
+            carrier_table, charts['carriers'],
+            '<div class="sub-header">3. Mapa de Calor Geográfico</div>',
+            charts['map'],
+            '<div class="columns"><div>{}</div><div>{}</div></div>'.format(charts['regions'], charts['routes']),
+            report.comparisons_box(self.history, start, end, selections),
+            '<div class="sub-header">4. Previsões e Riscos para {}</div>'.format(outlook['label']),
+            '<div class="columns"><div>{}</div><div>{}</div></div>'.format(
+                report.exposure_card(outlook, exposure, alerts.alert_routes(active)), charts['forecast']),
+            '<h4>Exposição por transportadora e rota em {} (simulação, R$ milhões)</h4>'.format(outlook['label']),
+            '<div class="columns">{}</div>'.format(exposure_tables),
+            '<div class="sub-header">Insights Acionáveis</div>',
+            report.insight_boxes(plan),
+            report.EL_NINO_COMMENT,
+            report.footer(self._updated()),
+        ])
+
+
+_renderer = None
+
+
+def _init(dataset):
+    global _renderer
+    _renderer = Renderer(dataset)
+
+
+def _render(name):
+    return (name,) + _renderer.render(name)
+
+
+def write(root, name, version, html, payload):
+    # Grava o preset na pasta da versão e o registra no manifesto
+    directory = os.path.join(root, version)
+    os.makedirs(directory, exist_ok=True)
+    for ext, content in (('html', html), ('json', payload)):
+        tmp = os.path.join(directory, f'.{name}.{ext}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp, os.path.join(directory, f'{name}.{ext}'))
+    manifest = read_manifest(directory) or {'version': version, 'presets': {}}
+    manifest['created'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    title, _ = PRESETS[name]
+    manifest['presets'][name] = {'title': title, 'filters': json.loads(payload)['filters'],
+                                 'html': f'{name}.html', 'json': f'{name}.json'}
+    tmp = os.path.join(directory, '.manifest.json.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(directory, 'manifest.json'))
+    return os.path.join(directory, f'{name}.html')
+
+
+def prune(root, keep=KEEP_VERSIONS):
+    # Remove as versões mais antigas
+    if not os.path.isdir(root):
+        return
+    versions = sorted((os.path.join(root, d) for d in os.listdir(root) if os.path.isdir(os.path.join(root, d))),
+                      key=os.path.getmtime, reverse=True)
+    for directory in versions[keep:]:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def export(dataset, names=None, root=SNAPSHOT_PATH, workers=None):
+    # Renderiza os presets (todos por padrão) do conjunto; gera (preset, caminho do HTML) a cada um
+    # concluído
+    names = list(names or PRESETS)
+    unknown = set(names) - set(PRESETS)
+    if unknown:
+        raise ValueError('presets desconhecidos: {}'.format(', '.join(sorted(unknown))))
+    # Lotes pendentes do próprio conjunto entram no log antes da carga, como no refresh do
+    # dashboard/API
+    if dataset.incoming:
+        DropFolder(dataset.incoming).flush_into(dataset.path)
+    root = os.path.join(root, dataset.name)
+    workers = min(workers or WORKERS, len(names))
+    if workers <= 1:
+        renderer = Renderer(dataset)
+        for name in names:
+            yield name, write(root, name, *renderer.render(name))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init, initargs=(dataset,)) as pool:
+            for future in as_completed([pool.submit(_render, name) for name in names]):
+                name, version, html, payload = future.result()
+                yield name, write(root, name, version, html, payload)
+    prune(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshots estáticos do relatório executivo")
+    parser.add_argument("presets", nargs='*', help="presets a renderizar ({})".format(', '.join(PRESETS)))
+    parser.add_argument("--dataset", default=None, help="conjunto de dados (home/datasets.json); padrão: o primeiro")
+    parser.add_argument("--path", default=None, help="log avulso, fora do registro (sem pasta de entrada nem histórico)")
+    parser.add_argument("--output", default=SNAPSHOT_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.path:
+        name = os.path.splitext(os.path.basename(args.path))[0]
+        dataset = registry.Dataset(name, name, args.path)
+    else:
+        datasets = registry.Registry.from_config()
+        name = args.dataset or datasets.default
+        if name not in datasets.datasets:
+            parser.error(f'conjunto de dados desconhecido: {name}')
+        dataset = datasets.datasets[name]
+    t0 = time.perf_counter()
+    for name, html_path in export(dataset, args.presets, args.output, args.workers):
+        print(f"{name}: {html_path} ({time.perf_counter() - t0:.1f}s)", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+# Camada de armazenamento dos incidentes
+#
+# Backends intercambiáveis atrás de open_backend():
+#   - CSV (formato legado, lido e validado por ingestion.py; linhas ruins vão para a quarentena)
+#   - Parquet particionado por ano/mês (colunar, categóricas com dicionário, data nativa)
+#   - Arrow IPC/Feather (arquivo único, lido com memory map sem cópia)
+#
+# Uso como comando de ingestão:
+#   python storage.py ingest home/riscos_logisticos_2025.csv home/riscos_logisticos_2025.parquet
+
+import os
+import shutil
+import sys
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+import ingestion
+from compact import CompactIncidents
+from schema import CATEGORIES, COLUMNS, GEO_COLUMNS
+
+CSV_PATH = 'home/riscos_logisticos_2025.csv'
+PARQUET_PATH = 'home/riscos_logisticos_2025.parquet'
+
+PARTITION_SCHEMA = pa.schema([('ano', pa.int16()), ('mes', pa.int8())])
+
+# Índices de dicionário: int8 para as dimensões de poucos valores, int32 para as rotas (abertas:
+# cada local novo ingerido entra no dicionário)
+ROUTE_COLUMN = 'Rota/Local Crítico'
+
+
+def arrow_schema(columns=COLUMNS):
+    fields = []
+    for col in columns:
+        if col in GEO_COLUMNS:
+            fields.append(pa.field(col, pa.float32()))
+        elif col == 'Data':
+            fields.append(pa.field(col, pa.date32()))
+        elif col == 'Custo Associado (R$)':
+            fields.append(pa.field(col, pa.int64()))
+        elif col == ROUTE_COLUMN:
+            fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(col, pa.dictionary(pa.int8(), pa.string())))
+    return pa.schema(fields)
+
+
+def to_categorical(df):
+    # Categorias na ordem declarada no esquema; valores novos entram no fim do dicionário
+    for col, values in CATEGORIES.items():
+        if col not in df.columns:
+            continue
+        observed = pd.unique(df[col].dropna().astype(str))
+        extra = [v for v in observed if v not in values]
+        categories = list(values) + extra
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            # astype() não reordena categóricas com o mesmo conjunto de valores
+            df[col] = df[col].cat.set_categories(categories)
+        else:
+            df[col] = df[col].astype(pd.CategoricalDtype(categories))
+    return df
+
+
+def _date_bounds(start, end):
+    return (pd.Timestamp(start) if start is not None else None,
+            pd.Timestamp(end) if end is not None else None)
+
+
+class CSVBackend:
+    def __init__(self, path):
+        self.path = path
+
+    def read(self, columns=None, start=None, end=None):
+        # Sempre o arquivo inteiro: a quarentena e o relatório cobrem todas as colunas
+        df, self.report = ingestion.read_csv(self.path)
+        start, end = _date_bounds(start, end)
+        if start is not None:
+            df = df[df['Data'] >= start]
+        if end is not None:
+            df = df[df['Data'] <= end]
+        if columns is not None:
+            df = df[[c for c in COLUMNS + GEO_COLUMNS if c in columns]]
+        return to_categorical(df.reset_index(drop=True))
+
+    def write(self, df):
+        df.to_csv(self.path, index=False, date_format='%Y-%m-%d')
+
+    def columns(self):
+        return list(pd.read_csv(self.path, nrows=0).columns)
+
+    def mtime(self):
+        return os.path.getmtime(self.path)
+
+
+class ParquetBackend:
+    def __init__(self, path):
+        self.path = path
+
+    def _partition_filter(self, start, end):
+        # Expressões sobre ano/mês permitem descartar diretórios inteiros sem abrir arquivos
+        expr = None
+        if start is not None:
+            ano, mes = ds.field('ano'), ds.field('mes')
+            lower = (ano > start.year) | ((ano == start.year) & (mes >= start.month))
+            lower = lower & (ds.field('Data') >= pa.scalar(start.date(), pa.date32()))
+            expr = lower
+        if end is not None:
+            ano, mes = ds.field('ano'), ds.field('mes')
+            upper = (ano < end.year) | ((ano == end.year) & (mes <= end.month))
+            upper = upper & (ds.field('Data') <= pa.scalar(end.date(), pa.date32()))
+            expr = upper if expr is None else expr & upper
+        return expr
+
+    def read_table(self, columns=None, start=None, end=None):
+        start, end = _date_bounds(start, end)
+        cols = COLUMNS if columns is None else [c for c in COLUMNS + GEO_COLUMNS if c in columns]
+        return pq.read_table(self.path, columns=cols, filters=self._partition_filter(start, end),
+                             partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+                             memory_map=True)
+
+    def read(self, columns=None, start=None, end=None):
+        table = self.read_table(columns, start, end)
+        df = table.unify_dictionaries().to_pandas(date_as_object=False)
+        if 'Data' in df.columns:
+            df['Data'] = df['Data'].astype('datetime64[ns]')
+        df = to_categorical(df)
+        if 'Data' in df.columns:
+            # Partições são lidas em ordem de diretório; manter a ordem cronológica do CSV
+            df = df.sort_values('Data', kind='stable').reset_index(drop=True)
+        return df
+
+    def write(self, df):
+        # Cada escrita cria arquivos novos nas partições; nada existente é sobrescrito
+        table = _to_arrow(df)
+        if not table.num_rows:
+            # Sem linhas write_dataset não grava nada; um arquivo vazio guarda o esquema
+            os.makedirs(self.path, exist_ok=True)
+            pq.write_table(table, os.path.join(self.path, f'part-{uuid.uuid4().hex}-vazio.parquet'))
+            return
+        dates = pd.to_datetime(df['Data'])
+        table = table.append_column('ano', pa.array(dates.dt.year.to_numpy(np.int16)))
+        table = table.append_column('mes', pa.array(dates.dt.month.to_numpy(np.int8)))
+        ds.write_dataset(table, self.path, format='parquet',
+                         partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+                         existing_data_behavior='overwrite_or_ignore',
+                         basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet')
+
+    def columns(self):
+        return ds.dataset(self.path, format='parquet',
+                          partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive')).schema.names
+
+    def mtime(self):
+        times = [os.path.getmtime(os.path.join(root, f))
+                 for root, _, files in os.walk(self.path) for f in files]
+        return max(times) if times else 0.0
+
+
+class ArrowBackend:
+    def __init__(self, path):
+        self.path = path
+
+    def read(self, columns=None, start=None, end=None):
+        cols = None if columns is None else [c for c in COLUMNS + GEO_COLUMNS if c in columns]
+        table = feather.read_table(self.path, columns=cols, memory_map=True)
+        df = to_categorical(table.to_pandas(date_as_object=False))
+        if 'Data' in df.columns:
+            df['Data'] = df['Data'].astype('datetime64[ns]')
+        start, end = _date_bounds(start, end)
+        if start is not None:
+            df = df[df['Data'] >= start]
+        if end is not None:
+            df = df[df['Data'] <= end]
+        return df.reset_index(drop=True)
+
+    def write(self, df):
+        feather.write_feather(_to_arrow(df), self.path, compression='uncompressed')
+
+    def columns(self):
+        with pa.memory_map(self.path) as source:
+            return pa.ipc.open_file(source).schema.names
+
+    def mtime(self):
+        return os.path.getmtime(self.path)
+
+
+def _to_arrow(df):
+    # Coordenadas opcionais seguem junto quando presentes
+    columns = COLUMNS + [c for c in GEO_COLUMNS if c in df.columns]
+    df = to_categorical(df[columns].copy())
+    df['Data'] = pd.to_datetime(df['Data']).dt.date
+    return pa.Table.from_pandas(df, schema=arrow_schema(columns), preserve_index=False)
+
+
+def open_backend(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return CSVBackend(path)
+    if ext in ('.arrow', '.feather', '.ipc'):
+        return ArrowBackend(path)
+    return ParquetBackend(path)
+
+
+def columnar_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def preferred_backend(path=CSV_PATH):
+    # Preferir a cópia colunar; se a cópia não existir ou estiver desatualizada em relação
+    # ao CSV, regenerá-la uma vez (se o disco for somente leitura, ler o CSV mesmo)
+    backend = open_backend(path)
+    if isinstance(backend, CSVBackend):
+        columnar = ParquetBackend(columnar_path(path))
+        if not os.path.isdir(columnar.path) or columnar.mtime() < backend.mtime():
+            try:
+                ingest(path, columnar.path)
+            except OSError:
+                return backend
+        backend = columnar
+    return backend
+
+
+def load_incidents(path=CSV_PATH, columns=None, start=None, end=None):
+    return preferred_backend(path).read(columns, start, end)
+
+
+def load_compact(path=CSV_PATH, start=None, end=None):
+    # Mesmos incidentes em arrays compactos (compact.py); do Parquet, sem montar DataFrame
+    backend = preferred_backend(path)
+    if isinstance(backend, ParquetBackend):
+        return CompactIncidents.from_table(backend.read_table(None, start, end))
+    return CompactIncidents.from_frame(backend.read(None, start, end))
+
+
+def ingest(src, dst):
+    df = open_backend(src).read()
+    dst_backend = open_backend(dst)
+    if isinstance(dst_backend, ParquetBackend) and os.path.isdir(dst):
+        shutil.rmtree(dst)
+    dst_backend.write(df)
+    return len(df)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'ingest':
+        print("Uso: python storage.py ingest <origem> <destino>")
+        sys.exit(1)
+    n = ingest(sys.argv[2], sys.argv[3])
+    print(f"{n} incidentes gravados em {sys.argv[3]}")
+    if isinstance(open_backend(sys.argv[2]), CSVBackend):
+        print(ingestion.recent_reports()[-1].summary())
@@ -0,0 +1,133 @@
+# Execução em streaming para históricos maiores que a memória
+#
+# A fonte é lida em blocos (CSV validado em pedaços de ~BATCH_ROWS linhas; Parquet mês a mês, em
+# lotes de BATCH_ROWS; Arrow lote a lote). Cada bloco vira arrays compactos (compact.py) com uma tabela de
+# códigos compartilhada, passa pelos filtros e é agregado em células do cubo. As células parciais
+# são fundidas (somas de contagens e custos) sempre que passam de MERGE_CELLS linhas, então a
+# memória fica limitada a um bloco + as células (dias × combinações), e não ao número de
+# incidentes. As seções (KPIs, TOP 3 com riscos predominantes, rotas, séries) são calculadas sobre
+# as células fundidas e saem iguais às do caminho em memória.
+#
+#   python streaming.py home/historico_completo.parquet --carriers JSL,Brado --start 2024-01-01
+
+import argparse
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+import ingestion
+import storage
+from compact import CompactIncidents, new_tables
+from cube import DIMENSIONS, IncidentCube, rollup
+from queries import FILTER_COLUMNS, Filters, compute_views, query_report
+from schema import COLUMNS
+
+BATCH_ROWS = 1_000_000
+MERGE_CELLS = 2_000_000
+
+
+def _parquet_batches(path, start, end, batch_rows):
+    # Partições ano/mês em ordem cronológica (a ordem dos diretórios não é numérica)
+    dataset = ds.dataset(path, format='parquet',
+                         partitioning=ds.partitioning(storage.PARTITION_SCHEMA, flavor='hive'))
+    months = sorted({(keys['ano'], keys['mes']) for keys in
+                     (ds.get_partition_keys(f.partition_expression) for f in dataset.get_fragments())})
+    bounds = storage.ParquetBackend(path)._partition_filter(*storage._date_bounds(start, end))
+    for year, month in months:
+        expr = (ds.field('ano') == year) & (ds.field('mes') == month)
+        if bounds is not None:
+            expr = expr & bounds
+        for batch in dataset.to_batches(columns=COLUMNS, filter=expr, batch_size=batch_rows):
+            if batch.num_rows:
+                yield pa.Table.from_batches([batch])
+
+
+def _arrow_batches(path, start, end, batch_rows):
+    # Período aplicado depois, no bloco já ordenado
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for offset in range(0, batch.num_rows, batch_rows):
+                yield pa.Table.from_batches([batch.slice(offset, batch_rows)])
+
+
+def iter_batches(path=storage.CSV_PATH, start=None, end=None, batch_rows=BATCH_ROWS, tables=None):
+    # Blocos de CompactIncidents com a mesma tabela de códigos; CSV usa a cópia colunar quando
+    # ela está em dia (sem regenerá-la, o que exigiria ler o CSV inteiro)
+    tables = new_tables() if tables is None else tables
+    backend = storage.open_backend(path)
+    if isinstance(backend, storage.CSVBackend):
+        columnar = storage.ParquetBackend(storage.columnar_path(path))
+        if os.path.isdir(columnar.path) and columnar.mtime() >= backend.mtime():
+            backend = columnar
+    if isinstance(backend, storage.CSVBackend):
+        # Blocos de ~batch_rows linhas, validados (linhas ruins vão para a quarentena)
+        for chunk in ingestion.iter_csv(backend.path, chunk_bytes=batch_rows * ingestion.ROW_BYTES):
+            yield CompactIncidents.from_frame(storage.to_categorical(chunk), tables).slice(start, end)
+        return
+    batches = _parquet_batches if isinstance(backend, storage.ParquetBackend) else _arrow_batches
+    for table in batches(backend.path, start, end, batch_rows):
+        yield CompactIncidents.from_table(table, tables).slice(start, end)
+
+
+def merge_cells(parts, tables):
+    # Funde células parciais (mesmas dimensões) somando contagens e custos
+    if not parts:
+        return CompactIncidents.empty().aggregate(DIMENSIONS)
+    for part in parts:
+        for col in DIMENSIONS[1:]:
+            # Blocos anteriores podem ter visto só parte dos valores novos
+            part[col] = part[col].cat.set_categories(tables[col])
+    cells = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    return rollup(cells, DIMENSIONS)
+
+
+def aggregate_source(path=storage.CSV_PATH, start=None, end=None, selections=None,
+                     batch_rows=BATCH_ROWS, on_batch=None):
+    # Células do cubo de toda a fonte (ou do recorte pedido), lendo um bloco por vez;
+    # on_batch(bloco) recebe cada bloco antes dos filtros (ex.: detector de alertas)
+    tables = new_tables()
+    parts, pending = [], 0
+    for chunk in iter_batches(path, start, end, batch_rows, tables):
+        if on_batch is not None:
+            on_batch(chunk)
+        cells = chunk.take(chunk.select(None, None, selections)).aggregate(DIMENSIONS)
+        parts.append(cells)
+        pending += len(cells)
+        if pending > MERGE_CELLS:
+            parts = [merge_cells(parts, tables)]
+            pending = len(parts[0])
+    return merge_cells(parts, tables)
+
+
+def load_cube(path=storage.CSV_PATH, batch_rows=BATCH_ROWS, on_batch=None):
+    return IncidentCube.from_cells(aggregate_source(path, batch_rows=batch_rows, on_batch=on_batch))
+
+
+def stream_views(path, filters, batch_rows=BATCH_ROWS):
+    # Visões de um estado de filtros sem manter o histórico: filtros aplicados bloco a bloco
+    cells = aggregate_source(path, filters.start, filters.end, filters.selections(), batch_rows)
+    return compute_views(IncidentCube.from_cells(cells), Filters())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório de riscos em streaming (fonte maior que a memória)")
+    parser.add_argument("path", nargs='?', default=storage.CSV_PATH)
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    for name in FILTER_COLUMNS:
+        parser.add_argument("--" + name.replace('_', '-'), dest=name, default=None)
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+    filters = Filters.from_dict(vars(args)).normalized()
+    views = stream_views(args.path, filters, args.batch_rows)
+    print(json.dumps({'filters': filters.to_dict(), 'data': query_report(views)},
+                     ensure_ascii=False, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
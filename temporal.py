@@ -0,0 +1,80 @@
+# Subsistema temporal: datas como ordinais inteiros
+#
+# Dia = dias desde 1970-01-01; semana (segunda a domingo) = semanas desde 1969-12-29;
+# mês = meses desde 1970-01; trimestre = mês // 3. Os ordinais saem de operações vetorizadas
+# sobre datetime64 (nenhum datetime.date nem strftime por linha), e rótulos/datas de início são
+# montados só para os baldes distintos. Com os dados ordenados por data, um período é recortado
+# por busca binária sobre os ordinais de dia (range_bounds).
+
+import numpy as np
+import pandas as pd
+
+GRANULARITIES = ['day', 'week', 'month', 'quarter']
+
+# Granularidade → nome da coluna/eixo
+LABELS = {'day': 'Dia', 'week': 'Semana', 'month': 'Mês', 'quarter': 'Trimestre'}
+
+# 1970-01-01 é quinta-feira: deslocamento para semanas começando na segunda
+_WEEK_SHIFT = 3
+
+
+def day_ordinals(dates):
+    # Series/array de datas → dias desde 1970-01-01 (int64)
+    if isinstance(dates, pd.Series):
+        dates = dates.to_numpy('datetime64[D]')
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def to_day(value):
+    # date/Timestamp/str → ordinal de dia
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64))
+
+
+def range_bounds(days, start=None, end=None):
+    # Offsets [lo, hi) das linhas com start <= dia <= end em ordinais ordenados
+    lo = 0 if start is None else int(np.searchsorted(days, to_day(start), side='left'))
+    hi = len(days) if end is None else int(np.searchsorted(days, to_day(end), side='right'))
+    return lo, max(lo, hi)
+
+
+def buckets(days, granularity):
+    # Ordinais de dia → código inteiro do balde
+    if granularity == 'day':
+        return days
+    if granularity == 'week':
+        return (days + _WEEK_SHIFT) // 7
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    if granularity == 'month':
+        return months
+    if granularity == 'quarter':
+        return months // 3
+    raise ValueError(f'granularidade desconhecida: {granularity}')
+
+
+def bucket_starts(codes, granularity):
+    # Código do balde → data do primeiro dia (datetime64[D])
+    codes = np.asarray(codes, dtype=np.int64)
+    if granularity == 'day':
+        return codes.astype('datetime64[D]')
+    if granularity == 'week':
+        return (codes * 7 - _WEEK_SHIFT).astype('datetime64[D]')
+    months = codes * 3 if granularity == 'quarter' else codes
+    return months.astype('datetime64[M]').astype('datetime64[D]')
+
+
+def bucket_labels(codes, granularity):
+    # 'AAAA-MM-DD' (dia; semana pela segunda-feira), 'AAAA-MM' (mês), 'AAAA-Qn' (trimestre)
+    codes = np.asarray(codes, dtype=np.int64)
+    starts = bucket_starts(codes, granularity)
+    if granularity == 'month':
+        return np.datetime_as_string(starts.astype('datetime64[M]'), unit='M')
+    if granularity == 'quarter':
+        years = np.datetime_as_string(starts.astype('datetime64[Y]'), unit='Y')
+        return np.char.add(np.char.add(years, '-Q'), (codes % 4 + 1).astype(str))
+    return np.datetime_as_string(starts, unit='D')
+
+
+def bucket_categorical(days, granularity):
+    # Rótulos por linha como categórica: só os baldes distintos são formatados
+    unique, inverse = np.unique(buckets(days, granularity), return_inverse=True)
+    return pd.Categorical.from_codes(inverse.astype(np.int32), categories=list(bucket_labels(unique, granularity)))
@@ -0,0 +1,47 @@
+# Fixtures compartilhadas: cópias do dataset de exemplo em pastas temporárias (a carga grava a
+# cópia colunar e a quarentena ao lado do CSV, nunca em home/)
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_CSV = os.path.join(ROOT, 'home', 'riscos_logisticos_2025.csv')
+
+
+@pytest.fixture
+def sample_csv(tmp_path):
+    path = tmp_path / 'riscos.csv'
+    shutil.copy(SAMPLE_CSV, path)
+    return str(path)
+
+
+@pytest.fixture
+def empty_csv(tmp_path):
+    path = tmp_path / 'vazio.csv'
+    with open(SAMPLE_CSV, encoding='utf-8') as src:
+        path.write_text(src.readline(), encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def sample_store(tmp_path_factory):
+    # Store do dataset de exemplo compartilhado pelos testes que só leem
+    from incremental import IncidentStore
+    path = tmp_path_factory.mktemp('amostra') / 'riscos.csv'
+    shutil.copy(SAMPLE_CSV, path)
+    return IncidentStore(str(path), incoming=None)
+
+
+@pytest.fixture(scope='session')
+def sample_frame(tmp_path_factory):
+    # Incidentes do dataset de exemplo como DataFrame do esquema de storage (lido direto do CSV,
+    # o oráculo pandas dos testes de equivalência)
+    import storage
+    path = tmp_path_factory.mktemp('quadro') / 'riscos.csv'
+    shutil.copy(SAMPLE_CSV, path)
+    return storage.CSVBackend(str(path)).read()
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from aggregations import TOP_CARRIERS, compute_kpis, kpi_tensors, merge_kpi_tensors
+from cube import IncidentCube
+
+
+def baseline(df):
+    # Oráculo: os cálculos separados do dashboard original, com groupby do pandas
+    total = len(df)
+    cost = df['Custo Associado (R$)']
+    routes = df['Rota/Local Crítico'].astype(str).value_counts()
+    carriers = {}
+    for carrier in TOP_CARRIERS:
+        rows = df[df['Transportadora'] == carrier]
+        risks = rows['Tipo de Risco'].astype(str).value_counts()
+        carriers[carrier] = (len(rows), rows['Custo Associado (R$)'].sum(),
+                             risks.index[0] if len(rows) else 'N/A',
+                             risks.iloc[0] / len(rows) * 100 if len(rows) else 0.0)
+    return {
+        'total': total, 'cost': cost.sum(),
+        'high': int((df['Nível de Criticidade'] == 'Alto').sum()),
+        'top_route_count': int(routes.iloc[0]) if total else 0,
+        'carriers': carriers,
+    }
+
+
+def check(kpis, expected, df):
+    assert kpis.total_incidents == expected['total']
+    assert kpis.total_cost == pytest.approx(expected['cost'])
+    assert kpis.high_criticality == expected['high']
+    assert kpis.top_route_count == expected['top_route_count']
+    if expected['total']:
+        assert (df['Rota/Local Crítico'] == kpis.top_route).sum() == expected['top_route_count']
+    for carrier, (n, cost, risk, pct) in expected['carriers'].items():
+        summary = kpis.carriers[carrier]
+        assert summary.incidents == n
+        assert summary.total_cost == pytest.approx(cost)
+        assert summary.top_risk_pct == pytest.approx(pct)
+        if n:
+            top = df[df['Transportadora'] == carrier]['Tipo de Risco'].astype(str).value_counts()
+            assert top[summary.top_risk] == top.iloc[0]
+
+
+@pytest.mark.parametrize('query', [None, "Região == 'Sul'", "`Modal Afetado` == 'Aéreo'",
+                                   "Transportadora == 'Nenhuma'"])
+def test_fused_kpis_match_baseline(sample_frame, query):
+    df = sample_frame if query is None else sample_frame.query(query)
+    expected = baseline(df)
+    # Direto sobre os incidentes e sobre as células do cubo
+    check(compute_kpis(df), expected, df)
+    check(compute_kpis(IncidentCube(df).cells), expected, df)
+
+
+def test_partial_tensors_merge(sample_frame):
+    # Tensores de pedaços das mesmas células somam para o resultado do todo
+    cells = IncidentCube(sample_frame).cells
+    bounds = np.linspace(0, len(cells), 5).astype(int)
+    parts = [kpi_tensors(cells.iloc[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])]
+    assert merge_kpi_tensors(parts) == compute_kpis(cells)
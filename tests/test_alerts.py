@@ -0,0 +1,67 @@
+import datetime
+
+import pandas as pd
+
+from alerts import AnomalyDetector, alert_routes
+
+DAYS = 60
+
+
+def incidents(days, per_day=1, cost=10_000, modal='Rodoviário'):
+    rows = [(day, 'JSL', 'Roubo', modal, 'Sul', cost, 'BR-116 (PR-SC)')
+            for day in days for _ in range(per_day)]
+    return pd.DataFrame(rows, columns=['Data', 'Transportadora', 'Tipo de Risco', 'Modal Afetado', 'Região',
+                                       'Custo Associado (R$)', 'Rota/Local Crítico'])
+
+
+def calm_detector():
+    detector = AnomalyDetector()
+    detector.on_batch(incidents(pd.date_range('2025-01-01', periods=DAYS, freq='D')))
+    return detector
+
+
+def test_steady_series_has_no_alerts():
+    assert calm_detector().active() == []
+
+
+def test_volume_spike():
+    detector = calm_detector()
+    spike = pd.Timestamp('2025-01-01') + pd.Timedelta(days=DAYS)
+    detector.on_batch(incidents([spike], per_day=20))
+    raised = {(a.kind, a.dimension) for a in detector.active()}
+    assert raised == {('volume', 'Rota/Local Crítico'), ('volume', 'Transportadora')}
+    assert alert_routes(detector.active()) == ['BR-116 (PR-SC)']
+    assert detector.active(end=spike.date() - datetime.timedelta(days=1)) == []
+
+
+def test_atypical_cost():
+    detector = calm_detector()
+    day = pd.Timestamp('2025-01-01') + pd.Timedelta(days=DAYS)
+    detector.on_batch(incidents([day], cost=5_000_000, modal='Ferroviário'))
+    (alert,) = detector.active()
+    assert alert.kind == 'custo' and alert.incidents == 1
+    assert alert.modals == ('Ferroviário',) and alert.carriers == ('JSL',)
+
+
+def test_active_applies_every_filter():
+    detector = calm_detector()
+    detector.on_batch(incidents([pd.Timestamp('2025-01-01') + pd.Timedelta(days=DAYS)], per_day=20))
+    assert len(detector.active(selections={'Região': ['Sul'], 'Transportadora': []})) == 2
+    assert detector.active(selections={'Modal Afetado': ['Aéreo']}) == []
+    assert detector.active(selections={'Tipo de Risco': ['Climático']}) == []
+    assert detector.active(selections={'Região': ['Norte']}) == []
+
+
+def test_unused_routes_do_not_change_alerts():
+    # Rotas do dicionário ausentes dos lotes não entram no processamento do dia
+    days = pd.date_range('2025-01-01', periods=DAYS + 1, freq='D')
+    plain = incidents(days[:-1])
+    spike = incidents(days[-1:], per_day=20)
+    wide = AnomalyDetector()
+    routes = pd.CategoricalDtype([f'Rota {i}' for i in range(50_000)] + ['BR-116 (PR-SC)'])
+    for batch in (plain, spike):
+        wide.on_batch(batch.assign(**{'Rota/Local Crítico': batch['Rota/Local Crítico'].astype(routes)}))
+    narrow = AnomalyDetector()
+    for batch in (plain, spike):
+        narrow.on_batch(batch)
+    assert wide.active() == narrow.active()
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import pytest
+
+import api
+
+
+@pytest.fixture(scope='module')
+def service(sample_store):
+    return api.QueryService(sample_store, workers=2)
+
+
+def get(service, path, **params):
+    status, body = service.handle(path, params)
+    return status, json.loads(body)
+
+
+def test_kpis_match_pandas(service, sample_frame):
+    status, body = get(service, '/kpis', start='2025-03-01', end='2025-05-31', carriers='Brado,JSL')
+    assert status == 200
+    df = sample_frame
+    rows = df[df['Data'].between('2025-03-01', '2025-05-31') & df['Transportadora'].isin(['Brado', 'JSL'])]
+    kpis = body['data']
+    assert kpis['total_incidents'] == len(rows)
+    assert kpis['total_cost'] == pytest.approx(rows['Custo Associado (R$)'].sum())
+    assert kpis['high_criticality'] == (rows['Nível de Criticidade'] == 'Alto').sum()
+    assert body['filters']['carriers'] == ['Brado', 'JSL']
+
+
+def test_regions_match_pandas(service, sample_frame):
+    status, body = get(service, '/regions', risk_types='Roubo')
+    assert status == 200
+    expected = sample_frame[sample_frame['Tipo de Risco'] == 'Roubo'].groupby('Região').size()
+    assert {r['Região']: r['Incidentes'] for r in body['data']} == expected.to_dict()
+
+
+def test_report_has_every_query(service):
+    status, body = get(service, '/')
+    assert status == 200
+    assert set(body['data']) == set(api.QUERIES)
+    assert get(service, '/kpis')[1]['data'] == body['data']['kpis']
+
+
+def test_forecast_alerts_and_plan(service):
+    for path in ('/forecast', '/alerts', '/plan', '/health'):
+        status, _ = get(service, path)
+        assert status == 200, path
+
+
+def test_errors(service, monkeypatch):
+    assert get(service, '/nada')[0] == 404
+    status, body = get(service, '/kpis', start='março')
+    assert status == 400 and 'error' in body
+    # Falha inesperada vira 500 com corpo JSON
+    monkeypatch.setitem(api.QUERIES, 'kpis', lambda views: 1 / 0)
+    status, body = get(service, '/kpis', start='2024-01-01')
+    assert status == 500 and body['error'] == 'erro interno: ZeroDivisionError'
+
+
+def test_keep_alive_connection(service):
+    async def exchange():
+        server = await asyncio.start_server(service.serve_connection, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        statuses = []
+        for path, connection in (('/health', 'keep-alive'), ('/nada', 'close')):
+            writer.write(f'GET {path} HTTP/1.1\r\nConnection: {connection}\r\n\r\n'.encode())
+            status = (await reader.readline()).split()[1]
+            length = 0
+            while (line := await reader.readline()) != b'\r\n':
+                if line.lower().startswith(b'content-length'):
+                    length = int(line.split(b':')[1])
+            json.loads(await reader.readexactly(length))
+            statuses.append(int(status))
+        assert await reader.read() == b''
+        writer.close()
+        server.close()
+        return statuses
+
+    assert asyncio.run(exchange()) == [200, 404]
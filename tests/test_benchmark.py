@@ -0,0 +1,32 @@
+import benchmark
+
+
+def report(repeat=5, **stages):
+    return {'repeat': repeat,
+            'results': {'1k': {'stages': {name: {'seconds': s, 'peak_rss_mb': rss}
+                                          for name, (s, rss) in stages.items()}}}}
+
+
+def test_noise_on_short_stages_is_not_a_regression():
+    # 0,057 s → 0,088 s (+55%): abaixo do piso e da diferença absoluta mínima
+    assert benchmark.compare(report(cube=(0.088, 150)), report(cube=(0.057, 150)), 0.2) == []
+    assert benchmark.compare(report(views=(0.34, 150)), report(views=(0.25, 150)), 0.2) == []
+
+
+def test_real_regressions_are_reported():
+    regressions = benchmark.compare(report(views=(1.5, 400)), report(views=(1.0, 300)), 0.2)
+    assert [(stage, metric) for _, stage, metric, _, _ in regressions] == [
+        ('views', 'seconds'), ('views', 'peak_rss_mb')]
+
+
+def test_single_run_baseline_does_not_gate_time():
+    assert benchmark.compare(report(views=(2.0, 150)), report(repeat=1, views=(1.0, 150)), 0.2) == []
+
+
+def test_measure_takes_the_median(monkeypatch):
+    # Durações 1, 9, 2, 3, 2: um pico isolado não muda o tempo registrado
+    clock = iter([0, 1, 10, 19, 20, 22, 30, 33, 40, 42])
+    monkeypatch.setattr(benchmark.time, 'perf_counter', lambda: next(clock))
+    result = benchmark.measure(lambda ctx: None, {}, alloc=False, repeat=5)
+    assert result['runs'] == 5
+    assert result['seconds'] == 2 and result['best_seconds'] == 1
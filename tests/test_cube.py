@@ -0,0 +1,65 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from compact import CompactIncidents
+from cube import DIMENSIONS, IncidentCube
+from queries import Filters, compute_views
+
+
+def normalized(cells):
+    cells = cells[DIMENSIONS + ['Incidentes', 'Custo']].copy()
+    for col in DIMENSIONS[1:]:
+        cells[col] = cells[col].astype(str)
+    cells['Data'] = cells['Data'].astype('datetime64[ns]')
+    cells[['Incidentes', 'Custo']] = cells[['Incidentes', 'Custo']].astype('int64')
+    return cells.sort_values(DIMENSIONS).reset_index(drop=True)
+
+
+def baseline_cells(df):
+    return df.groupby(DIMENSIONS, observed=True).agg(
+        Incidentes=('Custo Associado (R$)', 'size'), Custo=('Custo Associado (R$)', 'sum')).reset_index()
+
+
+def test_cells_match_groupby(sample_frame):
+    expected = normalized(baseline_cells(sample_frame))
+    assert normalized(IncidentCube(sample_frame).cells).equals(expected)
+    assert normalized(IncidentCube(CompactIncidents.from_frame(sample_frame)).cells).equals(expected)
+
+
+def test_update_matches_full_build(sample_frame):
+    # Lotes novos fundidos no cubo dão as mesmas células que agregar tudo de uma vez
+    cutoff = pd.Timestamp('2025-04-01')
+    cube = IncidentCube(sample_frame[sample_frame['Data'] < cutoff].reset_index(drop=True))
+    cube.update(sample_frame[sample_frame['Data'] >= cutoff].reset_index(drop=True))
+    assert normalized(cube.cells).equals(normalized(baseline_cells(sample_frame)))
+
+
+@pytest.mark.parametrize('filters', [
+    Filters(),
+    Filters(start=datetime.date(2025, 2, 1), end=datetime.date(2025, 3, 15), carriers=('JSL',)),
+    Filters(risk_types=('Climático', 'Acidente'), regions=('Sul',)),
+])
+def test_views_match_pandas(sample_frame, filters):
+    # Gráficos a partir das células do cubo = groupby sobre os incidentes filtrados
+    df = sample_frame
+    mask = pd.Series(True, index=df.index)
+    if filters.start:
+        mask &= df['Data'] >= pd.Timestamp(filters.start)
+    if filters.end:
+        mask &= df['Data'] <= pd.Timestamp(filters.end)
+    for col, values in filters.selections().items():
+        if values:
+            mask &= df[col].isin(values)
+    df = df[mask]
+    views = compute_views(IncidentCube(sample_frame), filters)
+    for name, col in [('risk', 'Tipo de Risco'), ('carrier', 'Transportadora'), ('region', 'Região'),
+                      ('route', 'Rota/Local Crítico')]:
+        expected = df.groupby(col, observed=True)['Custo Associado (R$)'].agg(['size', 'sum'])
+        view = views[name].set_index(views[name][col].astype(str))
+        view = view[view['Incidentes'] > 0]
+        assert view['Incidentes'].to_dict() == expected['size'].rename(str).to_dict(), name
+        assert view['Custo'].to_dict() == expected['sum'].rename(str).to_dict(), name
+    months = df.groupby([df['Data'].dt.month, 'Tipo de Risco'], observed=True).size()
+    assert views['month_risk']['Incidentes'].sum() == months.sum() == len(df)
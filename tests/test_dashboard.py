@@ -0,0 +1,60 @@
+import os
+import threading
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import queries
+import registry
+import result_cache
+from conftest import ROOT
+
+DASHBOARD = os.path.join(ROOT, 'dashboard.py')
+
+
+@pytest.fixture
+def computed(sample_csv, monkeypatch):
+    # Dashboard sobre uma cópia do dataset, com cache de resultados novo; registra as visões
+    # calculadas (a página e o pool de fundo)
+    monkeypatch.setattr(registry, '_shared', registry.Registry([registry.Dataset('teste', 'Teste', sample_csv)]))
+    monkeypatch.setattr(result_cache, '_shared', result_cache.ResultCache())
+    names, lock = [], threading.Lock()
+    compute_view = queries.compute_view
+
+    def counting(cube, name, filters):
+        with lock:
+            names.append(name)
+        return compute_view(cube, name, filters)
+
+    monkeypatch.setattr(queries, 'compute_view', counting)
+    return names
+
+
+def run(at):
+    at = at.run()
+    assert [e.value for e in at.exception] == []
+    return at
+
+
+def test_rerun_with_same_filters_reuses_every_view(computed):
+    at = run(AppTest.from_file(DASHBOARD, default_timeout=120))
+    assert len(at.get('plotly_chart')) == 7
+    first = sorted(set(computed))
+    assert len(first) == len(computed)  # cada visão calculada uma única vez
+    computed.clear()
+    run(at)
+    assert computed == []
+
+
+def test_timeline_granularity_only_computes_its_view(computed):
+    at = run(AppTest.from_file(DASHBOARD, default_timeout=120))
+    computed.clear()
+    at = run(at.radio(key='timeline-granularity').set_value('week'))
+    assert computed == ['week_risk']
+
+
+def test_filter_change_recomputes_sections(computed):
+    at = run(AppTest.from_file(DASHBOARD, default_timeout=120))
+    computed.clear()
+    at = run(at.sidebar.multiselect[0].set_value(['JSL', 'Brado']))
+    assert 'kpis' in computed and len(at.get('plotly_chart')) == 7
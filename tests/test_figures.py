@@ -0,0 +1,99 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.tools
+import pytest
+
+import figures
+from figures import FigureCache, downsample, lttb, minmax
+
+
+def test_lttb_keeps_endpoints_and_order():
+    rng = np.random.default_rng(1)
+    y = rng.normal(size=1000).cumsum()
+    keep = lttb(np.arange(1000), y, 100)
+    assert len(keep) == 100
+    assert keep[0] == 0 and keep[-1] == 999
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_short_series_untouched():
+    assert (lttb(np.arange(10), np.ones(10), 50) == np.arange(10)).all()
+    assert (lttb(np.arange(10), np.ones(10), 2) == np.arange(10)).all()
+
+
+def test_minmax_keeps_extremes():
+    rng = np.random.default_rng(2)
+    y = rng.normal(size=1000)
+    keep = minmax(y, 50)
+    assert len(keep) <= 100
+    assert (np.diff(keep) > 0).all()
+    assert y.argmax() in keep and y.argmin() in keep
+
+
+def test_downsample_per_series():
+    days = pd.date_range('2020-01-01', periods=800, freq='D')
+    df = pd.DataFrame({'Data': np.tile(days, 2), 'Risco': np.repeat(['A', 'B'], 800),
+                       'Incidentes': np.arange(1600) % 7})
+    out = downsample(df, 'Data', 'Incidentes', color='Risco', target=100)
+    assert out.groupby('Risco').size().tolist() == [100, 100]
+    for _, series in out.groupby('Risco'):
+        assert series['Data'].iloc[0] == days[0] and series['Data'].iloc[-1] == days[-1]
+
+
+def figure():
+    return go.Figure(go.Scatter(x=[1, 2, 3], y=[3, 1, 2]))
+
+
+def test_cache_hit_reuses_the_spec(monkeypatch):
+    cache = FigureCache()
+    builds = []
+    spec = cache.get('linha', 'k', lambda: builds.append(1) or figure())
+    # Acertos não reconstroem nem reparseiam o JSON
+    monkeypatch.setattr(figures.json, 'loads', None)
+    assert cache.get('linha', 'k', figure) is spec
+    assert builds == [1]
+    assert spec['data'][0]['y'] == [3, 1, 2]
+
+
+def test_renderer_does_not_mutate_the_spec():
+    spec = FigureCache().get('linha', 'k', figure)
+    before = json.dumps(spec, sort_keys=True)
+    plotly.tools.return_figure_from_figure_or_data(spec, validate_figure=True)
+    assert json.dumps(spec, sort_keys=True) == before
+
+
+def test_concurrent_misses_build_once():
+    cache = FigureCache()
+    started, release = threading.Event(), threading.Event()
+    builds = []
+
+    def slow():
+        builds.append(1)
+        started.set()
+        release.wait(5)
+        return figure()
+
+    with ThreadPoolExecutor(4) as pool:
+        first = pool.submit(cache.get, 'linha', 'k', slow)
+        started.wait(5)
+        others = [pool.submit(cache.get, 'linha', 'k', slow) for _ in range(3)]
+        release.set()
+        specs = [first.result()] + [f.result() for f in others]
+    assert builds == [1]
+    assert all(s is specs[0] for s in specs)
+
+
+def test_failed_build_is_not_cached():
+    cache = FigureCache()
+
+    def broken():
+        raise RuntimeError('falhou')
+
+    with pytest.raises(RuntimeError):
+        cache.get('linha', 'k', broken)
+    assert cache.get('linha', 'k', figure)['data']
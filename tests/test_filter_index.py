@@ -0,0 +1,52 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from filter_index import FilterIndex
+
+CASES = [
+    (None, None, {}),
+    (datetime.date(2025, 2, 10), datetime.date(2025, 4, 20), {}),
+    (None, None, {'Transportadora': ['JSL', 'Brado']}),
+    (datetime.date(2025, 3, 1), None, {'Tipo de Risco': ['Roubo', 'Greve'], 'Região': ['Sul', 'Sudeste']}),
+    (None, datetime.date(2025, 1, 31), {'Modal Afetado': ['Ferroviário'], 'Transportadora': []}),
+    (datetime.date(2025, 5, 1), datetime.date(2025, 5, 1), {'Região': ['Norte']}),
+    (datetime.date(2030, 1, 1), None, {}),
+]
+
+
+def pandas_filter(df, start, end, selections):
+    # Oráculo: máscaras booleanas do pandas, como o dashboard original filtrava
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (df['Data'] >= str(start)).to_numpy()
+    if end is not None:
+        mask &= (df['Data'] <= str(end)).to_numpy()
+    for col, values in selections.items():
+        if values:
+            mask &= df[col].isin(values).to_numpy()
+    return df[mask]
+
+
+@pytest.mark.parametrize('start, end, selections', CASES)
+def test_filter_matches_pandas_masks(sample_frame, start, end, selections):
+    # O índice ordena por data (estável); o oráculo recebe as linhas na mesma ordem
+    index = FilterIndex(sample_frame)
+    expected = pandas_filter(index.df, start, end, selections)
+    result = index.filter(start, end, selections)
+    assert result.index.tolist() == expected.index.tolist()
+
+
+def test_unsorted_input_is_sorted_once(sample_frame):
+    shuffled = sample_frame.sample(frac=1, random_state=0).reset_index(drop=True)
+    index = FilterIndex(shuffled)
+    assert (np.diff(index.dates.astype(np.int64)) >= 0).all()
+    assert len(index.filter(datetime.date(2025, 2, 1), datetime.date(2025, 2, 28))) == \
+        len(pandas_filter(shuffled, datetime.date(2025, 2, 1), datetime.date(2025, 2, 28), {}))
+
+
+def test_selecting_every_value_is_no_filter(sample_frame):
+    index = FilterIndex(sample_frame)
+    everything = {'Transportadora': index.categories['Transportadora']}
+    assert index.select(None, None, everything) == slice(0, len(index))
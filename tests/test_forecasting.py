@@ -0,0 +1,41 @@
+import numpy as np
+
+import forecasting
+from incremental import IncidentStore
+from queries import Filters, query_forecast
+
+
+def test_strike_probability_is_daily(sample_store):
+    forecaster = forecasting.Forecaster().sync(sample_store)
+    outlook = forecasting.outlook(forecaster, sample_store.cube, Filters())
+    strike = outlook['strike']
+    assert strike.incidents > 1
+    assert 0 < strike.probability_daily < 1
+    assert np.isclose(strike.probability_daily, 1 - np.exp(-strike.incidents / strike.days))
+
+
+def test_forecast_within_interval(sample_store):
+    forecaster = forecasting.Forecaster().sync(sample_store)
+    target = forecasting.outlook(forecaster, sample_store.cube, Filters())['target']
+    assert target.incidents_low <= target.incidents <= target.incidents_high
+    assert target.cost_low <= target.cost <= target.cost_high
+
+
+def test_empty_dataset(empty_csv):
+    store = IncidentStore(empty_csv, incoming=None)
+    forecaster = forecasting.Forecaster().sync(store)
+    outlook = forecasting.outlook(forecaster, store.cube, Filters())
+    assert outlook['target'].incidents == 0
+    assert outlook['strike'].probability_daily == 0
+    assert len(outlook['months']) == 0
+
+
+def test_strike_follows_risk_type_filter(sample_store):
+    forecaster = forecasting.Forecaster().sync(sample_store)
+    cube = sample_store.cube
+    assert forecasting.outlook(forecaster, cube, Filters(risk_types=('Roubo',)))['strike'] is None
+    both = forecasting.outlook(forecaster, cube, Filters(risk_types=('Greve', 'Roubo')))['strike']
+    only = forecasting.outlook(forecaster, cube, Filters(risk_types=('Greve',)))['strike']
+    assert both == only and both.incidents > 0
+    assert query_forecast(forecasting.outlook(forecaster, cube, Filters(risk_types=('Roubo',))))[
+        'strike_probability_daily'] is None
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import geo
+import queries
+
+ROUTES = list(geo.ROUTE_GEOMETRY)
+
+
+@pytest.fixture(scope='module')
+def points():
+    # Incidentes geolocalizados sorteados nas geometrias, com custo
+    rng = np.random.default_rng(7)
+    codes = rng.integers(len(ROUTES), size=5000)
+    lat, lon = geo.scatter(rng, codes, ROUTES)
+    return pd.DataFrame({'Rota/Local Crítico': np.array(ROUTES)[codes], 'route': codes,
+                         'Latitude': lat, 'Longitude': lon, 'Custo': rng.exponential(20000, len(codes))})
+
+
+def route_totals(points):
+    return points.groupby('Rota/Local Crítico').agg(Incidentes=('route', 'size'), Custo=('Custo', 'sum')).reset_index()
+
+
+@pytest.mark.parametrize('level', [0, 3, 6, 8])
+def test_tiles_match_point_groupby(points, level):
+    # Com os totais por rota vindos dos próprios pontos, cada tile tem exatamente os seus pontos
+    pyramid = geo.TilePyramid(ROUTES, points['route'], points['Latitude'], points['Longitude'],
+                              points['Custo'], max_level=8)
+    tiles = pyramid.tiles(level, route_totals(points))
+    keys = geo.tile_codes(points['Latitude'].to_numpy(), points['Longitude'].to_numpy(), level)
+    lat, lon = geo.tile_centers(np.unique(keys), level)
+    expected = points.groupby(keys).agg(Incidentes=('route', 'size'), Custo=('Custo', 'sum'))
+    expected = expected.assign(Latitude=lat, Longitude=lon).sort_values(['Latitude', 'Longitude'])
+    got = tiles.sort_values(['Latitude', 'Longitude'])
+    np.testing.assert_allclose(got[['Latitude', 'Longitude']], expected[['Latitude', 'Longitude']])
+    np.testing.assert_allclose(got['Incidentes'], expected['Incidentes'])
+    np.testing.assert_allclose(got['Custo'], expected['Custo'])
+
+
+def test_every_level_preserves_route_totals(sample_store):
+    pyramid = geo.TilePyramid.from_geometry(points=2000)
+    routes = queries.compute_view(sample_store.cube, 'route', queries.Filters(carriers=('JSL',)))
+    mapped = routes[routes['Rota/Local Crítico'].astype(str).isin(geo.ROUTE_GEOMETRY)]
+    for level in range(geo.MAX_LEVEL + 1):
+        tiles = pyramid.tiles(level, routes)
+        assert tiles['Incidentes'].sum() == pytest.approx(mapped['Incidentes'].sum())
+        assert tiles['Custo'].sum() == pytest.approx(mapped['Custo'].sum())
+
+
+def test_parent_tile_is_code_shifted():
+    rng = np.random.default_rng(1)
+    lat = rng.uniform(geo.BBOX[0], geo.BBOX[1], 1000)
+    lon = rng.uniform(geo.BBOX[2], geo.BBOX[3], 1000)
+    for level in range(1, 10):
+        assert np.array_equal(geo.tile_codes(lat, lon, level) >> 2, geo.tile_codes(lat, lon, level - 1))
+
+
+def test_viewport_keeps_only_its_tiles(points):
+    pyramid = geo.TilePyramid(ROUTES, points['route'], points['Latitude'], points['Longitude'],
+                              points['Custo'], max_level=8)
+    viewport = geo.VIEWPORTS['Sul']
+    tiles = pyramid.tiles(7, route_totals(points), viewport)
+    assert len(tiles) and geo.inside(tiles['Latitude'].to_numpy(), tiles['Longitude'].to_numpy(), viewport).all()
+    unknown = pd.DataFrame({'Rota/Local Crítico': ['Rota nova'], 'Incidentes': [10], 'Custo': [1.0]})
+    assert pyramid.tiles(7, unknown).empty
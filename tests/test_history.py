@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+import history
+
+SELECTIONS = {'Transportadora': ['JSL', 'Brado'], 'Tipo de Risco': ['Roubo', 'Greve']}
+
+
+@pytest.fixture(scope='module')
+def archive(sample_frame, tmp_path_factory):
+    # Ano anterior: o dataset de exemplo deslocado um ano para trás, gravado no arquivo histórico
+    folder = tmp_path_factory.mktemp('historico')
+    previous = sample_frame.assign(Data=sample_frame['Data'] - pd.DateOffset(years=1))
+    src = folder / '2024.csv'
+    previous.to_csv(src, index=False)
+    assert history.add(str(src), str(folder / 'arquivo')) == [2024]
+    return str(folder / 'arquivo'), pd.concat([previous, sample_frame], ignore_index=True)
+
+
+def expected(raw, start, end, selections=None):
+    mask = raw['Data'].between(start, end)
+    for col, values in (selections or {}).items():
+        mask &= raw[col].isin(values)
+    rows = raw[mask]
+    return len(rows), float(rows['Custo Associado (R$)'].sum())
+
+
+@pytest.mark.parametrize('start,end', [('2024-01-01', '2024-12-31'), ('2024-02-10', '2025-03-17'),
+                                       ('2025-04-03', '2025-04-20'), ('2024-05-31', '2024-07-01')])
+@pytest.mark.parametrize('selections', [None, SELECTIONS])
+def test_aggregate_matches_raw_incidents(sample_store, archive, start, end, selections):
+    path, raw = archive
+    hist = history.PeriodHistory.combine(sample_store.cube, path)
+    incidents, cost = hist.aggregate(start, end, selections)
+    assert (incidents, cost) == pytest.approx(expected(raw, start, end, selections))
+
+
+def test_year_and_quarter_over_quarter(sample_store, archive):
+    path, raw = archive
+    hist = history.PeriodHistory.combine(sample_store.cube, path)
+    yoy = hist.year_over_year('2025-02-01', '2025-05-15', SELECTIONS)
+    assert yoy.label == '2024'
+    assert yoy.current == pytest.approx(expected(raw, '2025-02-01', '2025-05-15', SELECTIONS))
+    assert yoy.previous == pytest.approx(expected(raw, '2024-02-01', '2024-05-15', SELECTIONS))
+    assert yoy.change() == pytest.approx((yoy.current[0] / yoy.previous[0] - 1) * 100)
+    qoq = hist.quarter_over_quarter('2025-05-15')
+    assert qoq.label == 'Q1'
+    assert qoq.current == pytest.approx(expected(raw, '2025-04-01', '2025-05-15'))
+    assert qoq.previous == pytest.approx(expected(raw, '2025-01-01', '2025-02-14'))
+
+
+def test_current_store_replaces_archived_months(sample_store, sample_frame, tmp_path):
+    # Um arquivo que também cobre 2025 (com outros números) perde para o store nos meses dele
+    doubled = tmp_path / 'dobro.csv'
+    pd.concat([sample_frame, sample_frame]).to_csv(doubled, index=False)
+    history.add(str(doubled), str(tmp_path / 'arquivo'))
+    hist = history.PeriodHistory.combine(sample_store.cube, str(tmp_path / 'arquivo'))
+    assert hist.aggregate('2025-01-01', '2025-06-30') == pytest.approx(
+        expected(sample_frame, '2025-01-01', '2025-06-30'))
+
+
+def test_without_archive_there_is_no_reference(sample_store):
+    hist = history.PeriodHistory.combine(sample_store.cube, None)
+    comparison = hist.year_over_year('2025-01-01', '2025-03-31')
+    assert comparison.previous is None and comparison.change() is None
@@ -0,0 +1,87 @@
+import datetime
+import os
+
+import pandas as pd
+
+from cube import DIMENSIONS
+from incremental import IncidentStore
+
+
+def cells(store):
+    frame = store.cube.cells[DIMENSIONS + ['Incidentes', 'Custo']].copy()
+    for col in DIMENSIONS[1:]:
+        frame[col] = frame[col].astype(str)
+    return frame.sort_values(DIMENSIONS).reset_index(drop=True)
+
+
+def split_log(sample_csv, tmp_path, cutoff='2025-04-01'):
+    # Log com os incidentes até cutoff; devolve (caminho, linhas restantes em texto)
+    with open(sample_csv, encoding='utf-8') as f:
+        header, *rows = f.read().splitlines()
+    old = [r for r in rows if r[:10] < cutoff]
+    new = [r for r in rows if r[:10] >= cutoff]
+    path = tmp_path / 'log.csv'
+    path.write_text('\n'.join([header] + old) + '\n', encoding='utf-8')
+    return str(path), new
+
+
+def test_appended_rows_match_full_load(sample_csv, sample_store, tmp_path):
+    path, new = split_log(sample_csv, tmp_path)
+    store = IncidentStore(path, incoming=None)
+    batches = []
+    store.subscribe(lambda batch, reset: batches.append((len(batch), reset)))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('\n'.join(new) + '\n')
+    assert store.refresh() == len(new)
+    assert batches[-1] == (len(new), False)
+    assert cells(store).equals(cells(sample_store))
+    # A cópia colunar recebeu o lote: uma carga nova parte dela com o mesmo resultado
+    assert cells(IncidentStore(path, incoming=None)).equals(cells(sample_store))
+
+
+def test_partial_line_waits(sample_csv, tmp_path):
+    path, new = split_log(sample_csv, tmp_path)
+    store = IncidentStore(path, incoming=None)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(new[0] + '\n' + new[1][:12])
+    assert store.refresh() == 1
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(new[1][12:] + '\n')
+    assert store.refresh() == 1
+    assert store.refresh() == 0
+
+
+def test_versions_follow_touched_days(sample_csv, tmp_path):
+    path, new = split_log(sample_csv, tmp_path)
+    store = IncidentStore(path, incoming=None)
+    january = (datetime.date(2025, 1, 1), datetime.date(2025, 1, 31))
+    key = store.data_key(*january), store.data_key()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(new[0] + '\n')
+    store.refresh()
+    assert store.data_key(*january) == key[0]
+    assert store.data_key() != key[1]
+
+
+def test_drop_folder_is_ingested_and_archived(sample_csv, tmp_path):
+    path, new = split_log(sample_csv, tmp_path)
+    incoming = tmp_path / 'entrada'
+    incoming.mkdir()
+    store = IncidentStore(path, incoming=str(incoming))
+    with open(sample_csv, encoding='utf-8') as f:
+        header = f.readline()
+    (incoming / 'lote.csv').write_text(header + '\n'.join(new[:10]) + '\n', encoding='utf-8')
+    assert store.refresh() == 10
+    assert os.listdir(incoming / 'processed') == ['lote.csv']
+    assert store.refresh() == 0
+
+
+def test_truncated_log_reloads(sample_csv, tmp_path):
+    path, _ = split_log(sample_csv, tmp_path)
+    store = IncidentStore(path, incoming=None)
+    before = store.cube.cells['Incidentes'].sum()
+    shorter, _ = split_log(sample_csv, tmp_path, cutoff='2025-02-01')
+    store.refresh()
+    after = store.cube.cells['Incidentes'].sum()
+    assert store.reload_version == 1 and after < before
+    assert after == len(pd.read_csv(shorter))
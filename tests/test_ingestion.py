@@ -0,0 +1,41 @@
+import pandas as pd
+
+import ingestion
+
+# Linha no arquivo (1 = cabeçalho) → conteúdo inválido
+BAD_LINES = {
+    3: '2025-13-01,JSL,Roubo,Alto,Rodoviário,Sul,1000,Outra Sul',
+    40: '2025-01-05,JSL,Roubo,Alto,Rodoviário,Sul',
+    41: '2025-01-05,Transportadora X,Roubo,Alto,Rodoviário,Sul,1000,Outra Sul',
+    500: '2025-02-01,JSL,Roubo,Alto,Rodoviário,Sul,-5,Outra Sul',
+    1200: '',
+}
+
+
+def corrupt(path):
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    for number, text in sorted(BAD_LINES.items()):
+        lines.insert(number - 1, text)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return len(lines) - 1
+
+
+def test_quarantine_line_numbers(sample_csv):
+    rows = corrupt(sample_csv)
+    # Blocos pequenos lidos em paralelo: a numeração é a do arquivo, não a do bloco
+    clean, report = ingestion.read_csv(sample_csv, chunk_bytes=4096, workers=4)
+    assert report.chunks > 1
+    assert report.rows == rows
+    assert report.rejected == len(BAD_LINES)
+    assert len(clean) == rows - len(BAD_LINES)
+    quarantine = pd.read_csv(report.quarantine, keep_default_na=False)
+    assert quarantine['Linha'].tolist() == sorted(BAD_LINES)
+    assert quarantine['Conteúdo'].tolist()[:2] == [BAD_LINES[3], BAD_LINES[40]]
+
+
+def test_clean_file_removes_quarantine(sample_csv):
+    ingestion.write_quarantine(pd.DataFrame({'Linha': [2], 'Motivo': ['x'], 'Conteúdo': ['y']}), sample_csv)
+    _, report = ingestion.read_csv(sample_csv)
+    assert report.rejected == 0 and report.quarantine is None
@@ -0,0 +1,41 @@
+import numpy as np
+
+import optimizer
+
+
+def greedy(groups, unit_cost, total, lower, upper):
+    # Referência: em cada grupo, enche as faixas da mais barata para a mais cara
+    x = lower.astype(np.float64).copy()
+    for g in range(len(total)):
+        free = total[g] - lower[groups == g].sum()
+        for i in sorted(np.flatnonzero(groups == g), key=lambda i: unit_cost[i]):
+            step = min(max(free, 0.0), upper[i] - lower[i])
+            x[i] += step
+            free -= step
+    return x
+
+
+def test_solve_matches_greedy():
+    rng = np.random.default_rng(3)
+    groups = rng.integers(0, 5, size=40)
+    unit_cost = rng.uniform(1, 10, size=40)
+    load = rng.uniform(10, 100, size=40)
+    lower, upper = load * 0.6, load * 1.3
+    total = np.bincount(groups, weights=load, minlength=5)
+    x, shortfall = optimizer.solve(groups, unit_cost, total, lower, upper)
+    assert np.allclose(x, greedy(groups, unit_cost, total, lower, upper))
+    assert np.allclose(np.bincount(groups, weights=x, minlength=5), total)
+    assert (x >= lower - 1e-9).all() and (x <= upper + 1e-9).all()
+    assert np.allclose(shortfall, 0)
+    # Nunca mais caro que a alocação atual
+    assert (unit_cost * x).sum() <= (unit_cost * load).sum() + 1e-6
+
+
+def test_solve_reports_shortfall():
+    groups = np.array([0, 0, 1])
+    unit_cost = np.array([1.0, 2.0, 1.0])
+    lower = np.zeros(3)
+    upper = np.array([10.0, 0.0, 5.0])  # segunda faixa paralisada
+    x, shortfall = optimizer.solve(groups, unit_cost, np.array([15.0, 5.0]), lower, upper)
+    assert np.allclose(x, [10, 0, 5])
+    assert np.allclose(shortfall, [5, 0])
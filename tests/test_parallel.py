@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import parallel
+import queries
+from compact import CompactIncidents
+from cube import DIMENSIONS
+
+
+@pytest.fixture
+def small_partitions(monkeypatch):
+    # Limiares baixos para o dataset de exemplo passar pelo caminho paralelo
+    monkeypatch.setattr(parallel, 'MIN_ROWS_PER_WORKER', 50)
+    monkeypatch.setattr(parallel, 'MIN_CELLS_PER_WORKER', 50)
+
+
+def test_partitions_cut_on_day_boundaries():
+    days = np.repeat(np.arange(10), [5, 1, 1, 7, 2, 2, 9, 1, 1, 3])
+    ranges = parallel.day_partitions(days, 4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(days)
+    assert all(hi == lo for (_, hi), (lo, _) in zip(ranges, ranges[1:]))
+    assert all(days[lo - 1] != days[lo] for lo, _ in ranges[1:])
+
+
+def test_process_pool_matches_serial(sample_frame, small_partitions):
+    incidents = CompactIncidents.from_frame(sample_frame)
+    assert parallel.workers_for(len(incidents), parallel.MIN_ROWS_PER_WORKER, 3) == 3
+    serial = incidents.aggregate(DIMENSIONS)
+    cells = parallel.aggregate(incidents, DIMENSIONS, workers=3)
+    pd.testing.assert_frame_equal(cells, serial)
+
+
+@pytest.mark.parametrize('filters', [queries.Filters(),
+                                     queries.Filters(carriers=('JSL', 'Brado'), regions=('Sul', 'Sudeste'))])
+def test_views_match_serial(sample_store, small_partitions, filters, monkeypatch):
+    cells = sample_store.cube.slice(filters.start, filters.end, filters.selections())
+    names = list(queries.VIEW_PARTIALS)
+    assert parallel.workers_for(len(cells), parallel.MIN_CELLS_PER_WORKER, 3) == 3
+    monkeypatch.setattr(parallel, 'WORKERS', 3)
+    merged = queries.run_views(cells, names)
+    monkeypatch.setattr(parallel, 'WORKERS', 1)
+    serial = queries.run_views(cells, names)
+    assert queries.query_report(merged) == queries.query_report(serial)
+    for name in names:
+        if name != 'kpis':
+            pd.testing.assert_frame_equal(merged[name], serial[name], check_dtype=False)
+
+
+def test_small_inputs_stay_serial(sample_store):
+    assert parallel.map_reduce(sample_store.cube.cells, queries.VIEW_PARTIALS, workers=8) is None
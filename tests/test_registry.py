@@ -0,0 +1,48 @@
+import shutil
+
+import pytest
+
+import registry
+
+
+@pytest.fixture
+def datasets(sample_csv, tmp_path):
+    # Três conjuntos iguais em pastas próprias, sem pasta de entrada nem histórico
+    result = []
+    for name in 'abc':
+        folder = tmp_path / name
+        folder.mkdir()
+        path = folder / 'riscos.csv'
+        shutil.copy(sample_csv, path)
+        result.append(registry.Dataset(name, name.upper(), str(path)))
+    return result
+
+
+def test_lru_eviction_under_budget(datasets):
+    size = registry.Registry(datasets).get('a').nbytes()
+    reg = registry.Registry(datasets, memory_budget=int(size * 2.5))
+    a = reg.get('a')
+    reg.get('b')
+    assert reg.get('a') is a  # ainda carregado; passa a ser o mais recente
+    reg.get('c')
+    stats = reg.stats()
+    assert [n for n, d in stats['datasets'].items() if d['loaded']] == ['a', 'c']
+    assert stats['datasets']['b']['evictions'] == 1
+    assert stats['used_bytes'] <= reg.memory_budget
+    # O despejado é recarregado no próximo acesso
+    reg.get('b')
+    assert reg.stats()['datasets']['b']['loads'] == 2
+
+
+def test_most_recent_stays_over_budget(datasets):
+    reg = registry.Registry(datasets, memory_budget=1)
+    reg.get('a')
+    loaded = reg.get('b')
+    stats = reg.stats()
+    assert [n for n, d in stats['datasets'].items() if d['loaded']] == ['b']
+    assert reg.get('b') is loaded
+
+
+def test_unknown_dataset(datasets):
+    with pytest.raises(KeyError):
+        registry.Registry(datasets).get('x')
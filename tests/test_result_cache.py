@@ -0,0 +1,72 @@
+import pickle
+import threading
+
+import pytest
+
+from queries import Filters
+from result_cache import ResultCache
+
+
+def test_filter_order_shares_the_entry(sample_store):
+    cache = ResultCache()
+    calls = []
+    for carriers in (('JSL', 'Brado'), ('Brado', 'JSL', 'JSL')):
+        filters = Filters(carriers=carriers).normalized(sample_store.cube.index.categories)
+        cache.get_or_compute(('views', filters), lambda: calls.append(1) or len(calls))
+    assert calls == [1]
+
+
+def test_concurrent_misses_compute_once():
+    cache = ResultCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+               for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert calls == [1] and results == [42] * 4
+
+
+def test_failures_are_not_cached():
+    cache = ResultCache()
+    with pytest.raises(ZeroDivisionError):
+        cache.get_or_compute('k', lambda: 1 / 0)
+    assert cache.get_or_compute('k', lambda: 7) == 7
+    assert cache.stats()['entries'] == 1
+
+
+def test_lru_respects_byte_budget():
+    value = 'x' * 1000
+    size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = ResultCache(max_bytes=3 * size)
+    for key in 'abc':
+        cache.put(key, value)
+    cache.get('a')
+    cache.put('d', value)
+    assert cache.get('b') == (False, None)
+    assert all(cache.get(key)[0] for key in 'acd')
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['bytes'] <= stats['max_bytes']
+    # Valor maior que o orçamento é devolvido mas não guardado
+    assert cache.get_or_compute('grande', lambda: 'y' * 10 * size) == 'y' * 10 * size
+    assert cache.get('grande') == (False, None)
+
+
+def test_disk_layer_survives_restart(tmp_path):
+    ResultCache(disk_path=str(tmp_path)).put(('api', 'kpis'), {'total': 3})
+    warm = ResultCache(disk_path=str(tmp_path))
+    assert warm.get(('api', 'kpis')) == (True, {'total': 3})
+    assert warm.stats()['disk_hits'] == 1
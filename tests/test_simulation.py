@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import simulation
+from incremental import IncidentStore
+from queries import Filters
+
+FILTERS = Filters(start=pd.Timestamp('2025-02-01').date(), end=pd.Timestamp('2025-04-30').date(),
+                  carriers=('JSL', 'Brado', 'Rumo'))
+
+
+@pytest.fixture(scope='module')
+def model(sample_store):
+    return simulation.fit(sample_store.cube, FILTERS)
+
+
+def test_fit_matches_pandas_counts(model, sample_frame):
+    df = sample_frame
+    rows = df[df['Data'].between('2025-02-01', '2025-04-30') & df['Transportadora'].isin(FILTERS.carriers)]
+    expected = rows.groupby(simulation.SEGMENT, observed=True).size()
+    got = pd.Series(model.incidents, index=pd.MultiIndex.from_arrays([model.carriers, model.routes]))
+    assert got.sort_index().to_dict() == expected.astype(float).sort_index().to_dict()
+    assert model.days == 89
+    # A severidade ajustada reproduz o custo observado (a menos da mistura com o mix geral)
+    assert (model.incidents * model.mean).sum() == pytest.approx(rows['Custo Associado (R$)'].sum(), rel=0.05)
+
+
+def test_expected_loss_matches_the_model(model):
+    exposure = simulation.simulate(model, 30, scenarios=40_000)
+    # E[N] = E[taxa] × horizonte, com a taxa ~ Gama(n + 0,5, 1/dias)
+    analytical = ((model.incidents + 0.5) / model.days * 30 * model.mean).sum()
+    assert exposure.expected == pytest.approx(analytical, rel=0.01)
+    assert exposure.carriers['Perda Esperada'].sum() == pytest.approx(exposure.expected)
+    assert exposure.routes['Perda Esperada'].sum() == pytest.approx(exposure.expected)
+
+
+def test_tail_measures_are_ordered(model):
+    exposure = simulation.simulate(model, 30, scenarios=20_000)
+    assert exposure.expected < exposure.var[0.95] <= exposure.es[0.95]
+    assert exposure.var[0.95] <= exposure.var[0.99] <= exposure.es[0.99]
+    assert exposure.es[0.95] <= exposure.es[0.99]
+    for table in (exposure.carriers, exposure.routes):
+        assert (table['VaR 95%'] <= table['ES 95%']).all()
+        assert (table['VaR 99%'] <= table['ES 99%']).all()
+
+
+def test_tail_matches_numpy():
+    losses = np.random.default_rng(3).exponential(1.0, (10_000, 3))
+    var, es = simulation._tail(losses, (0.95,))
+    for j in range(3):
+        q = np.quantile(losses[:, j], 0.95)
+        assert var[0.95][j] == q
+        assert es[0.95][j] == pytest.approx(losses[losses[:, j] >= q, j].mean())
+
+
+def test_estimates_are_progressive_and_independent_of_workers(model, monkeypatch):
+    estimates = list(simulation.run(model, 30, scenarios=4_000, batch=1_000))
+    assert [e.scenarios for e in estimates] == [1000, 2000, 3000, 4000]
+    assert estimates[-1].done and not estimates[0].done
+    monkeypatch.setattr(simulation, 'MIN_PARALLEL_DRAWS', 0)
+    parallel = simulation.simulate(model, 30, scenarios=4_000, batch=1_000, workers=2)
+    assert parallel.expected == pytest.approx(estimates[-1].expected)
+    assert parallel.var == pytest.approx(estimates[-1].var)
+
+
+def test_empty_selection(empty_csv):
+    model = simulation.fit(IncidentStore(empty_csv, incoming=None).cube, Filters())
+    exposure = simulation.simulate(model, 30)
+    assert exposure.expected == 0 and exposure.var == {0.95: 0.0, 0.99: 0.0}
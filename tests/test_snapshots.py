@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+
+import pytest
+
+import registry
+import snapshots
+from incremental import IncidentStore
+from queries import Filters, compute_views, normalize, query_report
+
+
+from conftest import SAMPLE_CSV
+
+
+@pytest.fixture(scope='module')
+def exported(tmp_path_factory):
+    # Presets padrão e sudeste exportados para uma pasta temporária
+    folder = tmp_path_factory.mktemp('snapshots')
+    shutil.copy(SAMPLE_CSV, folder / 'riscos.csv')
+    dataset = registry.Dataset('teste', 'Teste', str(folder / 'riscos.csv'))
+    root = str(folder / 'saida')
+    paths = dict(snapshots.export(dataset, ['padrao', 'sudeste'], root, workers=1))
+    return dataset, root, paths
+
+
+def sidebar(store, **selections):
+    # Filtros como o dashboard os produz: período completo e multiselects preenchidos
+    cube = store.cube
+    dates = cube.index.dates
+    first, last = (Filters(start=str(d)).start for d in (dates[0], dates[-1]))
+    values = {name: tuple(cube.cells[col].astype(str).unique()) for name, col in
+              (('carriers', 'Transportadora'), ('risk_types', 'Tipo de Risco'), ('modals', 'Modal Afetado'),
+               ('regions', 'Região'))}
+    return normalize(cube, Filters(first, last, **{**values, **selections}))
+
+
+def test_lookup_finds_matching_presets(exported):
+    dataset, root, paths = exported
+    store = IncidentStore(dataset.path, incoming=None)
+    found = snapshots.lookup(dataset, store, sidebar(store), root)
+    assert found.name == 'padrao' and found.path == paths['padrao']
+    assert snapshots.lookup(dataset, store, sidebar(store, regions=('Sudeste',)), root).name == 'sudeste'
+    assert snapshots.lookup(dataset, store, sidebar(store, regions=('Sul',)), root) is None
+    assert snapshots.lookup(dataset, store, sidebar(store), str(root) + '-vazio') is None
+
+
+def test_payload_matches_live_report(exported):
+    dataset, root, paths = exported
+    store = IncidentStore(dataset.path, incoming=None)
+    filters = sidebar(store, regions=('Sudeste',))
+    with open(paths['sudeste'].replace('.html', '.json'), encoding='utf-8') as f:
+        payload = json.load(f)
+    live = json.loads(json.dumps(query_report(compute_views(store.cube, filters)), default=str))
+    assert payload['data']['report'] == live
+    assert payload['filters'] == filters.to_dict()
+
+
+def test_new_batch_invalidates_snapshots(sample_csv, tmp_path):
+    dataset = registry.Dataset('teste', 'Teste', sample_csv)
+    root = str(tmp_path / 'saida')
+    list(snapshots.export(dataset, ['padrao'], root, workers=1))
+    store = IncidentStore(dataset.path, incoming=None)
+    with open(dataset.path, encoding='utf-8') as f:
+        last = f.read().splitlines()[-1]
+    with open(dataset.path, 'a', encoding='utf-8') as f:
+        f.write(last + '\n')
+    assert snapshots.lookup(dataset, store, sidebar(store), root).name == 'padrao'
+    store.refresh()
+    assert snapshots.lookup(dataset, store, sidebar(store), root) is None
+
+
+def test_prune_keeps_recent_versions(tmp_path):
+    for i in range(5):
+        (tmp_path / f'v{i}').mkdir()
+        os.utime(tmp_path / f'v{i}', (i, i))
+    snapshots.prune(str(tmp_path), keep=2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['v3', 'v4']
@@ -0,0 +1,21 @@
+import datetime
+
+import pytest
+
+import streaming
+from queries import Filters, compute_views, query_report
+
+FILTERS = [
+    Filters(),
+    Filters(start=datetime.date(2025, 2, 1), end=datetime.date(2025, 4, 30), carriers=('JSL', 'Brado')),
+    Filters(modals=('Ferroviário',), regions=('Sul', 'Sudeste'), risk_types=('Climático',)),
+]
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_streaming_matches_in_memory(sample_store, sample_csv, monkeypatch, filters):
+    # Blocos pequenos e fusões frequentes: o resultado não depende de como a fonte é cortada
+    monkeypatch.setattr(streaming, 'MERGE_CELLS', 100)
+    filters = filters.normalized()
+    expected = query_report(compute_views(sample_store.cube, filters))
+    assert query_report(streaming.stream_views(sample_csv, filters, batch_rows=100)) == expected
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import queries
+import temporal
+
+# Datas com bordas de semana, mês, trimestre, anos bissextos e antes de 1970
+DATES = pd.Series(pd.to_datetime(['1969-12-28', '1969-12-29', '1970-01-01', '1999-12-31', '2000-02-29',
+                                  '2024-03-31', '2024-04-01', '2024-12-30', '2025-01-05', '2025-01-06',
+                                  '2025-06-05']))
+
+
+def pandas_labels(dates, granularity):
+    # Oráculo: os rótulos montados por linha com strftime/to_period
+    if granularity == 'day':
+        return dates.dt.strftime('%Y-%m-%d')
+    if granularity == 'week':
+        return dates.dt.to_period('W-SUN').dt.start_time.dt.strftime('%Y-%m-%d')
+    if granularity == 'month':
+        return dates.dt.strftime('%Y-%m')
+    return dates.dt.to_period('Q').astype(str).str.replace('Q', '-Q')
+
+
+@pytest.mark.parametrize('granularity', temporal.GRANULARITIES)
+def test_bucket_labels_match_pandas(granularity):
+    codes = temporal.buckets(temporal.day_ordinals(DATES), granularity)
+    assert list(temporal.bucket_labels(codes, granularity)) == pandas_labels(DATES, granularity).tolist()
+    assert list(temporal.bucket_categorical(temporal.day_ordinals(DATES), granularity)) == \
+        pandas_labels(DATES, granularity).tolist()
+
+
+@pytest.mark.parametrize('granularity', temporal.GRANULARITIES)
+def test_bucket_starts_are_period_starts(granularity):
+    codes = temporal.buckets(temporal.day_ordinals(DATES), granularity)
+    starts = pd.to_datetime(temporal.bucket_starts(codes, granularity))
+    freq = {'day': 'D', 'week': 'W-SUN', 'month': 'M', 'quarter': 'Q'}[granularity]
+    assert (starts == DATES.dt.to_period(freq).dt.start_time).all()
+
+
+@pytest.mark.parametrize('start,end', [(None, None), ('2025-02-01', '2025-03-31'), ('2025-03-15', '2025-03-15'),
+                                       ('2024-01-01', '2025-01-01'), ('2025-06-01', '2030-01-01'),
+                                       ('2025-05-01', '2025-04-01')])
+def test_range_bounds_match_date_mask(sample_frame, start, end):
+    dates = sample_frame['Data'].sort_values(kind='stable').reset_index(drop=True)
+    lo, hi = temporal.range_bounds(temporal.day_ordinals(dates), start, end)
+    mask = dates.dt.date.between(pd.Timestamp(start or dates.iloc[0]).date(), pd.Timestamp(end or dates.iloc[-1]).date())
+    assert np.array_equal(np.arange(len(dates))[lo:hi], np.flatnonzero(mask))
+
+
+def test_timeline_matches_strftime_groupby(sample_store, sample_frame):
+    # Visão do gráfico de linha contra o groupby do dashboard original
+    view = queries.compute_view(sample_store.cube, 'month_risk', queries.Filters())
+    df = sample_frame.assign(**{'Mês': sample_frame['Data'].dt.strftime('%Y-%m')})
+    expected = df.groupby(['Mês', 'Tipo de Risco'], observed=True).size()
+    got = view.set_index(['Mês', view['Tipo de Risco'].astype(str)])['Incidentes']
+    assert got.sort_index().to_dict() == expected.sort_index().to_dict()
+    assert view['Mês'].tolist() == sorted(view['Mês'])
@@ -0,0 +1,82 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def trace():
+    trace = tracing.begin(tracing.Trace('teste'))
+    yield trace
+    tracing.begin(None)
+
+
+def by_name(trace):
+    return {s.name: s for s in trace.spans}
+
+
+def test_spans_nest(trace):
+    with tracing.span('carga'):
+        with tracing.span('ler', rows=3):
+            pass
+        with tracing.span('agregar'):
+            with tracing.span('somar'):
+                pass
+    trace.finish()
+    spans = by_name(trace)
+    assert {name: s.depth for name, s in spans.items()} == {'carga': 0, 'ler': 1, 'agregar': 1, 'somar': 2}
+    outer, inner = spans['carga'], spans['somar']
+    assert outer.start <= inner.start and inner.start + inner.duration <= outer.start + outer.duration
+    assert spans['ler'].args == {'rows': 3}
+    assert trace.to_frame()['Etapa'].tolist() == ['carga', 'ler', 'agregar', 'somar']
+
+
+def test_bound_worker_has_its_own_stack(trace):
+    def background():
+        with tracing.span('fundo'):
+            pass
+
+    with tracing.span('página'):
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(tracing.bind(background)).result()
+    spans = by_name(trace)
+    assert spans['fundo'].depth == 0 and spans['fundo'].thread != spans['página'].thread
+    assert trace.to_frame().set_index('Etapa')['Thread'].to_dict() == {'página': 0, 'fundo': 1}
+
+
+def test_memory_peak_reaches_the_parent():
+    trace = tracing.begin(tracing.Trace('memória', memory=True))
+    try:
+        with tracing.span('pai'):
+            with tracing.span('filho'):
+                block = np.ones(2**20)
+                del block
+    finally:
+        tracing.begin(None)
+        trace.finish()
+    spans = by_name(trace)
+    assert spans['filho'].peak >= 8 * 2**20
+    assert spans['pai'].peak >= spans['filho'].peak
+    assert abs(spans['pai'].memory) < 2**20
+
+
+def test_disabled_tracing_records_nothing():
+    assert tracing.current() is None
+    assert tracing.span('nada') is tracing.span('outra')
+    assert tracing.bind(len) is len
+
+
+def test_export_chrome_format(trace, tmp_path):
+    with tracing.span('carga', 'registro'):
+        with tracing.span('ler'):
+            pass
+    path = tracing.export([trace.finish()], str(tmp_path / 'rastro.json'))
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+    complete = {e['name']: e for e in events if e['ph'] == 'X'}
+    outer, inner = complete['carga'], complete['ler']
+    assert outer['cat'] == 'registro'
+    assert outer['ts'] <= inner['ts'] and inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur'] + 1e-3
@@ -0,0 +1,204 @@
+# Rastreamento por etapa (spans) de cada rerun do dashboard
+#
+#   trace = tracing.Trace('rerun', memory=True)
+#   tracing.begin(trace)
+#   with tracing.span('carga.store'):
+#       ...
+#   trace.finish()
+#   tracing.export([trace], 'home/traces/rerun.json')   # formato Chrome Trace (chrome://tracing, Perfetto)
+#
+# Sem rastreamento ativo, span() devolve sempre o mesmo contexto nulo: o custo é uma leitura de
+# contextvar por etapa. Com memory=True, cada span registra a variação e o pico de memória do
+# tracemalloc (o tracemalloc é global ao processo: com várias threads/sessões os números são
+# aproximados, e ligá-lo deixa o código rastreado mais lento).
+
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+import pandas as pd
+
+TRACE_DIR = 'home/traces'
+
+_current = contextvars.ContextVar('trace', default=None)
+_NULL_SPAN = nullcontext()
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'category', 'args', 'thread', 'depth', 'start', 'duration',
+                 'memory', 'peak', '_memory_start')
+
+    def __init__(self, trace, name, category, args):
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.args = args
+        self.memory = None
+        self.peak = None
+
+    def __enter__(self):
+        trace = self.trace
+        self.thread = threading.get_ident()
+        stack = trace._stack()
+        self.depth = len(stack)
+        if trace.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if stack and stack[-1].peak is not None:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self._memory_start = current
+            self.peak = current
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.duration = time.perf_counter_ns() - self.start
+        trace = self.trace
+        stack = trace._stack()
+        stack.pop()
+        if self.peak is not None and tracemalloc.is_tracing():
+            # Pico do span = maior pico entre ele e os filhos; repassado ao pai
+            current, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak) - self._memory_start
+            self.memory = current - self._memory_start
+            if stack and stack[-1].peak is not None:
+                stack[-1].peak = max(stack[-1].peak, self._memory_start + self.peak)
+        trace._record(self)
+        return False
+
+
+class Trace:
+    def __init__(self, label, memory=False):
+        self.label = label
+        self.memory = memory
+        self.created = time.time()
+        self.start = time.perf_counter_ns()
+        self.end = None
+        self.spans = []
+        self._lock = threading.Lock()
+        self._stacks = threading.local()
+        self._started_tracemalloc = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def _stack(self):
+        stack = getattr(self._stacks, 'stack', None)
+        if stack is None:
+            stack = self._stacks.stack = []
+        return stack
+
+    def _record(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    @property
+    def finished(self):
+        return self.end is not None
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter_ns()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        return self
+
+    @property
+    def total_ms(self):
+        return ((self.end or time.perf_counter_ns()) - self.start) / 1e6
+
+    def to_frame(self):
+        # Uma linha por span, em ordem de início (para a cascata)
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        threads = {}
+        for s in spans:
+            threads.setdefault(s.thread, len(threads))
+        return pd.DataFrame({
+            'Etapa': [s.name for s in spans],
+            'Categoria': [s.category for s in spans],
+            'Nível': [s.depth for s in spans],
+            'Thread': [threads[s.thread] for s in spans],
+            'Início (ms)': [(s.start - self.start) / 1e6 for s in spans],
+            'Duração (ms)': [s.duration / 1e6 for s in spans],
+            'Memória (MB)': [s.memory / 2**20 if s.memory is not None else None for s in spans],
+            'Pico (MB)': [s.peak / 2**20 if s.memory is not None else None for s in spans],
+        })
+
+    def chrome_events(self, pid=1):
+        # Eventos completos ("ph": "X") do Chrome Trace Event Format, em microssegundos
+        with self._lock:
+            spans = list(self.spans)
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid,
+                   'args': {'name': f'{self.label} ({time.strftime("%H:%M:%S", time.localtime(self.created))})'}}]
+        for s in spans:
+            args = dict(s.args)
+            if s.memory is not None:
+                args['memory_bytes'] = s.memory
+                args['peak_bytes'] = s.peak
+            events.append({'name': s.name, 'cat': s.category, 'ph': 'X', 'pid': pid, 'tid': s.thread,
+                           'ts': (s.start - self.start) / 1e3, 'dur': s.duration / 1e3, 'args': args})
+        return events
+
+
+def current():
+    return _current.get()
+
+
+def begin(trace):
+    # Define o rastreamento ativo do contexto atual (None desliga)
+    _current.set(trace)
+    return trace
+
+
+def span(name, category='etapa', **args):
+    trace = _current.get()
+    if trace is None:
+        return _NULL_SPAN
+    return Span(trace, name, category, args)
+
+
+def traced(name=None, category='etapa'):
+    # Decorador: a função inteira vira um span
+    def decorator(fn):
+        label = name or fn.__name__
+
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(label, category):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__qualname__ = fn.__qualname__
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return decorator
+
+
+def bind(fn):
+    # Leva o rastreamento ativo para outra thread (ex.: pool.submit(tracing.bind(fn), ...))
+    if _current.get() is None:
+        return fn
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def to_chrome(traces):
+    events = []
+    for pid, trace in enumerate(traces, start=1):
+        events.extend(trace.chrome_events(pid))
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def export(traces, path=None):
+    if path is None:
+        path = os.path.join(TRACE_DIR, time.strftime('rerun-%Y%m%d-%H%M%S.json'))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(to_chrome(traces), f, ensure_ascii=False)
+    return path